@@ -0,0 +1,100 @@
+import io
+from contextlib import redirect_stdout
+from bench import harness
+from src.compiler import bytecode
+from src.compiler import compiler
+from src.compiler import ir
+from src.parser import parser
+from src.runtime import arena
+from src.runtime import vm
+
+
+# usage: python -m bench.arena [requests] [allocations per request] [repeat]
+requests = 20000
+perRequest = 16
+repeat = 5
+
+
+# what the arena is measured against: every cell allocated from a free list and freed on its own
+class FreeListHeap:
+    def __init__(self):
+        self.memory = []
+        self.free = []
+
+    def store(self, value):
+        if self.free:
+            address = self.free.pop()
+            self.memory[address] = value
+            return address
+        self.memory.append(value)
+        return len(self.memory) - 1
+
+    def release(self, address):
+        self.memory[address] = None
+        self.free.append(address)
+
+
+def withArena(count, size):
+    heap = arena.Arena()
+    for request in range(count):
+        mark = heap.mark()
+        for value in range(size):
+            heap.store(value)
+        heap.release(mark)
+    return heap
+
+
+def withFreeList(count, size):
+    heap = FreeListHeap()
+    for request in range(count):
+        addresses = [heap.store(value) for value in range(size)]
+        for address in addresses:
+            heap.release(address)
+    return heap
+
+
+# a handler per request that makes a few heap values and is done with them when it returns, they are given
+# to a callee so the escape analysis keeps them on the heap
+def program(count):
+    lines = [
+        "type u32 is unsigned<32>;",
+        "fn total(take u32 header, take u32 body, take u32 length) u32 {",
+        "    return header + body + length;",
+        "}",
+        "fn handle(u32 id) u32 {",
+        "    u32 header = new id * 3;",
+        "    u32 body = new header + id;",
+        "    u32 length = new body / 2;",
+        "    u32 sum = total(give header, give body, give length);",
+        "    return sum;",
+        "}",
+        "fn main() {",
+    ]
+    for i in range(count):
+        lines.append(f"    u32 r{i} = handle({i});")
+    lines.append(f"    print(r{count - 1});")
+    lines.append("}")
+    return '\n'.join(lines) + '\n'
+
+
+def main(count, size, iterations):
+    harness.quiet()
+    parser.getParser()
+    print(f"{count} requests of {size} allocations, median of {iterations}")
+    harness.report("arena, one release per request", harness.timeMedian(lambda: withArena(count, size), iterations))
+    harness.report("free list, one free per allocation", harness.timeMedian(lambda: withFreeList(count, size), iterations))
+    print(withArena(count, size).statistics().describe())
+    handlers = count // 10
+    checked, _ = compiler.compile(parser.parse('bench', program(handlers).encode()))
+    executable = bytecode.lower(compiler.optimize(ir.build(checked))[0])
+    heap = arena.Arena()
+    with redirect_stdout(io.StringIO()):
+        vm.run(executable, heap)
+        seconds = harness.timeMedian(lambda: vm.run(executable), iterations)
+    print(f"vm, {handlers} handler calls")
+    harness.report("execute", seconds)
+    print(heap.statistics().describe())
+
+
+if __name__ == '__main__':
+    harness.run(main, requests, perRequest, repeat)
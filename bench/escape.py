@@ -0,0 +1,83 @@
+import io
+from contextlib import redirect_stdout
+from bench import harness
+from src.ast import ast
+from src.compiler import bytecode
+from src.compiler import compiler
+from src.compiler import escape
+from src.compiler import ir
+from src.compiler import pycode
+from src.parser import parser
+from src.runtime import arena
+from src.runtime import pycode as pycodeRuntime
+from src.runtime import vm
+
+
+# usage: python -m bench.escape [handlers] [repeat]
+handlers = 2000
+repeat = 9
+
+
+# request handlers whose new values mostly stay in the handler, one of them is given to a callee taking it
+def program(count):
+    lines = [
+        "type u32 is unsigned<32>;",
+        "fn log(take u32 entry) u32 {",
+        "    return entry + 1;",
+        "}",
+        "fn handle(u32 id) u32 {",
+        "    u32 header = new id * 3;",
+        "    u32 body = new header + id;",
+        "    u32 length = new body / 2;",
+        "    u32 entry = new length + 7;",
+        "    u32 logged = log(give entry);",
+        "    return header + body + length + logged;",
+        "}",
+        "fn main() {",
+    ]
+    for i in range(count):
+        lines.append(f"    u32 r{i} = handle({i});")
+    lines.append(f"    print(r{count - 1});")
+    lines.append("}")
+    return '\n'.join(lines) + '\n'
+
+
+# every allocation kept on the heap, as before the analysis
+def escaping(program):
+    for statement in program.statements:
+        if isinstance(statement, ast.FnDef):
+            statement.allocations = {}
+
+
+def measure(label, checked, iterations):
+    module = compiler.optimize(ir.build(checked))[0]
+    executable = bytecode.lower(module)
+    built = pycode.lower(compiler.optimize(ir.build(checked))[0])
+    heap = arena.Arena()
+    output = io.StringIO()
+    with redirect_stdout(output):
+        vm.run(executable, heap)
+        vmTime = harness.timeMedian(lambda: vm.run(executable), iterations)
+        pythonTime = harness.timeMedian(lambda: pycodeRuntime.run(built), iterations)
+    print(label)
+    harness.report("  vm execute", vmTime)
+    harness.report("  python code execute", pythonTime)
+    print(f"  {heap.statistics().describe()}")
+    return output.getvalue()
+
+
+def main(count, iterations):
+    harness.quiet()
+    parser.getParser()
+    source = program(count).encode()
+    checked, _ = compiler.compile(parser.parse('bench', source))
+    print(f"{count} handler calls, median of {iterations}")
+    print(escape.statistics([checked]).describe())
+    demoted = measure("escape analysis", checked, iterations)
+    escaping(checked)
+    kept = measure("every allocation on the heap", checked, iterations)
+    assert demoted == kept
+
+
+if __name__ == '__main__':
+    harness.run(main, handlers, repeat)
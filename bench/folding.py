@@ -0,0 +1,61 @@
+import time
+from bench import harness
+from src.ast import ast
+from src.ast import consteval
+
+
+# usage: python -m bench.folding [terms] [iterations]
+terms = 2000
+iterations = 20
+
+operators = (ast.Add, ast.Sub, ast.Mul, ast.Add)
+
+
+# a subtraction brings the value back down to at most 7, so like any constant without a width it stays within
+# 64 unsigned bits
+def literalTree(count):
+    tree, value = ast.Integer(1), 1
+    for i in range(2, count + 1):
+        operator = operators[i % len(operators)]
+        operand = max(value - i % 7 - 1, 0) if operator is ast.Sub else i % 7 + 1
+        value = {ast.Add: value + operand, ast.Sub: value - operand, ast.Mul: value * operand}[operator]
+        tree = operator(tree, ast.Integer(operand))
+    return tree
+
+
+# the old reduceOrThrow: one f-string and one eval per operator node
+def evalFold(root):
+    nodes = []
+    node = root
+    while isinstance(node, ast.BinOp):
+        nodes.append(node)
+        node = node.left
+    value = node
+    for node in reversed(nodes):
+        left, right = value, node.right
+        value = eval(f"{type(left).__name__}(left.value {node.op} right.value)", {'Integer': ast.Integer}, {'left': left, 'right': right})
+    return value
+
+
+def timeFold(fold, count, repeat):
+    elapsed = 0.0
+    for _ in range(repeat):
+        tree = literalTree(count)
+        start = time.perf_counter()
+        result = fold(tree)
+        elapsed += time.perf_counter() - start
+    return elapsed / repeat, result
+
+
+def main(count, repeat):
+    evalTime, evalResult = timeFold(evalFold, count, repeat)
+    foldTime, foldResult = timeFold(consteval.foldTree, count, repeat)
+    assert evalResult.value == foldResult.value
+    print(f"{count} literal operators")
+    print(f"{'eval per node':<20}{evalTime * 1000:>10.3f} ms{evalTime / count * 1e6:>10.2f} us/op")
+    print(f"{'operator tables':<20}{foldTime * 1000:>10.3f} ms{foldTime / count * 1e6:>10.2f} us/op")
+    print(f"{'speedup':<20}{evalTime / foldTime:>10.1f}x")
+
+
+if __name__ == '__main__':
+    harness.run(main, terms, iterations)
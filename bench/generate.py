@@ -0,0 +1,67 @@
+import random
+import sys
+
+
+# usage: python -m bench.generate [functions] [statements] [depth] [types] [fanout] [seed] > program.ty
+widths = (8, 16, 32, 64)
+operators = ('+', '-', '*', '/')
+
+
+# a valid program: every expression starts from a variable so no constant folds into an overflow,
+# divisors are non-zero literals, and functions only call leaf functions of the same type so the
+# work done at runtime grows with the program instead of with the depth of the call graph
+def generate(functions=10, statements=5, depth=3, types=2, fanout=2, seed=0):
+    rng = random.Random(seed)
+    types = max(types, 1)
+    lines = [f"type t{k} is unsigned<{widths[k % len(widths)]}>;" for k in range(types)]
+    for i in range(functions):
+        lines += function(rng, i, statements, depth, types, fanout)
+    lines.append("fn main() {")
+    for i in range(functions):
+        kind = f"t{i % types}"
+        lines.append(f"    {kind} r{i} = f{i}({i % 7 + 1}, {i % 5 + 2});")
+        lines.append(f"    print(r{i});")
+    lines.append("}")
+    return '\n'.join(lines) + '\n'
+
+
+def function(rng, index, statements, depth, types, fanout):
+    kind = f"t{index % types}"
+    names = ['x', 'y']
+    lines = [f"fn f{index}({kind} x, {kind} y) {kind} {{"]
+    callees = [] if isLeaf(index, fanout) else [j for j in range(index - types, -1, -types) if isLeaf(j, fanout)][:fanout]
+    for callee in callees:
+        name = f"c{callee}"
+        lines.append(f"    {kind} {name} = f{callee}({rng.choice(names)}, {rng.choice(names)});")
+        names.append(name)
+    for s in range(statements):
+        name = f"v{s}"
+        lines.append(f"    {kind} {name} = {expression(rng, names, depth)};")
+        names.append(name)
+    lines.append(f"    return {names[-1]};")
+    lines.append("}")
+    return lines
+
+
+def isLeaf(index, fanout):
+    return index % (fanout + 1) == 0
+
+
+# built iteratively so the depth is not bounded by python's recursion limit
+def expression(rng, names, depth):
+    expr = rng.choice(names)
+    for _ in range(depth):
+        op = rng.choice(operators)
+        if op == '/':
+            operand = str(rng.randint(1, 9))
+        else:
+            operand = rng.choice(names) if rng.random() < 0.5 else str(rng.randint(1, 9))
+        if op in '*/':
+            expr = f"({expr}) {op} {operand}"
+        else:
+            expr = f"{expr} {op} {operand}"
+    return expr
+
+
+if __name__ == '__main__':
+    sys.stdout.write(generate(*[int(arg) for arg in sys.argv[1:7]]))
@@ -0,0 +1,51 @@
+import io
+import sys
+import time
+from contextlib import redirect_stdout
+from src.compiler import compiler
+from src.compiler import ir
+from src.logging import logger
+from src.parser import parser
+
+
+# what the benches share, each is run as python -m bench.<name> and only adds its own workloads and tables
+
+
+# warnings about definitions the checker skipped would drown the tables
+def quiet():
+    logger.level = logger.LogLevel.ERROR
+
+
+def timeMedian(action, count):
+    times = []
+    for _ in range(count):
+        start = time.perf_counter()
+        action()
+        times.append(time.perf_counter() - start)
+    return sorted(times)[len(times) // 2]
+
+
+def report(label, seconds):
+    print(f"{label:<40}{seconds * 1000:>10.2f} ms")
+
+
+def captured(action):
+    output = io.StringIO()
+    with redirect_stdout(output):
+        action()
+    return output.getvalue()
+
+
+def checked(source):
+    return compiler.compile(parser.parse('bench', source.encode()))
+
+
+def optimized(source):
+    program, _ = checked(source)
+    return compiler.optimize(ir.build(program))[0]
+
+
+# main called with the defaults, each replaced by the command line argument in its place as the default's type
+def run(main, *defaults):
+    args = [type(default)(arg) for default, arg in zip(defaults, sys.argv[1:])]
+    main(*(args + list(defaults[len(args):])))
@@ -0,0 +1,56 @@
+import os
+import tempfile
+import time
+from bench import generate
+from bench import harness
+from src.lsp import documents
+from src.parser import parser
+
+
+# usage: python -m bench.language [functions] [repeat]
+functions = 2000
+repeat = 20
+
+
+# an editor session on one large file: open it, then type in one function body and ask about names in it
+def main(count, iterations):
+    harness.quiet()
+    parser.getParser()
+    source = generate.generate(count, 8, 4, 4, 2)
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'bench.ty')
+        document = documents.Document(path, [])
+        start = time.perf_counter()
+        document.change(source)
+        opened = time.perf_counter() - start
+        middle = source.index(f"fn f{count // 2}(")
+        edits = [source[:middle] + source[middle:].replace("return ", f"return {value} + ", 1) for value in (1, 2)]
+        versions = iter(range(iterations * 2))
+        edit = harness.timeMedian(lambda: document.change(edits[next(versions) % 2]), iterations)
+        assert not document.diagnostics, document.diagnostics
+        line = source.count('\n', 0, middle) + 1
+        lineStart = source.index('\n', middle) + 1
+        name = source.index('x', lineStart) - lineStart
+        call = source.index(f"= f{count // 2}(", source.index("fn main")) + 2
+        callLine = source.count('\n', 0, call)
+        callCharacter = call - source.rindex('\n', 0, call) - 1
+
+        def hover():
+            return document.hover(documents.offsetOf(document.source, document.pieces, line, name))
+
+        def definition():
+            offset = documents.offsetOf(document.source, document.pieces, callLine, callCharacter)
+            return document.definition(offset)
+
+        assert hover() is not None and definition() is not None
+        hovered = harness.timeMedian(hover, iterations)
+        defined = harness.timeMedian(definition, iterations)
+    print(f"{count} functions, {len(source) / 1e6:.2f} MB, median of {iterations}")
+    harness.report("open (full check)", opened)
+    harness.report("edit one body + diagnostics", edit)
+    harness.report("hover", hovered)
+    harness.report("go to definition", defined)
+
+
+if __name__ == '__main__':
+    harness.run(main, functions, repeat)
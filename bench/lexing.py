@@ -0,0 +1,86 @@
+import os
+import tempfile
+import time
+from src.parser import fastlexer
+from src.parser import lexer
+from src.parser import parser
+from bench import generate
+from bench import harness
+
+
+# usage: python -m bench.lexing [megabytes] [iterations]
+megabytes = 4
+iterations = 3
+
+
+def source(size):
+    functions = 100
+    while True:
+        text = generate.generate(functions, 8, 6, 4, 2)
+        if len(text) >= size * 1024 * 1024:
+            return text
+        functions *= 2
+
+
+def plyStream(data):
+    ply = lexer.getLexer()
+    ply.input(data)
+    return iter(ply.token, None)
+
+
+def fields(stream):
+    return [(token.type, token.value, token.lineno, token.lexpos) for token in stream]
+
+
+# pulls every token the way the parser does and keeps none of them, so only lexing is timed
+def drain(stream):
+    count = 0
+    for _ in stream:
+        count += 1
+    return count
+
+
+def timeBest(scan, count):
+    best = None
+    for _ in range(count):
+        start = time.perf_counter()
+        result = scan()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def report(label, size, count, seconds, baseline):
+    print(f"{label:<24}{seconds * 1000:>10.1f} ms{size / seconds / 1e6:>9.2f} MB/s{count / seconds / 1e6:>8.2f} Mtok/s{baseline / seconds:>8.1f}x")
+
+
+def main(size, count):
+    data = source(size)
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'bench.ty')
+        with open(path, 'w') as file:
+            file.write(data)
+        with open(path, 'rb') as file:
+            mapped = fastlexer.mapFile(file)
+        expected = fields(plyStream(data))
+        assert fields(fastlexer.tokens(data)) == expected, "token streams differ"
+        assert fields(fastlexer.tokens(mapped)) == expected, "token streams differ"
+        tokens = len(expected)
+        del expected
+        plyTime, _ = timeBest(lambda: drain(plyStream(data)), count)
+        textTime, _ = timeBest(lambda: drain(fastlexer.tokens(data)), count)
+        mapTime, _ = timeBest(lambda: drain(fastlexer.tokens(mapped)), count)
+        plyScan, plyUses = timeBest(lambda: [token for token in plyStream(data) if token.type == 'USE'], count)
+        fastScan, fastUses = timeBest(lambda: parser.scanUses(mapped), count)
+        assert len(plyUses) == len(fastUses)
+    print(f"{len(data) / 1e6:.2f} MB, {tokens} tokens, identical streams")
+    print(f"{'':<24}{'time':>13}{'throughput':>14}{'':>14}{'speedup':>8}")
+    report("ply, str", len(data), tokens, plyTime, plyTime)
+    report("master pattern, str", len(data), tokens, textTime, plyTime)
+    report("master pattern, mmap", len(data), tokens, mapTime, plyTime)
+    report("scan uses, ply", len(data), tokens, plyScan, plyScan)
+    report("scan uses, mmap", len(data), tokens, fastScan, plyScan)
+
+
+if __name__ == '__main__':
+    harness.run(main, megabytes, iterations)
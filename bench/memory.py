@@ -0,0 +1,46 @@
+import json
+import os
+import subprocess
+import sys
+from bench import harness
+
+
+# usage: python -m bench.memory [statements] [statements per function]
+statements = 100000
+perFunction = 8
+
+# runs in a fresh interpreter so the peak belongs to this one compile only
+measureFront = (
+    "import json, resource, sys; "
+    "from bench import generate; "
+    "from src.compiler import compiler; from src.logging import logger; from src.parser import parser; "
+    "logger.level = logger.LogLevel.ERROR; "
+    "parser.getParser(); "
+    "source = generate.generate({functions}, {perFunction}, 4, 4, 2); "
+    "before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss; "
+    "program = parser.parse('bench', source); "
+    "parsed = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss; "
+    "compiler.compile(program); "
+    "after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss; "
+    "print(json.dumps({{'lines': source.count(chr(10)), 'before': before, 'parsed': parsed, 'after': after}}))"
+)
+
+
+def measure(count, size):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script = measureFront.format(functions=max(count // size, 1), perFunction=size)
+    result = subprocess.run([sys.executable, '-c', script], cwd=root, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(count, size):
+    peaks = measure(count, size)
+    print(f"{count} statements, {peaks['lines']} lines")
+    print(f"{'peak rss before parse':<28}{peaks['before'] / 1024:>10.1f} MiB")
+    print(f"{'peak rss after parse':<28}{peaks['parsed'] / 1024:>10.1f} MiB")
+    print(f"{'peak rss after check':<28}{peaks['after'] / 1024:>10.1f} MiB")
+    print(f"{'compile growth':<28}{(peaks['after'] - peaks['before']) / 1024:>10.1f} MiB")
+
+
+if __name__ == '__main__':
+    harness.run(main, statements, perFunction)
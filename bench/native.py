@@ -0,0 +1,50 @@
+import io
+import os
+import subprocess
+import tempfile
+import time
+from contextlib import redirect_stdout
+from bench import generate
+from bench import harness
+from src.compiler import bytecode
+from src.compiler import native
+from src.parser import parser
+from src.runtime import vm
+
+
+# usage: python -m bench.native [functions] [statements] [repeat]
+functions = 500
+statements = 40
+repeat = 20
+
+
+# the same checked program run by the vm and as a binary, with what each has to pay before it first runs
+def main(count, length, iterations):
+    harness.quiet()
+    parser.getParser()
+    source = generate.generate(count, length, 6, 4, 2)
+    executable = bytecode.lower(harness.optimized(source))
+    output = io.StringIO()
+    with redirect_stdout(output):
+        vmTime = harness.timeMedian(lambda: vm.run(executable), iterations)
+    lowered = native.lower(harness.optimized(source))
+    with tempfile.TemporaryDirectory() as folder:
+        os.environ['TYPE_CACHE_DIR'] = folder
+        start = time.perf_counter()
+        binary = native.build(lowered)
+        coldBuild = time.perf_counter() - start
+        warmBuild = harness.timeMedian(lambda: native.build(lowered), iterations)
+        result = subprocess.run([binary], capture_output=True, text=True, check=True)
+        assert result.stdout.splitlines() == output.getvalue().splitlines()[:count]
+        nativeTime = harness.timeMedian(lambda: subprocess.run([binary], stdout=subprocess.DEVNULL, check=True), iterations)
+        empty = harness.timeMedian(lambda: subprocess.run(['true'], check=True), iterations)
+    print(f"{count} functions of {length} statements, {len(lowered) / 1e3:.0f} KB of c, median of {iterations}")
+    harness.report("vm execute", vmTime)
+    harness.report("c compile, first run", coldBuild)
+    harness.report("c compile, cached binary", warmBuild)
+    harness.report("binary execute, with process start", nativeTime)
+    harness.report("process start alone", empty)
+
+
+if __name__ == '__main__':
+    harness.run(main, functions, statements, repeat)
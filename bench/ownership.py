@@ -0,0 +1,106 @@
+import io
+import random
+from contextlib import redirect_stdout
+from bench import harness
+from src.compiler import bytecode
+from src.compiler import compiler
+from src.compiler import ir
+from src.compiler import ownership
+from src.parser import parser
+from src.runtime import vm
+
+
+# usage: python -m bench.ownership [functions] [statements] [repeat]
+functions = 100
+statements = 60
+repeat = 10
+
+
+# workers that keep making owned values, reading a few recent ones and giving some away, the way a long
+# running function holds requests it is done with
+def generate(count, length, seed=0):
+    rng = random.Random(seed)
+    lines = [
+        "type u32 is unsigned<32>;",
+        "fn make(u32 n) give u32 {",
+        "    return n * 3 + 1;",
+        "}",
+        "fn consume(take u32 x) u32 {",
+        "    return x / 2;",
+        "}",
+    ]
+    for i in range(count):
+        names = ['seed']
+        lines.append(f"fn work{i}(u32 seed) u32 {{")
+        for s in range(length):
+            source = rng.choice(names[-4:])
+            if s % 5 == 4 and len(names) > 1:
+                lines.append(f"    u32 v{s} = consume(give {names.pop()});")
+            else:
+                lines.append(f"    u32 v{s} = make({source} / 4);")
+            names.append(f"v{s}")
+        lines.append(f"    return {names[-1]};")
+        lines.append("}")
+    lines.append("fn main() {")
+    for i in range(count):
+        lines.append(f"    u32 r{i} = work{i}({i});")
+        lines.append(f"    print(r{i});")
+    lines.append("}")
+    return '\n'.join(lines) + '\n'
+
+
+# the most owned values one function holds at once, when each is dropped at its last use and when every
+# one of them is kept until the function returns
+def peaks(module):
+    early = late = 0
+    for function in module.functions:
+        owned = {instruction.operand for instruction in function.instructions() if isinstance(instruction, ir.Drop)}
+        live = held = 0
+        for instruction in function.instructions():
+            if instruction in owned:
+                live += 1
+                held += 1
+            elif isinstance(instruction, ir.Drop):
+                live -= 1
+            early = max(early, live)
+        late = max(late, held)
+    return early, late
+
+
+def withoutDrops(module):
+    for function in module.functions:
+        for block in function.blocks:
+            block.instructions = [instruction for instruction in block.instructions if not isinstance(instruction, ir.Drop)]
+    return module
+
+
+# what the ownership check costs next to the rest of checking, that it grows linearly with the program, and
+# what dropping at last use saves and costs the vm
+def main(count, length, iterations):
+    harness.quiet()
+    parser.getParser()
+    print(f"{count} functions of {length} statements, median of {iterations}")
+    for scale in (1, 2, 4):
+        source = generate(count * scale, length)
+        program, registry = harness.checked(source)
+        total = harness.timeMedian(lambda: harness.checked(source), max(iterations // (2 * scale), 1))
+        owning = harness.timeMedian(lambda: ownership.check(program, registry), iterations)
+        harness.report(f"parse and check {count * scale} functions", total)
+        harness.report(f"  of which ownership", owning)
+    program, _ = harness.checked(generate(count, length))
+    module = compiler.optimize(ir.build(program))[0]
+    early, late = peaks(module)
+    executable = bytecode.lower(module)
+    kept = bytecode.lower(withoutDrops(compiler.optimize(ir.build(harness.checked(generate(count, length))[0]))[0]))
+    output = io.StringIO()
+    with redirect_stdout(output):
+        dropped = harness.timeMedian(lambda: vm.run(executable), iterations)
+        held = harness.timeMedian(lambda: vm.run(kept), iterations)
+    print(f"{'most owned values live in one function':<40}{early:>10} dropped at last use")
+    print(f"{'':<40}{late:>10} kept until return")
+    harness.report("vm execute, dropping at last use", dropped)
+    harness.report("vm execute, keeping until return", held)
+
+
+if __name__ == '__main__':
+    harness.run(main, functions, statements, repeat)
@@ -0,0 +1,45 @@
+import io
+import marshal
+import time
+from contextlib import redirect_stdout
+from bench import generate
+from bench import harness
+from src.compiler import bytecode
+from src.compiler import pycode
+from src.parser import parser
+from src.runtime import pycode as pycodeRuntime
+from src.runtime import vm
+
+
+# usage: python -m bench.pycode [functions] [statements] [repeat]
+functions = 500
+statements = 40
+repeat = 20
+
+
+# the same checked program run by the vm and as python code, with what the code costs to make and to reload
+def main(count, length, iterations):
+    harness.quiet()
+    parser.getParser()
+    source = generate.generate(count, length, 6, 4, 2)
+    executable = bytecode.lower(harness.optimized(source))
+    module = harness.optimized(source)
+    start = time.perf_counter()
+    built = pycode.lower(module)
+    lowered = time.perf_counter() - start
+    data = marshal.dumps(built)
+    loaded = harness.timeMedian(lambda: marshal.loads(data), iterations)
+    assert harness.captured(lambda: vm.run(executable)) == harness.captured(lambda: pycodeRuntime.run(built))
+    with redirect_stdout(io.StringIO()):
+        vmTime = harness.timeMedian(lambda: vm.run(executable), iterations)
+        pythonTime = harness.timeMedian(lambda: pycodeRuntime.run(built), iterations)
+    print(f"{count} functions of {length} statements, median of {iterations}")
+    harness.report("vm execute", vmTime)
+    harness.report("python code execute", pythonTime)
+    harness.report("lower and compile()", lowered)
+    harness.report("load cached code", loaded)
+    print(f"{'speedup over the vm':<40}{vmTime / pythonTime:>10.1f}x")
+
+
+if __name__ == '__main__':
+    harness.run(main, functions, statements, repeat)
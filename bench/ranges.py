@@ -0,0 +1,93 @@
+import io
+import random
+from contextlib import redirect_stdout
+from bench import harness
+from src.compiler import bytecode
+from src.compiler import compiler
+from src.compiler import ir
+from src.compiler import passes
+from src.compiler import pycode
+from src.parser import parser
+from src.runtime import pycode as pycodeRuntime
+from src.runtime import vm
+
+
+# usage: python -m bench.ranges [functions] [statements] [repeat]
+functions = 500
+statements = 20
+repeat = 20
+
+# statements over two percentages that always stay within 0 .. 100, so the program runs to its end, each
+# provable from the bounds of its operands alone
+templates = (
+    '({a} * {b}) / 100',
+    '{a} / 2 + {b} / 2',
+    '({a} + {b}) / 2',
+    '100 - {a}',
+    '({a} * 3) / 4',
+    '{a} / ({b} + 1)',
+)
+
+
+def generate(count, length, seed=0):
+    rng = random.Random(seed)
+    lines = ["type percent is 0 .. 100;"]
+    for i in range(count):
+        names = ['x', 'y']
+        lines.append(f"fn f{i}(percent x, percent y) percent {{")
+        for s in range(length):
+            template = rng.choice(templates)
+            lines.append(f"    percent v{s} = {template.format(a=rng.choice(names), b=rng.choice(names))};")
+            names.append(f"v{s}")
+        lines.append(f"    return {names[-1]};")
+        lines.append("}")
+    lines.append("fn main() {")
+    for i in range(count):
+        lines.append(f"    percent r{i} = f{i}({i % 101}, {i * 7 % 101});")
+        lines.append(f"    print(r{i});")
+    lines.append("}")
+    return '\n'.join(lines) + '\n'
+
+
+def optimized(source, analysed):
+    program, _ = compiler.compile(parser.parse('bench', source.encode()))
+    passList = passes.defaultPasses()
+    if not analysed:
+        passList = [each for each in passList if not isinstance(each, passes.RangeAnalysis)]
+    manager = passes.PassManager(passList)
+    return manager.run(ir.build(program)), manager
+
+
+# the same range typed program with every check kept and with the checks the bounds prove removed
+def main(count, length, iterations):
+    harness.quiet()
+    parser.getParser()
+    source = generate(count, length)
+    checked, _ = optimized(source, False)
+    analysed, manager = optimized(source, True)
+    runs = {}
+    for label, module in (('checked', checked), ('analysed', analysed)):
+        executable = bytecode.lower(module)
+        built = pycode.lower(module)
+        runs[label] = (executable, built)
+    expected = harness.captured(lambda: vm.run(runs['checked'][0]))
+    assert all(harness.captured(lambda: vm.run(executable)) == expected for executable, _ in runs.values())
+    assert all(harness.captured(lambda: pycodeRuntime.run(built)) == expected for _, built in runs.values())
+    times = {}
+    with redirect_stdout(io.StringIO()):
+        for label, (executable, built) in runs.items():
+            times[label] = (harness.timeMedian(lambda: vm.run(executable), iterations), harness.timeMedian(lambda: pycodeRuntime.run(built), iterations))
+    print(f"{count} functions of {length} statements, median of {iterations}")
+    for each in manager.passes:
+        if isinstance(each, passes.RangeAnalysis):
+            print(each.summary())
+    harness.report("vm execute, all checks", times['checked'][0])
+    harness.report("vm execute, proven checks removed", times['analysed'][0])
+    harness.report("python code, all checks", times['checked'][1])
+    harness.report("python code, proven checks removed", times['analysed'][1])
+    print(f"{'vm speedup':<40}{times['checked'][0] / times['analysed'][0]:>10.2f}x")
+    print(f"{'python code speedup':<40}{times['checked'][1] / times['analysed'][1]:>10.2f}x")
+
+
+if __name__ == '__main__':
+    harness.run(main, functions, statements, repeat)
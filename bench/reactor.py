@@ -0,0 +1,131 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from bench import harness
+from src.compiler import bytecode
+from src.compiler import compiler
+from src.compiler import ir
+from src.compiler import pycode
+from src.parser import parser
+from src.runtime import arena
+from src.runtime import pycode as pycodeRuntime
+from src.runtime import reactor
+from src.runtime import shared
+from src.runtime import vm
+
+
+# usage: python -m bench.reactor [connections] [milliseconds per request] [threads]
+connections = 2000
+wait = 50
+threads = 64
+port = 18431
+
+# a handler that reads the request line and its headers up to the empty line, waits as if it asked another
+# service, and answers
+source = '''type u32 is unsigned<32>;
+fn handle(u32 connection) {
+    readLine(connection);
+    readLine(connection);
+    readLine(connection);
+    sleep(%d);
+    writeLine(connection, "HTTP/1.1 200 OK");
+    writeLine(connection, "Content-Length: 4");
+    writeLine(connection, "Connection: close");
+    writeLine(connection, "");
+    writeLine(connection, "ok");
+}
+fn main() {
+    u32 now = clock();
+    print(now);
+}
+'''
+
+
+async def request(number):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f"GET /{number} HTTP/1.1\r\nHost: bench\r\n\r\n".encode())
+    response = await reader.read()
+    writer.close()
+    return response.endswith(b"ok\r\n")
+
+
+async def requests(count):
+    return sum(await asyncio.gather(*(request(number) for number in range(count))))
+
+
+def clients(count):
+    start = time.perf_counter()
+    answered = asyncio.run(requests(count))
+    return answered, time.perf_counter() - start
+
+
+def serveWithReactor(built, count):
+    ready = threading.Event()
+    server = threading.Thread(target=pycodeRuntime.serve, args=(built, port, 'handle', count, ready))
+    server.start()
+    ready.wait()
+    result = clients(count)
+    server.join()
+    return result
+
+
+# what the vm does with the same handler: every i/o builtin blocks its thread on the background reactor, so a
+# connection takes a thread
+def serveWithThreads(executable, count, size):
+    index = [str(code.name) for code in executable.functions].index('handle')
+    heaps = shared.SharedHeap()
+    local = threading.local()
+    background = reactor.backgroundReactor()
+    pool = ThreadPoolExecutor(size)
+
+    def handle(connection):
+        if not hasattr(local, 'heap'):
+            local.heap = arena.Arena()
+        vm.execute(executable, index, [connection], local.heap, heaps)
+
+    async def accepting(ready):
+        loop = asyncio.get_running_loop()
+        done = asyncio.Event()
+        served = 0
+
+        async def connected(reader, writer):
+            nonlocal served
+            number = background.register(reactor.Stream(reader, writer))
+            await loop.run_in_executor(pool, handle, number)
+            await background.close(number)
+            served += 1
+            if served == count:
+                done.set()
+
+        server = await asyncio.start_server(connected, '127.0.0.1', port, backlog=4096)
+        ready.set()
+        async with server:
+            await done.wait()
+
+    ready = threading.Event()
+    serving = asyncio.run_coroutine_threadsafe(accepting(ready), background.loop)
+    ready.wait()
+    result = clients(count)
+    serving.result()
+    pool.shutdown()
+    return result
+
+
+def report(label, count, answered, seconds):
+    print(f"{label:<44}{answered:>6}/{count} answered {seconds * 1000:>10.1f} ms")
+
+
+def main(count, milliseconds, size):
+    harness.quiet()
+    parser.getParser()
+    checked, _ = compiler.compile(parser.parse('bench', (source % milliseconds).encode()))
+    module = compiler.optimize(ir.build(checked))[0]
+    built = pycode.lower(module)
+    print(f"{count} concurrent connections, {milliseconds} ms of waiting each")
+    report("reactor, one thread of coroutines", count, *serveWithReactor(built, count))
+    report(f"vm, blocking on {size} threads", count, *serveWithThreads(bytecode.lower(module), count, size))
+
+
+if __name__ == '__main__':
+    harness.run(main, connections, wait, threads)
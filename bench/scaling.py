@@ -0,0 +1,180 @@
+import contextlib
+import io
+import json
+import math
+import os
+import subprocess
+import sys
+from src.cache import cache
+from src.compiler import bytecode
+from src.compiler import compiler
+from src.compiler import ir
+from src.compiler import passes
+from src.logging import trace
+from src.parser import parser
+from src.runtime import vm
+from bench import generate
+from bench import harness
+
+
+# usage: python -m bench.scaling [--axis functions|statements|depth|types|fanout] [--sizes 100,200,400]
+#                                [--repeat N] [--save] [--compare commit-or-path]
+base = {'functions': 100, 'statements': 8, 'depth': 4, 'types': 4, 'fanout': 2}
+defaultSizes = {
+    'functions': [100, 200, 400, 800, 1600],
+    'statements': [4, 8, 16, 32, 64],
+    'depth': [4, 8, 16, 32, 64],
+    'types': [1, 2, 4, 8, 16],
+    'fanout': [1, 2, 4, 8, 16],
+}
+phases = ['lex', 'parse', 'flatten', 'register', 'check', 'ownership', 'escape', 'ir', 'optimize', 'lower', 'execute']
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# one full pipeline under the tracer, the compiler's own spans give the front end phases, spans of phases
+# this bench does not know yet are left out
+def measure(source):
+    trace.start(memory=False)
+    program = parser.parse('bench', source)
+    flatAst, _ = compiler.compile(program)
+    with trace.span('ir'):
+        module = ir.build(flatAst)
+    with trace.span('optimize'):
+        passes.optimize(module)
+    with trace.span('lower'):
+        executable = bytecode.lower(module)
+    with trace.span('execute'), contextlib.redirect_stdout(io.StringIO()):
+        vm.run(executable)
+    seconds = dict.fromkeys(phases, 0.0)
+    for event in trace.stop().events:
+        if event['cat'] != 'phase' or event['name'] not in seconds:
+            continue
+        seconds[event['name']] += event['dur'] / 1e6
+        inner = trace.splits.get(event['name'])
+        if inner in event['args']:
+            seconds[inner] += event['args'][inner]['seconds']
+            seconds[event['name']] -= event['args'][inner]['seconds']
+    return seconds
+
+
+# best of repeat per phase, the minimum is the least noisy estimate on a shared machine
+def run(axis, sizes, repeat):
+    results = {'commit': commit(), 'python': sys.version.split()[0], 'axis': axis, 'base': base,
+               'sizes': sizes, 'lines': [], 'bytes': [], 'phases': {phase: [] for phase in phases}}
+    for size in sizes:
+        source = generate.generate(**dict(base, **{axis: size}))
+        results['lines'].append(source.count('\n'))
+        results['bytes'].append(len(source))
+        best = None
+        for _ in range(repeat):
+            seconds = measure(source)
+            best = seconds if best is None else {phase: min(best[phase], seconds[phase]) for phase in phases}
+        for phase in phases:
+            results['phases'][phase].append(best[phase])
+    return results
+
+
+def commit():
+    try:
+        head = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=root, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=root, capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return f"{head}-dirty" if dirty.strip() else head
+
+
+# least squares slope of log(time) against log(source size): 1.0 is linear, 2.0 quadratic
+def exponent(sizes, seconds):
+    points = [(math.log(n), math.log(t)) for n, t in zip(sizes, seconds) if t > 0]
+    if len(points) < 2:
+        return float('nan')
+    meanX = sum(x for x, _ in points) / len(points)
+    meanY = sum(y for _, y in points) / len(points)
+    spread = sum((x - meanX) ** 2 for x, _ in points)
+    if spread == 0:
+        return float('nan')
+    return sum((x - meanX) * (y - meanY) for x, y in points) / spread
+
+
+def report(results):
+    print(f"axis '{results['axis']}' at {results['commit'][:12]}, time per phase in ms")
+    print(f"{results['axis']:<12}" + ''.join(f"{n:>11}" for n in results['sizes']))
+    print(f"{'lines':<12}" + ''.join(f"{n:>11}" for n in results['lines']))
+    print(f"{'kB':<12}" + ''.join(f"{n / 1024:>11.1f}" for n in results['bytes']) + f"{'exponent':>11}")
+    for phase in phases + ['total']:
+        seconds = results['phases'][phase] if phase != 'total' else [sum(values) for values in zip(*results['phases'].values())]
+        print(f"{phase:<12}" + ''.join(f"{t * 1000:>11.2f}" for t in seconds) + f"{exponent(results['bytes'], seconds):>11.2f}")
+
+
+def resultPath(axis, revision):
+    return os.path.join(cache.directory('bench'), f"scaling-{axis}-{revision}.json")
+
+
+def save(results):
+    path = resultPath(results['axis'], results['commit'])
+    scratch = cache.scratchPath(path)
+    with open(scratch, 'w') as file:
+        json.dump(results, file, indent=1)
+    os.replace(scratch, path)
+    print(f"saved {path}")
+
+
+def load(reference, axis):
+    path = reference
+    if not os.path.isfile(path):
+        prefix = os.path.basename(resultPath(axis, reference))[:-len('.json')]
+        matches = sorted(name for name in os.listdir(cache.directory('bench')) if name.startswith(prefix))
+        if not matches:
+            raise SystemExit(f"No saved results for '{reference}' in '{cache.directory('bench')}'")
+        path = os.path.join(cache.directory('bench'), matches[0])
+    with open(path, 'r') as file:
+        return json.load(file)
+
+
+# before / after per phase for every size and phase both runs measured
+def compare(before, after):
+    sizes = [size for size in after['sizes'] if size in before['sizes']]
+    print(f"speedup of {after['commit'][:12]} over {before['commit'][:12]}")
+    print(f"{'size':<12}" + ''.join(f"{size:>11}" for size in sizes))
+    for phase in [phase for phase in phases if phase in before['phases']]:
+        ratios = []
+        for size in sizes:
+            old = before['phases'][phase][before['sizes'].index(size)]
+            new = after['phases'][phase][after['sizes'].index(size)]
+            ratios.append(old / new if new > 0 else float('nan'))
+        print(f"{phase:<12}" + ''.join(f"{ratio:>10.2f}x" for ratio in ratios))
+
+
+def main(options):
+    axis = 'functions'
+    sizes = None
+    repeat = 3
+    store = False
+    reference = None
+    while options:
+        match options.pop(0):
+            case '--axis':
+                axis = options.pop(0)
+            case '--sizes':
+                sizes = [int(size) for size in options.pop(0).split(',')]
+            case '--repeat':
+                repeat = int(options.pop(0))
+            case '--save':
+                store = True
+            case '--compare':
+                reference = options.pop(0)
+            case option:
+                raise SystemExit(f"Unknown option '{option}'")
+    if axis not in base:
+        raise SystemExit(f"Unknown axis '{axis}', expected one of {list(base)}")
+    harness.quiet()
+    results = run(axis, sizes or defaultSizes[axis], repeat)
+    report(results)
+    if store:
+        save(results)
+    if reference:
+        compare(load(reference, axis), results)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
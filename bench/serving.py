@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from bench import generate
+from bench import harness
+
+
+# usage: python -m bench.serving [functions] [requests]
+functions = 20
+requests = 20
+
+
+def timeCommand(command, env, cwd):
+    start = time.perf_counter()
+    subprocess.run(command, env=env, cwd=cwd, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def timeMany(command, env, cwd, count):
+    times = sorted(timeCommand(command, env, cwd) for _ in range(count))
+    return times[len(times) // 2]
+
+
+def report(label, seconds, baseline):
+    print(f"{label:<28}{seconds * 1000:>10.1f} ms{baseline / seconds:>9.1f}x")
+
+
+def main(size, count):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'bench.ty')
+        with open(path, 'w') as file:
+            file.write(generate.generate(size, 8, 4, 4, 2))
+        socket = os.path.join(folder, 'compile.sock')
+        env = dict(os.environ, TYPE_CACHE_DIR=os.path.join(folder, 'cache'), TYPE_SOCKET=socket, PYTHONPATH=root)
+        cold = timeMany([sys.executable, '-m', 'src', 'run', path], env, folder, count)
+        server = subprocess.Popen([sys.executable, '-m', 'src', 'serve'], env=env, cwd=folder, stdout=subprocess.PIPE, text=True)
+        try:
+            server.stdout.readline()
+            client = timeMany([sys.executable, '-m', 'src', 'client', 'run', path], env, folder, count)
+            python = timeMany([sys.executable, '-c', 'pass'], env, folder, count)
+        finally:
+            subprocess.run([sys.executable, '-m', 'src', 'client', 'stop'], env=env, cwd=folder, check=True)
+            server.wait()
+    print(f"median of {count} runs of a {size} function program, build cache warm in both")
+    report("python -m src run", cold, cold)
+    report("python -m src client run", client, cold)
+    report("python -c pass", python, cold)
+
+
+if __name__ == '__main__':
+    harness.run(main, functions, requests)
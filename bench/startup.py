@@ -0,0 +1,66 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from ply.yacc import yacc
+from bench import harness
+from src.parser import parser
+from src.parser import lexer
+
+
+# usage: python -m bench.startup [file.ty] [iterations]
+source = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main2.ty')
+iterations = 50
+
+coldStart = (
+    "import time; from src.parser import parser; start = time.perf_counter(); "
+    "parser.parse('bench', open({path!r}).read()); "
+    "print(time.perf_counter() - start)"
+)
+
+
+def timeStartup(path, cacheDir):
+    env = dict(os.environ, TYPE_CACHE_DIR=cacheDir)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, '-c', coldStart.format(path=path)],
+                            cwd=root, env=env, capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+# what every parse() call used to pay: a fresh lexer and freshly generated tables
+def rebuildingParse(data):
+    parser.name = 'bench'
+    typeParser = yacc(module=parser, debug=False, write_tables=False)
+    parser.typeParser = typeParser
+    return typeParser.parse(data, lexer=lexer.lex(module=lexer))
+
+
+def timePerFile(parse, data, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        parse(data)
+    return (time.perf_counter() - start) / count
+
+
+def report(label, baseline, measured):
+    print(f"{label:<28}{baseline * 1000:>10.2f} ms{measured * 1000:>10.2f} ms{baseline / measured:>9.1f}x")
+
+
+def main(path, count):
+    with open(path, 'r') as file:
+        data = file.read()
+    with tempfile.TemporaryDirectory() as cacheDir:
+        cold = timeStartup(path, cacheDir)
+        warm = timeStartup(path, cacheDir)
+    rebuilding = timePerFile(rebuildingParse, data, count)
+    parser.typeParser = None
+    parser.getParser()
+    cached = timePerFile(lambda data: parser.parse('bench', data), data, count)
+    print(f"{'':<28}{'before':>13}{'after':>13}{'speedup':>10}")
+    report("startup (cold -> warm)", cold, warm)
+    report("per-file parse", rebuilding, cached)
+
+
+if __name__ == '__main__':
+    harness.run(main, source, iterations)
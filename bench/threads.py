@@ -0,0 +1,88 @@
+import time
+from bench import harness
+from src.compiler import bytecode
+from src.compiler import compiler
+from src.compiler import ir
+from src.parser import parser
+from src.runtime import arena
+from src.runtime import shared
+from src.runtime import threads
+from src.runtime import vm
+
+
+# usage: python -m bench.threads [calls] [workers] [repeat]
+calls = 400
+workers = 4
+repeat = 5
+
+# a handler doing enough arithmetic to be worth a worker, given a value every call shares
+source = '''type u32 is unsigned<32>;
+fn step(u32 x) u32 {
+    u32 a = new x * 7 + 3;
+    u32 b = a / 3 + x;
+    return b;
+}
+fn handle(u32 config, u32 id) u32 {
+    u32 total = shared config + id;
+    u32 v0 = step(total);
+''' + ''.join(f"    u32 v{i} = step(v{i - 1});\n" for i in range(1, 400)) + '''    return v399;
+}
+fn main() {
+    u32 r = handle(11, 0);
+    print(r);
+}
+'''
+
+
+def sequential(executable, index, count, config):
+    heap = arena.Arena()
+    heaps = shared.SharedHeap()
+    return [vm.execute(executable, index, [config.value, i], heap, heaps) for i in range(count)]
+
+
+def pooled(runtime, count, config):
+    futures = [runtime.call('handle', config, i) for i in range(count)]
+    return [future.result() for future in futures]
+
+
+# a shared cell takes a lock to be counted, an arena cell is a store into a list
+def cells(count):
+    heap = arena.Arena()
+    heaps = shared.SharedHeap()
+    start = time.perf_counter()
+    for i in range(count):
+        mark = heap.mark()
+        heap.store(i)
+        heap.release(mark)
+    arenaTime = time.perf_counter() - start
+    start = time.perf_counter()
+    for i in range(count):
+        heaps.share(i).release()
+    return arenaTime, time.perf_counter() - start
+
+
+def main(count, size, iterations):
+    harness.quiet()
+    parser.getParser()
+    checked, _ = compiler.compile(parser.parse('bench', source.encode()))
+    executable = bytecode.lower(compiler.optimize(ir.build(checked))[0])
+    index = [str(code.name) for code in executable.functions].index('handle')
+    print(f"{count} handler calls, {size} workers, median of {iterations}")
+    with threads.Runtime(executable, size) as threaded, threads.Runtime(executable, size, processes=True) as processes:
+        config = threaded.share(11)
+        expected = sequential(executable, index, count, config)
+        assert pooled(threaded, count, config) == expected
+        assert pooled(processes, count, config) == expected
+        harness.report("one thread", harness.timeMedian(lambda: sequential(executable, index, count, config), iterations))
+        harness.report(f"{size} os threads", harness.timeMedian(lambda: pooled(threaded, count, config), iterations))
+        harness.report(f"{size} worker processes", harness.timeMedian(lambda: pooled(processes, count, config), iterations))
+        config.release()
+        print(threaded.statistics().describe())
+        print(threaded.shared.statistics().describe())
+    arenaTime, sharedTime = cells(100000)
+    harness.report("100000 arena cells", arenaTime)
+    harness.report("100000 shared cells", sharedTime)
+
+
+if __name__ == '__main__':
+    harness.run(main, calls, workers, repeat)
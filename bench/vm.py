@@ -0,0 +1,138 @@
+import io
+from contextlib import redirect_stdout
+from bench import generate
+from bench import harness
+from src.ast import ast
+from src.ast import symbols
+from src.compiler import bytecode
+from src.compiler import compiler
+from src.compiler import functionregistry
+from src.compiler import ir
+from src.compiler import pycode
+from src.parser import parser
+from src.runtime import pycode as pycodeRuntime
+from src.runtime import vm
+
+
+# usage: python -m bench.vm [functions] [repeat]
+functions = 400
+repeat = 10
+
+# a program of many small functions calling each other and one of long arithmetic bodies, each as
+# generate.generate arguments after the function count: statements, depth, types, fanout
+workloads = (
+    ('calls', (1, 1, 1, 8)),
+    ('arithmetic', (30, 8, 4, 0)),
+)
+
+untyped = -1
+binaryOps = {
+    ast.Add: lambda left, right: left + right,
+    ast.Sub: lambda left, right: left - right,
+    ast.Mul: lambda left, right: left * right,
+    ast.Div: lambda left, right: left // right,
+}
+
+
+# what the vm replaced: the flat program interpreted a statement at a time, with the locals of every call in a
+# dict the way runtime/unchecked.py keeps them, extended to arithmetic and calls so it can run the same programs
+class TreeWalker:
+    def __init__(self, program):
+        self.functions = {}
+        self.masks = {}
+        for statement in program.statements:
+            match statement:
+                case ast.FnDef():
+                    self.functions[statement.name] = statement
+                case ast.TypeDef() if isinstance(statement.base_type, ast.Unsigned):
+                    self.masks[statement.typedata.name] = statement.base_type.high
+        self.builtins = functionregistry.builtinFunctions()
+
+    def run(self):
+        self.executeFunction(self.functions[symbols.intern('main')], [])
+
+    def executeFunction(self, function, args):
+        local_variable_registry = {}
+        for arg, value in zip(function.args, args):
+            local_variable_registry[arg.name] = (value, self.maskOf(arg.typedata))
+        for statement in function.statements:
+            match statement:
+                case ast.Declare():
+                    mask = self.maskOf(statement.typedata)
+                    value, _ = self.resolveExpression(statement.expr, local_variable_registry)
+                    local_variable_registry[statement.name] = (value & mask, mask)
+                case ast.TempDef():
+                    local_variable_registry[statement.name] = self.resolveExpression(statement.expr, local_variable_registry)
+                case ast.Return():
+                    value, _ = self.resolveExpression(statement.expr, local_variable_registry)
+                    return value & self.maskOf(function.rtype)
+                case ast.Call():
+                    self.call(statement, local_variable_registry)
+        return None
+
+    # a value and the mask of its width, the width of an operation is that of its first operand that has one
+    def resolveExpression(self, expr, local_variable_registry):
+        match expr:
+            case ast.Integer():
+                return expr.value, untyped
+            case ast.Ref():
+                return local_variable_registry[expr.name]
+            case ast.BinOp():
+                left, leftMask = self.resolveExpression(expr.left, local_variable_registry)
+                right, rightMask = self.resolveExpression(expr.right, local_variable_registry)
+                mask = leftMask if leftMask != untyped else rightMask
+                if isinstance(expr, ast.Div) and right == 0:
+                    raise SystemExit("panic: division by zero")
+                return binaryOps[type(expr)](left, right) & mask, mask
+            case ast.USub():
+                value, mask = self.resolveExpression(expr.expr, local_variable_registry)
+                return -value & mask, mask
+            case ast.Call():
+                return self.call(expr, local_variable_registry)
+            case _:
+                raise SystemExit(f"expression {expr} not implemented yet")
+
+    def call(self, call, local_variable_registry):
+        args = [self.resolveExpression(param.expr, local_variable_registry)[0] for param in call.params]
+        function = self.functions.get(call.name)
+        if function is None:
+            return self.builtins[call.name].body.remoteReference(*args), untyped
+        return self.executeFunction(function, args), self.maskOf(function.rtype)
+
+    def maskOf(self, typedata):
+        return self.masks.get(typedata.name, untyped)
+
+
+# the same checked program run by the tree walker, by the vm as lowered and after the passes, and as python
+# code, the backend that goes past what a dispatch loop can
+def main(count, iterations):
+    harness.quiet()
+    parser.getParser()
+    for label, shape in workloads:
+        source = generate.generate(count, *shape)
+        program, _ = compiler.compile(parser.parse('bench', source.encode()))
+        walker = TreeWalker(program)
+        lowered = bytecode.lower(ir.build(program))
+        optimized = bytecode.lower(compiler.optimize(ir.build(program))[0])
+        built = pycode.lower(compiler.optimize(ir.build(program))[0])
+        expected = harness.captured(walker.run)
+        assert harness.captured(lambda: vm.run(lowered)) == expected
+        assert harness.captured(lambda: vm.run(optimized)) == expected
+        assert harness.captured(lambda: pycodeRuntime.run(built)) == expected
+        with redirect_stdout(io.StringIO()):
+            walked = harness.timeMedian(walker.run, iterations)
+            plain = harness.timeMedian(lambda: vm.run(lowered), iterations)
+            passed = harness.timeMedian(lambda: vm.run(optimized), iterations)
+            python = harness.timeMedian(lambda: pycodeRuntime.run(built), iterations)
+        print(f"{label}: {count} functions of {shape[0]} statements, median of {iterations}")
+        harness.report("tree walker, dict locals", walked)
+        harness.report("vm", plain)
+        harness.report("vm, optimized", passed)
+        harness.report("python code", python)
+        print(f"{'vm speedup':<40}{walked / plain:>10.1f}x")
+        print(f"{'vm speedup, optimized':<40}{walked / passed:>10.1f}x")
+        print(f"{'python code speedup':<40}{walked / python:>10.1f}x")
+
+
+if __name__ == '__main__':
+    harness.run(main, functions, repeat)
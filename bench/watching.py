@@ -0,0 +1,50 @@
+import time
+from bench import generate
+from bench import harness
+from src.compiler import compiler
+from src.compiler import watch
+from src.parser import parser
+
+
+# usage: python -m bench.watching [functions]
+functions = 2000
+
+
+# an edit of one function body, of a signature other functions call, and of a type nearly everything uses
+def edits(source, count):
+    middle = source.index(f"fn f{count // 2}(")
+    body = source[:middle] + source[middle:].replace("return ", "return 1 + ", 1)
+    signature = source.replace("fn f0(t0 x, t0 y) t0", "fn f0(t0 x, mut t0 y) t0", 1)
+    typed = source.replace("type t1 is unsigned<16>;", "type t1 is unsigned<32>;", 1)
+    return [("function body", body), ("called signature", signature), ("shared type", typed)]
+
+
+def timeFull(source):
+    start = time.perf_counter()
+    compiler.compile(parser.parse('bench', source.encode()))
+    return time.perf_counter() - start
+
+
+def timeWatched(module, source):
+    start = time.perf_counter()
+    checked = module.update(source.encode())
+    return time.perf_counter() - start, checked
+
+
+def main(count):
+    harness.quiet()
+    parser.getParser()
+    source = generate.generate(count, 8, 4, 4, 2)
+    module = watch.Checked('bench')
+    module.update(source.encode())
+    print(f"{count} functions, {len(source) / 1e6:.2f} MB")
+    print(f"{'edit':<20}{'full compile':>16}{'watch':>13}{'checked':>12}{'speedup':>9}")
+    for label, edited in edits(source, count):
+        full = timeFull(edited)
+        watched, checked = timeWatched(module, edited)
+        print(f"{label:<20}{full * 1000:>13.1f} ms{watched * 1000:>10.1f} ms{checked:>7} of {len(module.chunks):<4}{full / watched:>8.1f}x")
+        module.update(source.encode())
+
+
+if __name__ == '__main__':
+    harness.run(main, functions)
@@ -1,15 +1,13 @@
-import uuid
+from . import consteval
 
 
 class Program:
+    __slots__ = ('name', 'statements')
+
     def __init__(self, name, statements):
         self.name = name
         self.statements = statements
 
-    def flatten(self):
-        self.statements = [stmt for statement in self.statements for stmt in statement.flatten()]
-        return self
-
     def __repr__(self):
         return (
             f"{type(self).__name__}("
@@ -18,21 +16,14 @@ class Program:
         )
 
 
+# anything holding a single expression in expr, the flattener reduces that expression in place
 class ExpressionContainer:
-    def flatten(self):
-        flatExpr = self.expr.flatten()
-        if isinstance(flatExpr, list):
-            self.expr = flatExpr.pop()
-            return flatExpr + [self]
-        elif isinstance(flatExpr, TempDef):
-            self.expr = flatExpr.expr
-            return [self]
-        else:
-            self.expr = flatExpr
-            return [self]
+    __slots__ = ()
 
 
 class Assign(ExpressionContainer):
+    __slots__ = ('name', 'expr')
+
     def __init__(self, name, expr):
         self.name = name
         self.expr = expr
@@ -46,6 +37,8 @@ class Assign(ExpressionContainer):
 
 
 class Argument:
+    __slots__ = ('typedata', 'name', 'take')
+
     def __init__(self, typedata, name, take):
         self.typedata = typedata
         self.name = name
@@ -61,6 +54,8 @@ class Argument:
 
 
 class Parameter(ExpressionContainer):
+    __slots__ = ('expr', 'give')
+
     def __init__(self, expr, give):
         self.expr = expr
         self.give = give
@@ -74,33 +69,12 @@ class Parameter(ExpressionContainer):
 
 
 class Call:
+    __slots__ = ('name', 'params')
+
     def __init__(self, name, params):
         self.name = name
         self.params = params
 
-    def flatten(self):
-        if isinstance(self.name, list):
-            self.name = [ref.name for ref in self.name]
-        else:
-            self.name = self.name.name
-        newStatements = []
-        flatParams = []
-        if self.params is not None:
-            for parameter in self.params:
-                for param in parameter.flatten():
-                    if isinstance(param, Parameter):
-                        if not isinstance(param.expr, Ref):
-                            temp = TempDef(param.expr)
-                            newStatements.append(temp)
-                            param.expr = Ref(temp.name)
-                            flatParams.append(param)
-                        else:
-                            flatParams.append(param)
-                    else:
-                        newStatements.append(param)
-        self.params = flatParams
-        return newStatements + [self]
-
     def __repr__(self):
         return (
             f"{type(self).__name__}("
@@ -110,6 +84,8 @@ class Call:
 
 
 class Declare(ExpressionContainer):
+    __slots__ = ('typedata', 'name', 'expr')
+
     def __init__(self, typedata, name, expr):
         self.typedata = typedata
         self.name = name
@@ -125,6 +101,8 @@ class Declare(ExpressionContainer):
 
 
 class New(ExpressionContainer):
+    __slots__ = ('expr',)
+
     def __init__(self, expr):
         self.expr = expr
 
@@ -136,6 +114,8 @@ class New(ExpressionContainer):
 
 
 class Shared(ExpressionContainer):
+    __slots__ = ('expr',)
+
     def __init__(self, expr):
         self.expr = expr
 
@@ -147,6 +127,8 @@ class Shared(ExpressionContainer):
 
 
 class Return(ExpressionContainer):
+    __slots__ = ('expr',)
+
     def __init__(self, expr):
         self.expr = expr
 
@@ -158,6 +140,8 @@ class Return(ExpressionContainer):
 
 
 class Pre(ExpressionContainer):
+    __slots__ = ('expr',)
+
     def __init__(self, expr):
         self.expr = expr
 
@@ -169,6 +153,8 @@ class Pre(ExpressionContainer):
 
 
 class Post(ExpressionContainer):
+    __slots__ = ('expr',)
+
     def __init__(self, expr):
         self.expr = expr
 
@@ -179,54 +165,31 @@ class Post(ExpressionContainer):
         )
 
 
-# todo: remove single ref tempdefs
 class TempDef:
-    def __init__(self, expr):
+    __slots__ = ('expr', 'name')
+
+    def __init__(self, expr, name):
         self.expr = expr
-        self.name = uuid.uuid4()
+        self.name = name
 
     def __repr__(self):
         return (
             f"{type(self).__name__}("
+            f"{self.name}, "
             f"{self.expr})"
         )
 
 
 class BinOp:
+    __slots__ = ('left', 'right', 'op')
+
     def __init__(self, left, right, op):
         self.left = left
         self.right = right
         self.op = op
 
-    def flatten(self):
-        self.right = self.right.flatten()
-        self.left = self.left.flatten()
-        if isinstance(self.left, Literal):
-            if isinstance(self.right, Literal):
-                return [self.reduceOrThrow()]
-        if isinstance(self.left, TempDef):
-            if isinstance(self.right, TempDef):
-                stmts = [self.left, self.right]
-                self.left = Ref(self.left.name)
-                self.right = Ref(self.right.name)
-                return stmts + [self]
-            stmts = [self.left]
-            self.left = Ref(self.left.name)
-            return stmts + [self]
-        if isinstance(self.right, TempDef):
-            stmts = [self.right]
-            self.right = Ref(self.right.name)
-            return stmts + [self]
-        return TempDef(self)
-
-    def reduceOrThrow(self):
-        if type(self.left) is type(self.right) and type(self.left):
-            try:
-                return eval(f"{type(self.left).__name__}(self.left.value {self.op} self.right.value)")
-            except Exception:
-                raise SystemExit(f"Invalid expression: '{self.left.value}' {self.op} '{self.right.value}'")
-        else:
-            raise SystemExit(f"Operator '{self.op}' undefined for literals {self.left} and {self.right}")
+    def reduceOrThrow(self, base_type=None):
+        return consteval.foldLiterals(self.op, self.left, self.right, base_type)
 
     def __repr__(self):
         return (
@@ -237,46 +200,41 @@ class BinOp:
 
 
 class Add(BinOp):
+    __slots__ = ()
+
     def __init__(self, left, right):
         super().__init__(left, right, '+')
 
 
 class Sub(BinOp):
+    __slots__ = ()
+
     def __init__(self, left, right):
         super().__init__(left, right, '-')
 
 
 class Mul(BinOp):
+    __slots__ = ()
+
     def __init__(self, left, right):
         super().__init__(left, right, '*')
 
 
 class Div(BinOp):
+    __slots__ = ()
+
     def __init__(self, left, right):
         super().__init__(left, right, '/')
 
 
 class UnaryOp(ExpressionContainer):
+    __slots__ = ('expr', 'op', 'ctr')
+
     def __init__(self, expr, op, ctr):
         self.expr = expr
         self.op = op
         self.ctr = ctr
 
-    def flatten(self):
-        if isinstance(self.expr, Literal):
-            try:
-                if isinstance(self.expr, String):
-                    raise SystemExit(f"Invalid unary op: '{self.op}' for '{self.expr.value}'")
-                return [self.ctr(eval(f"{self.op}{self.expr.value}"))]
-            except Exception:
-                raise SystemExit(f"Invalid unary op: '{self.op}' for '{self.expr.value}'")
-        super().flatten()
-        if isinstance(self.expr, Ref):
-            return [self]
-        temp = TempDef(self.expr)
-        self.expr = Ref(temp.name)
-        return [temp, self]
-
     def __repr__(self):
         return (
             f"{type(self).__name__}("
@@ -285,18 +243,19 @@ class UnaryOp(ExpressionContainer):
 
 
 class USub(UnaryOp):
+    __slots__ = ()
+
     def __init__(self, expr):
         super().__init__(expr, '-', USub)
 
 
 class TypeDef:
+    __slots__ = ('typedata', 'base_type')
+
     def __init__(self, typedata, base_type):
         self.typedata = typedata
         self.base_type = base_type
 
-    def flatten(self):
-        return [self]
-
     def __repr__(self):
         return (
             f"{type(self).__name__}("
@@ -306,12 +265,11 @@ class TypeDef:
 
 
 class Use:
+    __slots__ = ('locator',)
+
     def __init__(self, locator):
         self.locator = locator
 
-    def flatten(self):
-        return [self]
-
     def __repr__(self):
         return (
             f"{type(self).__name__}("
@@ -320,6 +278,8 @@ class Use:
 
 
 class RelLocator:
+    __slots__ = ('path',)
+
     def __init__(self, path):
         self.path = path
 
@@ -331,6 +291,8 @@ class RelLocator:
 
 
 class AbsLocator:
+    __slots__ = ('path',)
+
     def __init__(self, path):
         self.path = path
 
@@ -341,7 +303,11 @@ class AbsLocator:
         )
 
 
+# drops is filled in by the ownership check: for each statement, the owned values read last by it, and
+# allocations by the escape analysis: whether each allocation leaves the function
 class FnDef:
+    __slots__ = ('name', 'annotations', 'args', 'give', 'rtype', 'statements', 'drops', 'allocations')
+
     def __init__(self, name, annotations, args, give, rtype, statements):
         self.name = name
         self.annotations = annotations
@@ -349,10 +315,8 @@ class FnDef:
         self.give = give
         self.rtype = rtype
         self.statements = statements
-
-    def flatten(self):
-        self.statements = [stmt for statement in self.statements for stmt in statement.flatten()]
-        return [self]
+        self.drops = {}
+        self.allocations = {}
 
     def __repr__(self):
         return (
@@ -367,6 +331,8 @@ class FnDef:
 
 
 class Void:
+    __slots__ = ()
+
     def compare(self, other):
         return isinstance(other, Void)
 
@@ -377,6 +343,8 @@ class Void:
 
 
 class TypeData:
+    __slots__ = ('name', 'prefix', 'postfix')
+
     def __init__(self, name, prefix, postfix):
         self.name = name
         self.prefix = prefix
@@ -392,11 +360,12 @@ class TypeData:
 
 
 class Literal:
-    def flatten(self):
-        return self
+    __slots__ = ()
 
 
 class String(Literal):
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value
 
@@ -408,6 +377,8 @@ class String(Literal):
 
 
 class Integer(Literal):
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = int(value)
 
@@ -419,12 +390,11 @@ class Integer(Literal):
 
 
 class Ref:
+    __slots__ = ('name',)
+
     def __init__(self, name):
         self.name = name
 
-    def flatten(self):
-        return self
-
     def __repr__(self):
         return (
             f"{type(self).__name__}("
@@ -433,15 +403,19 @@ class Ref:
 
 
 class BaseType:
-    pass
+    __slots__ = ()
 
 
 class Unknown(BaseType):
+    __slots__ = ()
+
     def __repr__(self):
         return f"{type(self).__name__}()"
 
 
 class Unsigned(BaseType):
+    __slots__ = ('sizeof', 'low', 'high')
+
     def __init__(self, sizeof):
         self.sizeof = sizeof.value
         self.low = 0
@@ -457,6 +431,8 @@ class Unsigned(BaseType):
     def compare(self, other):
         if isinstance(other, Unsigned):
             return self.sizeof == other.sizeof
+        if isinstance(other, AnyUnsigned):
+            return other.compare(self)
         return False
 
     def __repr__(self):
@@ -464,3 +440,69 @@ class Unsigned(BaseType):
             f"{type(self).__name__}("
             f"{self.sizeof})"
         )
+
+
+# the integer a builtin returns, as wide as what it is used with and cut to that width where it is assigned,
+# high is set when the builtin can return a value that must not be cut, only types holding it compare equal
+class AnyUnsigned(BaseType):
+    __slots__ = ('low', 'high')
+
+    def __init__(self, high=None):
+        self.low = 0
+        self.high = high
+
+    def checkValid(self, expr):
+        if isinstance(expr, Integer):
+            if expr.value < self.low:
+                raise SystemExit(f"Integer literal '{expr.value}' out of range for type '{self}'")
+        else:
+            raise SystemExit(f"'{expr}' is not a valid '{self}'")
+
+    def compare(self, other):
+        if isinstance(other, AnyUnsigned):
+            return True
+        if isinstance(other, (Unsigned, Range)):
+            return self.high is None or other.high >= self.high
+        return False
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}("
+            f"{self.high})"
+        )
+
+
+# the unsigned values low to high, stored in the narrowest of 8, 16, 32 or 64 bits holding them, a value is
+# checked against the range wherever one is assigned
+class Range(BaseType):
+    __slots__ = ('sizeof', 'low', 'high')
+
+    def __init__(self, low, high):
+        self.low = low.value
+        self.high = high.value
+        if self.low > self.high:
+            raise SystemExit(f"Range '{self.low} .. {self.high}' is empty")
+        self.sizeof = next((size for size in (8, 16, 32, 64) if self.high < 2 ** size), None)
+        if self.sizeof is None:
+            raise SystemExit(f"Range '{self.low} .. {self.high}' does not fit in 64 bits")
+
+    def checkValid(self, expr):
+        if isinstance(expr, Integer):
+            if expr.value < self.low or expr.value > self.high:
+                raise SystemExit(f"Integer literal '{expr.value}' out of range for type '{self}'")
+        else:
+            raise SystemExit(f"'{expr}' is not a valid '{self}'")
+
+    def compare(self, other):
+        if isinstance(other, Range):
+            return self.low == other.low and self.high == other.high
+        if isinstance(other, AnyUnsigned):
+            return other.compare(self)
+        return False
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}("
+            f"{self.low}, "
+            f"{self.high})"
+        )
@@ -0,0 +1,105 @@
+import operator
+from . import ast
+
+
+# integer division floors like the vm and python code, no operand is negative so c's truncation agrees
+binary = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': operator.floordiv,
+}
+
+unary = {
+    '-': operator.neg,
+}
+
+
+# a literal without a type has no width and, as at runtime, has to stay within 64 unsigned bits
+untyped = (0, 2 ** 64 - 1)
+
+
+def rangeOf(base_type):
+    if isinstance(base_type, (ast.Unsigned, ast.Range)):
+        return base_type.low, base_type.high
+    if base_type is None:
+        return untyped
+    return None
+
+
+def describe(base_type):
+    return 'a value without a width' if base_type is None else f"'{base_type}'"
+
+
+# exact arithmetic, then an overflow check against the width of the type, or the 64 bits of no type
+def evaluateBinary(op, left, right, base_type=None):
+    if op not in binary:
+        raise SystemExit(f"Operator '{op}' undefined for integer literals")
+    try:
+        value = binary[op](left, right)
+    except ZeroDivisionError:
+        raise SystemExit(f"Division by zero in constant expression: '{left}' {op} '{right}'")
+    if overflows(value, base_type):
+        raise SystemExit(f"Constant expression '{left}' {op} '{right}' overflows {describe(base_type)}")
+    return value
+
+
+def evaluateUnary(op, value, base_type=None):
+    if op not in unary:
+        raise SystemExit(f"Invalid unary op: '{op}' for '{value}'")
+    result = unary[op](value)
+    if overflows(result, base_type):
+        raise SystemExit(f"Constant expression {op}'{value}' overflows {describe(base_type)}")
+    return result
+
+
+def overflows(value, base_type):
+    bounds = rangeOf(base_type)
+    return bounds is not None and not bounds[0] <= value <= bounds[1]
+
+
+# what the runtime computes: the exact result reduced to the width by masking
+def wrapBinary(op, left, right, mask):
+    return binary[op](left, right) & mask
+
+
+def wrapUnary(op, value, mask):
+    return unary[op](value) & mask
+
+
+def foldLiterals(op, left, right, base_type=None):
+    if isinstance(left, ast.Integer) and isinstance(right, ast.Integer):
+        return ast.Integer(evaluateBinary(op, left.value, right.value, base_type))
+    if isinstance(left, ast.String) and isinstance(right, ast.String) and op == '+':
+        return ast.String(left.value + right.value)
+    raise SystemExit(f"Operator '{op}' undefined for literals {left} and {right}")
+
+
+# folds every literal-only subtree bottom up in one pass, with an explicit stack instead of recursion
+def foldTree(root, base_type=None):
+    stack = [(root, False)]
+    results = []
+    while stack:
+        node, visited = stack.pop()
+        if isinstance(node, ast.BinOp):
+            if not visited:
+                stack.append((node, True))
+                stack.append((node.right, False))
+                stack.append((node.left, False))
+                continue
+            node.right = results.pop()
+            node.left = results.pop()
+            if isinstance(node.left, ast.Literal) and isinstance(node.right, ast.Literal):
+                node = foldLiterals(node.op, node.left, node.right, base_type)
+        elif isinstance(node, ast.UnaryOp):
+            if not visited:
+                stack.append((node, True))
+                stack.append((node.expr, False))
+                continue
+            node.expr = results.pop()
+            if isinstance(node.expr, ast.Integer):
+                node = ast.Integer(evaluateUnary(node.op, node.expr.value, base_type))
+            elif isinstance(node.expr, ast.Literal):
+                raise SystemExit(f"Invalid unary op: '{node.op}' for '{node.expr.value}'")
+        results.append(node)
+    return results.pop()
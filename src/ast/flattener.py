@@ -0,0 +1,113 @@
+from . import ast
+from . import consteval
+from . import symbols
+
+
+# what a reduced expression may be once it is hoisted out of its parent
+ROOT = 0      # kept as is, only its own operands are reduced
+OPERAND = 1   # a ref or a literal
+ARGUMENT = 2  # a ref, call parameters are always named
+
+
+# reduces every expression to one operator over refs and literals, everything nested is hoisted
+# into numbered temporaries ahead of the statement that uses it
+class Flattener:
+    def __init__(self):
+        self.temps = 0
+        self.globals = 0
+        self.depth = 0
+
+    # temporaries of a top level function restart at 1, nested functions keep counting so they never
+    # hide a temporary of the function around them, top level ones have their own names for the same reason
+    def temp(self, expr):
+        if self.depth == 0:
+            self.globals += 1
+            return ast.TempDef(expr, symbols.intern(f"%g{self.globals}"))
+        self.temps += 1
+        return ast.TempDef(expr, symbols.intern(f"%{self.temps}"))
+
+    # flat statements one at a time, in source order
+    def statements(self, statements):
+        for statement in statements:
+            match statement:
+                case ast.FnDef():
+                    if self.depth == 0:
+                        self.temps = 0
+                    self.depth += 1
+                    statement.statements = list(self.statements(statement.statements))
+                    self.depth -= 1
+                case ast.Call():
+                    hoisted = []
+                    self.expression(statement, hoisted)
+                    yield from hoisted
+                case ast.ExpressionContainer():
+                    hoisted = []
+                    statement.expr = self.expression(consteval.foldTree(statement.expr), hoisted)
+                    yield from hoisted
+                case ast.TypeDef() | ast.Use():
+                    pass
+                case _:
+                    raise SystemExit(f"Statement '{statement}' not supported by the flattener")
+            yield statement
+
+    # post order with an explicit stack, a finished subtree is hoisted the moment it is complete so
+    # temporaries come out in evaluation order, left before right
+    def expression(self, root, hoisted):
+        stack = [(root, ROOT, False)]
+        results = []
+        while stack:
+            node, mode, visited = stack.pop()
+            if not visited:
+                children = self.enter(node)
+                if children:
+                    stack.append((node, mode, True))
+                    stack.extend(reversed(children))
+                    continue
+            else:
+                self.replaceChildren(node, results)
+            if mode == ROOT or isinstance(node, ast.Ref) or (mode == OPERAND and isinstance(node, ast.Literal)):
+                results.append(node)
+            else:
+                temp = self.temp(node)
+                hoisted.append(temp)
+                results.append(ast.Ref(temp.name))
+        return results.pop()
+
+    # the operands still to reduce, literal subtrees under an operator were already folded with it,
+    # parameters and wrapped expressions start a new expression and are folded on their own
+    def enter(self, node):
+        match node:
+            case ast.BinOp():
+                return [(node.left, OPERAND, False), (node.right, OPERAND, False)]
+            case ast.UnaryOp():
+                return [(node.expr, OPERAND, False)]
+            case ast.Call():
+                node.name = [ref.name for ref in node.name] if isinstance(node.name, list) else node.name.name
+                node.params = node.params or []
+                return [(consteval.foldTree(param.expr), ARGUMENT, False) for param in node.params]
+            case ast.New() | ast.Shared():
+                return [(consteval.foldTree(node.expr), ROOT, False)]
+        return []
+
+    def replaceChildren(self, node, results):
+        match node:
+            case ast.BinOp():
+                node.right = results.pop()
+                node.left = results.pop()
+            case ast.UnaryOp():
+                node.expr = results.pop()
+            case ast.Call():
+                for param in reversed(node.params):
+                    param.expr = results.pop()
+            case ast.New() | ast.Shared():
+                node.expr = results.pop()
+
+
+# yields the flat top level statements as they are produced so a consumer can work on them before the
+# rest of the program is flattened, the program holds the flat statements once the stream is exhausted
+def flatten(program):
+    flat = []
+    for statement in Flattener().statements(program.statements):
+        flat.append(statement)
+        yield statement
+    program.statements = flat
@@ -0,0 +1,41 @@
+# every identifier, temporary and qualified scope path is interned once and handled as a small integer,
+# so comparing names and hashing them into symbol tables never touches the characters again, the table
+# holds every distinct name the process has seen until reset
+names = ['']
+table = {}
+
+
+# an int that prints as the name it stands for, and is re-interned by name when unpickled in another process
+class Symbol(int):
+    __slots__ = ()
+
+    def __str__(self):
+        return names[self]
+
+    def __repr__(self):
+        return names[self]
+
+    def __format__(self, spec):
+        return format(names[self], spec)
+
+    def __reduce__(self):
+        return (intern, (names[self],))
+
+
+# only once no symbol from before is held anywhere, a pickled symbol is interned again by name when loaded, so
+# the compile server resets between requests and the language server once its last document closes
+def reset():
+    del names[1:]
+    table.clear()
+
+
+def intern(name):
+    if isinstance(name, Symbol):
+        return name
+    symbol = table.get(name)
+    if symbol is None:
+        # ids start at 1 so no symbol is ever falsy
+        symbol = Symbol(len(names))
+        names.append(name)
+        table[name] = symbol
+    return symbol
@@ -0,0 +1,162 @@
+import hashlib
+import os
+import pickle
+import time
+
+
+# all persistent compiler state lives under one root, never in the working directory
+def directory(*parts):
+    root = os.environ.get('TYPE_CACHE_DIR')
+    if not root:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        root = os.path.join(base, 'type-lang')
+    path = os.path.join(os.path.abspath(root), *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+# write to a scratch file first so concurrent builds never observe a partial entry
+def scratchPath(path):
+    return f"{path}.{os.getpid()}.tmp"
+
+
+# entries unused for this long, or beyond this total size, are evicted oldest first
+maxBytes = int(os.environ.get('TYPE_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+maxAge = int(os.environ.get('TYPE_CACHE_MAX_AGE', 7 * 24 * 60 * 60))
+
+fingerprint = None
+
+
+# the compiler's version is the hash of its own sources, so any change to it invalidates old builds
+def compilerVersion():
+    global fingerprint
+    if fingerprint is None:
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        digest = hashlib.sha256()
+        for folder, dirs, files in sorted(os.walk(root)):
+            dirs.sort()
+            for file in sorted(files):
+                if file.endswith('.py'):
+                    path = os.path.join(folder, file)
+                    digest.update(os.path.relpath(path, root).encode())
+                    with open(path, 'rb') as source:
+                        digest.update(source.read())
+        fingerprint = digest.hexdigest()
+    return fingerprint
+
+
+class BuildCache:
+    def __init__(self, maxBytes=maxBytes, maxAge=maxAge):
+        self.maxBytes = maxBytes
+        self.maxAge = maxAge
+        self.root = directory('build')
+
+    def key(self, name, source, *extra):
+        digest = hashlib.sha256(compilerVersion().encode())
+        digest.update(b'\0' + name.encode() + b'\0')
+        digest.update(source.encode() if isinstance(source, str) else source)
+        for part in extra:
+            digest.update(b'\0' + part.encode())
+        return digest.hexdigest()
+
+    def load(self, key):
+        data = self.read(key)
+        if data is None:
+            return None
+        try:
+            return pickle.loads(data)
+        except (EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            self.discard(key)
+            return None
+
+    def store(self, key, entry):
+        self.write(key, pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def read(self, key):
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+        except FileNotFoundError:
+            return None
+        os.utime(path)
+        return data
+
+    def write(self, key, data):
+        path = self.path(key)
+        scratch = scratchPath(path)
+        with open(scratch, 'wb') as file:
+            file.write(data)
+        os.replace(scratch, path)
+        self.evict()
+
+    def discard(self, key):
+        removeQuietly(self.path(key))
+
+    def evict(self):
+        now = time.time()
+        entries = []
+        for file in os.listdir(self.root):
+            if not file.endswith('.pickle'):
+                continue
+            path = os.path.join(self.root, file)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if now - stat.st_mtime > self.maxAge:
+                removeQuietly(path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(entry[1] for entry in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.maxBytes:
+                break
+            removeQuietly(path)
+            total -= size
+
+    def path(self, key):
+        return os.path.join(self.root, f"{key}.pickle")
+
+
+# a long running process keeps the pickled entries it has seen in memory in front of the disk, so a
+# warm build never touches the disk, every load still unpickles a fresh copy nobody else holds
+class ResidentCache(BuildCache):
+    def __init__(self, maxBytes=maxBytes, maxAge=maxAge):
+        super().__init__(maxBytes, maxAge)
+        self.entries = {}
+        self.size = 0
+
+    def read(self, key):
+        data = self.entries.pop(key, None)
+        if data is None:
+            data = super().read(key)
+            if data is None:
+                return None
+            self.size += len(data)
+        # reinserted so the dict stays ordered from least to most recently used
+        self.entries[key] = data
+        self.trim()
+        return data
+
+    def write(self, key, data):
+        super().write(key, data)
+        self.size -= len(self.entries.pop(key, b''))
+        self.entries[key] = data
+        self.size += len(data)
+        self.trim()
+
+    def discard(self, key):
+        self.size -= len(self.entries.pop(key, b''))
+        super().discard(key)
+
+    def trim(self):
+        while self.size > self.maxBytes and self.entries:
+            self.size -= len(self.entries.pop(next(iter(self.entries))))
+
+
+def removeQuietly(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,129 @@
+from .parser import parser
+from .parser import fastlexer
+from .compiler import compiler
+from .compiler import escape
+from .compiler import bytecode
+from .compiler import ir
+from .compiler import modules
+from .compiler import native
+from .compiler import pycode
+from .compiler import watch
+from .runtime import arena
+from .runtime import shared as sharedHeap
+from .runtime import threads
+from .runtime import vm
+from .runtime import native as nativeRuntime
+from .runtime import pycode as pycodeRuntime
+from .logging import logger
+from .logging import trace
+
+
+# one command line, without the program name, run either directly or on behalf of a client by the compile server
+def execute(argv, buildCache=None):
+    if len(argv) < 2:
+        raise SystemExit("usage: python -m src lex|ast|build|run|listen|ir|c|watch file.ty [-d] [-j jobs] [--backend vm|c|python] [--heap] [--threads n] [--port port] [--timings] [--trace path]")
+    command, path = argv[0], argv[1]
+    name = path.split('.')[0]
+    jobs = 1
+    timings = False
+    tracePath = None
+    backend = 'vm'
+    heap = None
+    shared = None
+    port = 8080
+    threadCount = 0
+    options = list(argv[2:])
+    while options:
+        match options.pop(0):
+            case '-d':
+                logger.level = logger.LogLevel.DEBUG
+            case '-j':
+                jobs = int(options.pop(0))
+            case '--timings':
+                timings = True
+            case '--heap':
+                heap = arena.Arena()
+                shared = sharedHeap.SharedHeap()
+            case '--threads':
+                threadCount = int(options.pop(0))
+            case '--port':
+                port = int(options.pop(0))
+            case '--trace':
+                tracePath = options.pop(0)
+            case '--backend':
+                backend = options.pop(0)
+                if backend not in ('vm', 'c', 'python'):
+                    raise SystemExit(f"Unknown backend '{backend}'")
+            case option:
+                raise SystemExit(f"Unknown option '{option}'")
+    if threadCount and (command != 'run' or backend != 'vm'):
+        raise SystemExit("Option '--threads' runs the vm backend only")
+    if timings or tracePath:
+        trace.start()
+    if command == 'lex':
+        fastlexer.test(path)
+    elif command == 'build':
+        modules.build(path, jobs, buildCache)
+    elif command == 'run' and backend == 'python':
+        graph, units = modules.build(path, jobs, buildCache)
+        built = pycode.build(graph, units, buildCache)
+        with trace.span('execute'):
+            pycodeRuntime.run(built, heap, shared)
+    elif command == 'run':
+        graph, units = modules.build(path, jobs, buildCache)
+        with trace.span('ir'):
+            module = ir.link(units, graph.entry)
+        with trace.span('optimize'):
+            module = compiler.optimize(module)[0]
+        if backend == 'c':
+            with trace.span('lower'):
+                source = native.lower(module)
+            with trace.span('cc'):
+                binary = native.build(source)
+            with trace.span('execute'):
+                nativeRuntime.run(binary)
+            # a native binary keeps its cells in its c frames, there is no arena to report on
+            heap = None
+        else:
+            with trace.span('lower'):
+                executable = bytecode.lower(module)
+            with trace.span('execute'):
+                if threadCount:
+                    # main runs on a worker of the threaded runtime, allocating from an arena of the worker's own
+                    with threads.Runtime(executable, threadCount) as runtime:
+                        runtime.call('main').result()
+                    if heap is not None:
+                        heap, shared = runtime, runtime.shared
+                else:
+                    vm.run(executable, heap, shared)
+    # every connection to the port is a call of handle(connection), all of them coroutines on this thread
+    elif command == 'listen':
+        graph, units = modules.build(path, jobs, buildCache)
+        built = pycode.build(graph, units, buildCache)
+        print(f"listening on port {port}", flush=True)
+        pycodeRuntime.serve(built, port, shared=shared)
+    elif command == 'watch':
+        watch.watch(path)
+    elif command == 'ir':
+        graph, units = modules.build(path, jobs, buildCache)
+        module, manager = compiler.optimize(ir.link(units, graph.entry))
+        print(module.dump())
+        print(manager.report())
+        print(escape.statistics([unit.program for unit in units]).describe())
+    elif command == 'c':
+        graph, units = modules.build(path, jobs, buildCache)
+        print(native.lower(compiler.optimize(ir.link(units, graph.entry))[0]))
+    elif command == 'ast':
+        fastlexer.test(path)
+        print("========== ast ==========")
+        print(parser.parseFile(name, path))
+    else:
+        print('Invalid command')
+    if heap is not None:
+        print(heap.statistics().describe())
+        print(shared.statistics().describe())
+    if trace.enabled():
+        if tracePath:
+            trace.tracer.write(tracePath)
+        if timings:
+            print(trace.tracer.report())
@@ -1,3 +1,7 @@
+import asyncio
+import time
+from ..runtime import reactor
+
 
 def remotePrint(string):
     print(string)
@@ -5,3 +9,63 @@ def remotePrint(string):
 
 def remoteInput(string):
     return input(string)
+
+
+# what a program writes is what print would show, a string as it is and an integer in decimal
+def text(value):
+    return str(value).encode()
+
+
+# the i/o builtins are coroutines, code that can await runs them on the event loop it runs on, code that can
+# not blocks its thread on them, see reactor.blocking
+async def remoteSleep(milliseconds):
+    await asyncio.sleep(milliseconds / 1000)
+
+
+def remoteClock():
+    return int(time.monotonic() * 1000)
+
+
+async def remoteListen(port):
+    return await reactor.current().listen(port)
+
+
+async def remoteAccept(listener):
+    return await reactor.current().accept(listener)
+
+
+async def remoteConnect(port):
+    return await reactor.current().connect(port)
+
+
+async def remoteOpen(path):
+    return await reactor.current().open(path, 'rb')
+
+
+async def remoteCreate(path):
+    return await reactor.current().open(path, 'wb')
+
+
+async def remoteReadByte(handle):
+    return await reactor.current().lookup(handle).readByte()
+
+
+# the line read without its line break, a string given to the caller as input's is, empty at the end
+async def remoteReadLine(handle):
+    return (await reactor.current().lookup(handle).readLine()).decode(errors='replace')
+
+
+async def remoteWrite(handle, value):
+    await reactor.current().lookup(handle).send(text(value))
+
+
+async def remoteWriteLine(handle, value):
+    await reactor.current().lookup(handle).send(text(value) + b'\r\n')
+
+
+async def remoteFlush(handle):
+    await reactor.current().lookup(handle).flush()
+
+
+async def remoteClose(handle):
+    await reactor.current().close(handle)
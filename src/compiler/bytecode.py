@@ -0,0 +1,231 @@
+import functools
+import inspect
+from . import functionregistry
+from . import ir
+from ..runtime import reactor
+
+
+# opcodes, every instruction is an (opcode, argument) pair in a flat list
+LOAD_CONST = 0
+LOAD_LOCAL = 1
+STORE_LOCAL = 2
+ADD = 3
+SUB = 4
+MUL = 5
+DIV = 6
+NEG = 7
+WRAP = 8
+CALL = 9
+CALL_BUILTIN = 10
+RETURN = 11
+POP = 12
+CHECK = 13
+LOAD_LAST = 14
+DROP = 15
+NEW = 16
+LOAD_HEAP = 17
+SHARE = 18
+LOAD_SHARED = 19
+RELEASE = 20
+OVERFLOW = 21
+
+opcodes = (LOAD_CONST, LOAD_LOCAL, STORE_LOCAL, ADD, SUB, MUL, DIV, NEG, WRAP, CALL, CALL_BUILTIN, RETURN, POP, CHECK, LOAD_LAST, DROP,
+           NEW, LOAD_HEAP, SHARE, LOAD_SHARED, RELEASE, OVERFLOW)
+opnames = ('LOAD_CONST', 'LOAD_LOCAL', 'STORE_LOCAL', 'ADD', 'SUB', 'MUL', 'DIV', 'NEG', 'WRAP', 'CALL', 'CALL_BUILTIN', 'RETURN', 'POP', 'CHECK',
+           'LOAD_LAST', 'DROP', 'NEW', 'LOAD_HEAP', 'SHARE', 'LOAD_SHARED', 'RELEASE',
+           'OVERFLOW')
+
+binaryOps = {'+': ADD, '-': SUB, '*': MUL, '/': DIV}
+
+
+class Code:
+    def __init__(self, name, arity, slotNames, instructions, constants):
+        self.name = name
+        self.arity = arity
+        self.slotNames = slotNames
+        self.slotCount = len(slotNames)
+        self.instructions = instructions
+        self.constants = constants
+
+    def disassemble(self):
+        lines = [f"{self.name}({self.arity} args, {self.slotCount} slots):"]
+        for pc in range(0, len(self.instructions), 2):
+            op, arg = self.instructions[pc], self.instructions[pc + 1]
+            if op == LOAD_CONST or op == CHECK:
+                detail = repr(self.constants[arg])
+            elif op in (LOAD_LOCAL, STORE_LOCAL, LOAD_LAST, DROP, RELEASE):
+                detail = str(self.slotNames[arg])
+            else:
+                detail = str(arg)
+            lines.append(f"  {pc:>4} {opnames[op]:<13}{detail}")
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}("
+            f"{self.name}, "
+            f"{self.arity}, "
+            f"{self.slotCount})"
+        )
+
+
+class Executable:
+    def __init__(self, functions, builtins, entry):
+        self.functions = functions
+        self.builtins = builtins
+        self.entry = entry
+
+    def disassemble(self):
+        return '\n\n'.join(code.disassemble() for code in self.functions)
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}("
+            f"{self.functions}, "
+            f"entry={self.entry})"
+        )
+
+
+# lowers an ssa module into one Code object per function
+class Lowering:
+    def __init__(self, module):
+        self.module = module
+        self.builtins = []
+        self.builtinIndex = {}
+
+    def lower(self):
+        functions = [FunctionLowering(self, function).lower() for function in self.module.functions]
+        return Executable(functions, self.builtins, self.module.entry)
+
+    def builtin(self, name, count):
+        key = (name, count)
+        if key not in self.builtinIndex:
+            builtins = functionregistry.builtinFunctions()
+            if name not in builtins:
+                raise SystemExit(f"Function '{name}' is undefined")
+            self.builtinIndex[key] = len(self.builtins)
+            reference = builtins[name].body.remoteReference
+            # the vm can not await, an i/o builtin blocks the thread running it instead
+            if inspect.iscoroutinefunction(reference):
+                reference = functools.partial(reactor.blocking, reference)
+            self.builtins.append((reference, count))
+        return self.builtinIndex[key]
+
+
+class FunctionLowering:
+    def __init__(self, lowering, function):
+        self.lowering = lowering
+        self.function = function
+        self.slots = {}
+        self.slotNames = []
+        self.instructions = []
+        self.constants = []
+        self.constantIndex = {}
+        self.onStack = None
+        # where the latest load of each slot is, a dropped value's last load also clears its slot
+        self.loads = {}
+
+    def lower(self):
+        for param in self.function.params:
+            self.slot(param)
+        body = [instruction for instruction in self.function.instructions() if not isinstance(instruction, ir.Param)]
+        # a drop is no use of a value and never keeps it off the stack, it turns the load that read the value
+        # last into one clearing its slot, or clears a slot nothing read, only a shared cell is used by its drop
+        # since releasing it reads the slot
+        uses = self.function.uses()
+        operations = [instruction for instruction in body if not isinstance(instruction, ir.Drop)]
+        for instruction in body:
+            if isinstance(instruction, ir.Drop) and instruction.operand in uses and not isinstance(instruction.operand, ir.Share):
+                uses[instruction.operand] -= 1
+        following = dict(zip(operations, operations[1:]))
+        for instruction in body:
+            if isinstance(instruction, ir.Drop):
+                if isinstance(instruction.operand, ir.Share):
+                    self.emit(RELEASE, self.slots[instruction.operand])
+                elif instruction.operand in self.slots:
+                    self.drop(self.slots[instruction.operand])
+                continue
+            self.instruction(instruction)
+            if isinstance(instruction, ir.Return):
+                continue
+            successor = following.get(instruction)
+            count = uses.get(instruction, 0)
+            if count == 0:
+                self.emit(POP, 0)
+            elif count == 1 and successor is not None and successor.operands()[:1] == [instruction]:
+                # a value used once, first thing by the next instruction, never needs a slot
+                self.onStack = instruction
+            else:
+                self.emit(STORE_LOCAL, self.slot(instruction))
+        return Code(self.function.name, len(self.function.params), self.slotNames, self.instructions, self.constants)
+
+    # emits code leaving the value defined by instruction on the stack
+    def instruction(self, instruction):
+        for operand in instruction.operands():
+            self.push(operand)
+        match instruction:
+            case ir.Binary():
+                self.emit(binaryOps[instruction.op], ir.untyped if instruction.exact else instruction.mask)
+                if ir.mayOverflow(instruction):
+                    self.emit(OVERFLOW, 0)
+            case ir.Negate():
+                self.emit(NEG, ir.untyped if instruction.exact else instruction.mask)
+                if ir.mayOverflow(instruction):
+                    self.emit(OVERFLOW, 0)
+            case ir.Wrap():
+                if not instruction.exact:
+                    self.emit(WRAP, instruction.mask)
+            case ir.Copy():
+                pass
+            case ir.Share():
+                self.emit(SHARE, 0)
+            case ir.New():
+                self.emit(NEW, 0)
+            case ir.Load():
+                self.emit(LOAD_SHARED if isinstance(instruction.pointer, ir.Share) else LOAD_HEAP, 0)
+            case ir.Check():
+                self.emit(CHECK, self.constant((instruction.low, instruction.high)))
+            case ir.Call():
+                self.emit(CALL, instruction.function)
+            case ir.Builtin():
+                self.emit(CALL_BUILTIN, self.lowering.builtin(instruction.name, len(instruction.args)))
+            case ir.Return():
+                self.emit(RETURN, 0)
+            case _:
+                raise SystemExit(f"Instruction '{instruction}' not supported by the bytecode compiler")
+
+    def push(self, value):
+        if isinstance(value, ir.Constant):
+            self.emit(LOAD_CONST, self.constant(value.value))
+        elif value is self.onStack:
+            self.onStack = None
+        else:
+            self.loads[self.slots[value]] = len(self.instructions)
+            self.emit(LOAD_LOCAL, self.slots[value])
+
+    def drop(self, slot):
+        if slot in self.loads:
+            self.instructions[self.loads.pop(slot)] = LOAD_LAST
+        else:
+            self.emit(DROP, slot)
+
+    def emit(self, op, arg):
+        self.instructions.append(op)
+        self.instructions.append(arg)
+
+    def constant(self, value):
+        key = (type(value), value)
+        if key not in self.constantIndex:
+            self.constantIndex[key] = len(self.constants)
+            self.constants.append(value)
+        return self.constantIndex[key]
+
+    def slot(self, value):
+        if value not in self.slots:
+            self.slots[value] = len(self.slotNames)
+            self.slotNames.append(value.hint if value.hint is not None else f"%{len(self.slotNames)}")
+        return self.slots[value]
+
+
+def lower(module):
+    return Lowering(module).lower()
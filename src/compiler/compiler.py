@@ -1,7 +1,12 @@
 from . import typeregistry
 from . import functionregistry
 from . import definitions
+from . import escape
+from . import ownership
+from . import passes
+from ..ast import flattener
 from ..logging import logger
+from ..logging import trace
 from ctypes import *
 
 
@@ -10,17 +15,32 @@ log = logger.Log()
 astLine = "========== ast =========="
 flatAstLine = "========== flat ast =========="
 registryLine = "========== registry =========="
+irLine = "========== ir =========="
+passLine = "========== passes =========="
 
 
-def compile(ast):
-    log.debug(f"{astLine}\n{ast}\n{astLine}")
-    flatAst = ast.flatten()
-    log.debug(f"{flatAstLine}\n{flatAst}\n{flatAstLine}")
-    checker = definitions.DefinitionRegistry(flatAst)
-    checker.check()
-    log.debug(f"{registryLine}\n{checker.registry}\n{registryLine}")
-    log.error("Compiler only implemented up to type checking")
-    return flatAst
+def optimize(module):
+    module, manager = passes.optimize(module)
+    if logger.debugging():
+        log.debug(f"{irLine}\n{module.dump()}\n{irLine}")
+        log.debug(f"{passLine}\n{manager.report()}\n{passLine}")
+    return module, manager
+
+
+def compile(ast, imports=None):
+    if logger.debugging():
+        log.debug(f"{astLine}\n{ast}\n{astLine}")
+    checker = definitions.DefinitionRegistry(ast, imports)
+    checker.check(flattener.flatten(ast))
+    with trace.span('ownership', module=ast.name):
+        ownership.check(ast, checker.registry)
+    with trace.span('escape', module=ast.name):
+        escape.analyze(ast, checker.registry)
+    if logger.debugging():
+        log.debug(f"{flatAstLine}\n{ast}\n{flatAstLine}")
+        log.debug(f"{registryLine}\n{checker.registry}\n{registryLine}")
+        log.debug(escape.statistics([ast]).describe())
+    return (ast, checker.registry)
     # build the program type registry
     # program_types = typeregistry.getProgramLevelTypes(ast)
     # build the function registry (should include function scoped type registries)
@@ -1,22 +1,39 @@
 from ..ast import ast
 from ..logging import logger
+from ..logging import trace
+from . import functionregistry
+from . import scopes
 
 
 log = logger.Log()
 
 class DefinitionRegistry:
-    def __init__(self, program):
+    def __init__(self, program, imports=None):
         self.program = program
         if not isinstance(program, ast.Program):
             raise SystemExit(f"ERROR: The ast root is not a program, is {type(program)}")
-        self.registry = {}
+        self.registry = scopes.Scope(program.name, imports, program.name)
+        self.declared = set()
+        self.builtins = functionregistry.builtinFunctions()
+        while imports is not None:
+            self.declared.update(imports.symbols)
+            imports = imports.parent
 
-    def check(self):
-        namespace = (self.program.name, )
-        for statement in self.program.statements:
-            self.maybeAddDefinition(statement, namespace)
-        for definition in self.registry.copy():
-            self.definitionHandler(definition, namespace)
+    # statements can be a stream, such as the flattener's, which is consumed while registering
+    def check(self, statements=None):
+        namespace = self.registry
+        if statements is None:
+            statements = self.program.statements
+        with trace.span('register', module=self.program.name) as span:
+            if trace.enabled():
+                statements = trace.TimedStream(statements)
+            for statement in statements:
+                self.maybeAddDefinition(statement, namespace)
+            if trace.enabled():
+                span.annotate(flatten=statements.measured())
+        with trace.span('check', module=self.program.name):
+            for definition in list(namespace.symbols):
+                self.definitionHandler(definition, namespace)
 
     def maybeAddDefinition(self, statement, namespace):
         match statement:
@@ -27,20 +44,29 @@ class DefinitionRegistry:
             case ast.Declare():
                 base_type = self.resolveTypeOf(statement.typedata, namespace)
                 expr = self.checkExpression(statement.expr, base_type, namespace)
+                # a mutable variable's initial value is not a constant later statements can rely on
+                if statement.typedata.prefix == 'mut':
+                    expr = None
                 self.addToRegistry(statement.name, (expr, base_type), namespace, "Variable")
             case ast.TempDef():
                 expr_type = self.resolveTypeOf(statement.expr, namespace)
                 expr = self.checkExpression(statement.expr, expr_type, namespace)
                 self.addToRegistry(statement.name, (expr, expr_type), namespace, "Temp")
+            case ast.Use():
+                pass # resolved by the module graph before checking
             case _:
                 log.warning(f"Statement '{statement}' not added to registry")
 
     def definitionHandler(self, definition, namespace):
-        node = self.registry[definition][namespace]
+        node = namespace.symbols[definition]
         match node:
             case ast.FnDef():
-                for statement in node.statements:
-                    self.statementHandler(statement, namespace + (node.name,))
+                inner = namespace.child(node.name)
+                with trace.span(inner.path, 'function'):
+                    for arg in node.args:
+                        self.addToRegistry(arg.name, (None, self.resolveTypeOf(arg.typedata, inner)), inner, "Argument")
+                    for statement in node.statements:
+                        self.statementHandler(statement, inner)
             case _:
                 log.warning(f"definition '{definition}' not checked")
 
@@ -53,24 +79,21 @@ class DefinitionRegistry:
                 self.definitionHandler(statement.name, namespace)
             case ast.Declare():
                 typename = statement.typedata.name
-                if typename in self.registry:
+                if typename in self.declared:
                     self.getOrThrowIfNotInNamespace(typename, namespace)
                     self.maybeAddDefinition(statement, namespace)
                 else:
                     log.error(f"Type '{typename}' unknown")
             case ast.TempDef():
                 self.maybeAddDefinition(statement, namespace)
+            case ast.Call() if self.isBuiltin(statement, namespace):
+                self.checkBuiltinArguments(statement, namespace)
             case _:
                 log.warning(f"Statement '{statement}' not checked")
 
     def addToRegistry(self, name, value, namespace, typeString):
-        if name in self.registry:
-            if namespace in self.registry[name]:
-                log.error(f"{typeString} '{name}' already defined in '{dot(namespace)}'")
-            self.warnIfDefinitionHidesAnother(name, namespace)
-            self.registry[name][namespace] = value
-        else:
-            self.registry[name] = {namespace: value}
+        namespace.define(name, value, typeString)
+        self.declared.add(name)
 
     def checkExpression(self, expr, base_type, namespace):
         if isinstance(expr, ast.Literal):
@@ -86,43 +109,79 @@ class DefinitionRegistry:
                 log.error(f"Type mismatch in declaration: found '{to_check[1]}', expecting '{base_type}'")
             return to_check[0]
         elif isinstance(expr, ast.BinOp):
-            # resolve left and right if either is a ref
+            # resolve left and right if either is a ref, only constants are propagated
             if isinstance(expr.left, ast.Ref):
-                expr.left = self.checkExpression(expr.left, base_type, namespace)
+                left = self.checkExpression(expr.left, base_type, namespace)
+                if isinstance(left, ast.Literal):
+                    expr.left = left
             if isinstance(expr.right, ast.Ref):
-                expr.right = self.checkExpression(expr.right, base_type, namespace)
+                right = self.checkExpression(expr.right, base_type, namespace)
+                if isinstance(right, ast.Literal):
+                    expr.right = right
             # can only check valid if it's computable
             if isinstance(expr.left, ast.Literal) and isinstance(expr.right, ast.Literal):
-                expr = expr.reduceOrThrow()
+                expr = expr.reduceOrThrow(base_type)
                 base_type.checkValid(expr)
                 return expr
             return expr
+        elif isinstance(expr, (ast.New, ast.Shared)):
+            # where a value lives does not change its type, the ownership check follows it from here, so a name
+            # holding it is never replaced by the value it was made with, that would hide a read after a give
+            self.checkExpression(expr.expr, base_type, namespace)
+            return expr
         elif isinstance(expr, ast.Call):
+            if self.isBuiltin(expr, namespace):
+                self.checkBuiltin(expr, base_type, namespace)
+                return expr
             # lookup call name in registry
             fndef = self.getOrThrowIfNotInNamespace(expr.name, namespace)
             # check return type matches expected type
             rcontract = self.resolveTypeOf(fndef.rtype, namespace)
             if not rcontract.compare(base_type):
-                log.error(f"Call to '{expr.name}' in '{dot(namespace)}' expects '{base_type}', but functions returns '{rcontract}'")
+                log.error(f"Call to '{expr.name}' in '{namespace.path}' expects '{base_type}', but functions returns '{rcontract}'")
             # match arguments (can only be refs)
             self.typeCheckParameters(expr.params, fndef.args, namespace, expr.name)
+            return expr
         else:
             log.error(f"Type of expression '{expr}' not checked against '{base_type}'")
 
+    # a builtin unless a definition in scope hides it
+    def isBuiltin(self, call, namespace):
+        return not isinstance(call.name, list) and call.name in self.builtins and namespace.owner(call.name) is None
+
+    def checkBuiltinArguments(self, call, namespace):
+        contract = self.builtins[call.name].contract
+        if len(call.params) != len(contract.argumentContracts):
+            log.error(f"Parameter count mismatch in call to '{call.name}' in '{namespace.path}': found '{len(call.params)}', expecting '{len(contract.argumentContracts)}'")
+
+    # an integer a builtin returns fits any unsigned or range type, it is cut or checked where it is assigned,
+    # unless the builtin can return a value the type can not hold
+    def checkBuiltin(self, call, base_type, namespace):
+        self.checkBuiltinArguments(call, namespace)
+        returned = self.builtins[call.name].contract.returnContract
+        rtype = returned.typename
+        if isinstance(base_type, ast.Unknown):
+            return
+        if rtype == 'unsigned' and isinstance(base_type, (ast.Unsigned, ast.Range, ast.AnyUnsigned)):
+            if not ast.AnyUnsigned(returned.high).compare(base_type):
+                log.error(f"Call to '{call.name}' in '{namespace.path}' can return {returned.high}, which '{base_type}' can not hold")
+            return
+        log.error(f"Call to '{call.name}' in '{namespace.path}' expects '{base_type}', but functions returns '{rtype}'")
+
     def typeCheckParameters(self, parameters, arguments, namespace, callto):
         if len(parameters) != len(arguments):
-            log.error(f"Parameter count mismatch in call to '{callto}' in '{dot(namespace)}': found '{len(parameters)}', expecting '{len(arguments)}'")
+            log.error(f"Parameter count mismatch in call to '{callto}' in '{namespace.path}': found '{len(parameters)}', expecting '{len(arguments)}'")
         for pair in zip(parameters, arguments):
             param_pair = self.resolveTypeOf(pair[0].expr, namespace)
             arg_type = self.resolveTypeOf(pair[1].typedata, namespace)
             if isinstance(param_pair[1], ast.Unknown):
                 arg_type.checkValid(param_pair[0])
             elif not param_pair[1].compare(arg_type):
-                log.error(f"Type mismatch in call to '{callto}' in '{dot(namespace)}': found '{arg_type}', expecting '{param_pair[1]}'")
+                log.error(f"Type mismatch in call to '{callto}' in '{namespace.path}': found '{arg_type}', expecting '{param_pair[1]}'")
 
     def resolveTypeOf(self, to_resolve, namespace):
         if isinstance(to_resolve, ast.TypeData) or isinstance(to_resolve, ast.Ref):
-            if to_resolve.name in self.registry:
+            if to_resolve.name in self.declared:
                 return self.getOrThrowIfNotInNamespace(to_resolve.name, namespace)
             elif isinstance(to_resolve.name, ast.Void):
                 return ast.Void()
@@ -138,28 +197,28 @@ class DefinitionRegistry:
             if not isinstance(left, ast.Literal):
                 if not isinstance(right, ast.Literal):
                     if not left[1].compare(right[1]):
-                        log.error(f"Type mismatch in expression '{to_resolve}' in '{dot(namespace)}': '{to_resolve.left}' and '{to_resolve.right}'")
+                        log.error(f"Type mismatch in expression '{to_resolve}' in '{namespace.path}': '{to_resolve.left}' and '{to_resolve.right}'")
+                    # a builtin's integer takes the width of the other operand
+                    if isinstance(left[1], ast.AnyUnsigned):
+                        return right[1]
                 return left[1] # left and right are the same or right is a literal
             elif not isinstance(right, ast.Literal):
                 return right[1] # left is a literal, right carries type info
             log.error(f"Type of '{to_resolve.left}' and '{to_resolve.right}' unable to be resolved")
+        elif isinstance(to_resolve, ast.Call):
+            # what the callee returns, a builtin's integer takes the width of what it is used with
+            if self.isBuiltin(to_resolve, namespace):
+                returned = self.builtins[to_resolve.name].contract.returnContract
+                return ast.AnyUnsigned(returned.high) if returned.typename == 'unsigned' else ast.Unknown()
+            fndef = namespace.lookup(to_resolve.name) if not isinstance(to_resolve.name, list) else None
+            if isinstance(fndef, ast.FnDef):
+                return self.resolveTypeOf(fndef.rtype, namespace)
+            return ast.Unknown()
         else:
             return ast.Unknown()
 
     def getOrThrowIfNotInNamespace(self, name, namespace):
-        if namespace in self.registry[name]:
-            return self.registry[name][namespace]
-        for i in range(1, len(namespace)):
-            if namespace[:-i] in self.registry[name]:
-                return self.registry[name][namespace[:-i]]
-        log.error(f"Type '{name}' not visible in '{dot(namespace)}'")
-
-    def warnIfDefinitionHidesAnother(self, name, namespace):
-        for i in range(1, len(namespace)):
-            if namespace[:-i] in self.registry[name]:
-                log.warning(f"Definition '{dot(namespace)}.{name}' hides another definition with the same name in '{dot(namespace[:-1])}'")
-                return
-
-
-def dot(namespace):
-    return '.'.join(namespace)
+        found = namespace.owner(name)
+        if found is None:
+            log.error(f"Type '{name}' not visible in '{namespace.path}'")
+        return found.symbols[name]
@@ -0,0 +1,135 @@
+from ..ast import ast
+from . import functionregistry
+
+
+# finds the allocations that never leave the function making them: made by new, taken as an argument or
+# given by a call, and then neither given to a callee taking it nor returned by a function giving its
+# result, and records on each FnDef which of them escape, the others live in the frame instead of the heap
+def analyze(program, registry):
+    builtins = functionregistry.builtinFunctions()
+    for statement in program.statements:
+        if isinstance(statement, ast.FnDef):
+            analyzeFunction(statement, registry, builtins)
+
+
+def analyzeFunction(fndef, namespace, builtins):
+    inner = namespace.child(fndef.name)
+    FunctionEscapes(fndef, inner, builtins).analyze()
+    for statement in fndef.statements:
+        if isinstance(statement, ast.FnDef):
+            analyzeFunction(statement, inner, builtins)
+
+
+# a single forward walk over the flat statements, an allocation is known by the position of the statement
+# making it and the name it is made for, -1 for the arguments, and a move hands it on to another name
+class FunctionEscapes:
+    def __init__(self, fndef, namespace, builtins):
+        self.fndef = fndef
+        self.namespace = namespace
+        self.builtins = builtins
+        # the allocation each name holds right now
+        self.current = {}
+        self.allocations = {}
+
+    def analyze(self):
+        for arg in self.fndef.args:
+            if arg.take:
+                self.allocate((-1, arg.name))
+        for position, statement in enumerate(self.fndef.statements):
+            match statement:
+                case ast.Declare() | ast.Assign() | ast.TempDef():
+                    self.define(position, statement.name, statement.expr)
+                case ast.Return():
+                    self.expression(statement.expr)
+                    if self.fndef.give and isinstance(statement.expr, ast.Ref):
+                        self.escape(statement.expr.name)
+                case ast.Call():
+                    self.call(statement)
+        self.fndef.allocations = self.allocations
+
+    def define(self, position, name, expr):
+        allocation = self.current.get(expr.name) if isinstance(expr, ast.Ref) else None
+        allocates = self.expression(expr)
+        self.current.pop(name, None)
+        if allocation is not None:
+            self.current[name] = allocation
+        elif allocates:
+            self.allocate((position, name))
+            # what a builtin gives is made by the runtime, the c backend has to free it
+            if isinstance(expr, ast.Call) and expr.name in self.builtins and not isinstance(self.namespace.lookup(expr.name), ast.FnDef):
+                self.escape(name)
+
+    def allocate(self, allocation):
+        self.allocations[allocation] = False
+        self.current[allocation[1]] = allocation
+
+    def escape(self, name):
+        allocation = self.current.get(name)
+        if allocation is not None:
+            self.allocations[allocation] = True
+
+    # whether the value is a new allocation
+    def expression(self, expr):
+        match expr:
+            case ast.BinOp():
+                self.expression(expr.left)
+                self.expression(expr.right)
+            case ast.UnaryOp() | ast.Shared():
+                self.expression(expr.expr)
+            case ast.New():
+                self.expression(expr.expr)
+                return True
+            case ast.Call():
+                return self.call(expr)
+        return False
+
+    # what the callee takes leaves the function, whether the call gives its result
+    def call(self, call):
+        taken, gives = self.contractOf(call.name)
+        for position, param in enumerate(call.params):
+            if isinstance(param.expr, ast.Ref):
+                if param.give or (position < len(taken) and taken[position]):
+                    self.escape(param.expr.name)
+            else:
+                self.expression(param.expr)
+        return gives
+
+    def contractOf(self, name):
+        if isinstance(name, list):
+            return [], False
+        fndef = self.namespace.lookup(name)
+        if isinstance(fndef, ast.FnDef):
+            return [arg.take for arg in fndef.args], fndef.give
+        if name in self.builtins:
+            contract = self.builtins[name].contract
+            return [arg.take for arg in contract.argumentContracts], contract.returnContract.give
+        return [], False
+
+
+class EscapeStatistics:
+    def __init__(self, allocations, demoted):
+        self.allocations = allocations
+        self.demoted = demoted
+
+    def describe(self):
+        return f"escape analysis: {self.demoted} of {self.allocations} allocations demoted to their frame"
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}("
+            f"allocations={self.allocations}, "
+            f"demoted={self.demoted})"
+        )
+
+
+# counted over every function of the programs, nested ones included
+def statistics(programs):
+    allocations = demoted = 0
+    pending = [statement for program in programs for statement in program.statements]
+    while pending:
+        statement = pending.pop()
+        if isinstance(statement, ast.FnDef):
+            allocations += len(statement.allocations)
+            demoted += sum(not escapes for escapes in statement.allocations.values())
+            pending += statement.statements
+    return EscapeStatistics(allocations, demoted)
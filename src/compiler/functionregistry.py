@@ -1,4 +1,6 @@
 from ..ast import ast
+from ..ast import symbols
+from ..runtime import reactor
 from . import builtinfn
 
 
@@ -19,12 +21,14 @@ class ArgumentContract:
         )
 
 
+# high is the largest integer returned when a value has to survive being cut to the target's width
 class ReturnContract:
-    def __init__(self, give, typename, prefix, postfix):
+    def __init__(self, give, typename, prefix, postfix, high=None):
         self.give = give
         self.typename = typename
         self.prefix = prefix
         self.postfix = postfix
+        self.high = high
 
     def __repr__(self):
         return (
@@ -84,15 +88,39 @@ class Function:
         )
 
 
-def getProgramFunctionRegistry(program, type_registry):
-    function_registry = {
-        'print': Function(FunctionContract([ArgumentContract(False, 'String', None, None)], ReturnContract(False, 'void', None, None)), RemoteFunction(builtinfn.remotePrint)),
-        'input': Function(FunctionContract([ArgumentContract(False, 'String', None, None)], ReturnContract(True, 'String', None, None)), RemoteFunction(builtinfn.remoteInput))
+# a builtin implemented in python, 'unsigned' is an integer of any width, cut to the one it is assigned to
+# unless high is given, then only a type holding high can be assigned it
+def remote(argumentTypes, give, returnType, reference, high=None):
+    arguments = [ArgumentContract(False, typename, None, None) for typename in argumentTypes]
+    return Function(FunctionContract(arguments, ReturnContract(give, returnType, None, None, high)), RemoteFunction(reference))
+
+
+def builtinFunctions():
+    return {
+        symbols.intern('print'): Function(FunctionContract([ArgumentContract(False, 'String', None, None)], ReturnContract(False, 'void', None, None)), RemoteFunction(builtinfn.remotePrint)),
+        symbols.intern('input'): Function(FunctionContract([ArgumentContract(False, 'String', None, None)], ReturnContract(True, 'String', None, None)), RemoteFunction(builtinfn.remoteInput)),
+        symbols.intern('sleep'): remote(['unsigned'], False, 'void', builtinfn.remoteSleep),
+        symbols.intern('clock'): remote([], False, 'unsigned', builtinfn.remoteClock),
+        symbols.intern('listen'): remote(['unsigned'], False, 'unsigned', builtinfn.remoteListen),
+        symbols.intern('accept'): remote(['unsigned'], False, 'unsigned', builtinfn.remoteAccept),
+        symbols.intern('connect'): remote(['unsigned'], False, 'unsigned', builtinfn.remoteConnect),
+        symbols.intern('open'): remote(['String'], False, 'unsigned', builtinfn.remoteOpen),
+        symbols.intern('create'): remote(['String'], False, 'unsigned', builtinfn.remoteCreate),
+        symbols.intern('readByte'): remote(['unsigned'], False, 'unsigned', builtinfn.remoteReadByte, reactor.endOfInput),
+        symbols.intern('readLine'): remote(['unsigned'], True, 'String', builtinfn.remoteReadLine),
+        symbols.intern('write'): remote(['unsigned', 'String'], False, 'void', builtinfn.remoteWrite),
+        symbols.intern('writeLine'): remote(['unsigned', 'String'], False, 'void', builtinfn.remoteWriteLine),
+        symbols.intern('flush'): remote(['unsigned'], False, 'void', builtinfn.remoteFlush),
+        symbols.intern('close'): remote(['unsigned'], False, 'void', builtinfn.remoteClose),
     }
+
+
+def getProgramFunctionRegistry(program, type_registry):
+    function_registry = builtinFunctions()
     for statement in program.statements:
         if isinstance(statement, ast.FnDef):
             function_registry = addFunctionToRegistry(statement, function_registry)
-    if 'main' not in function_registry:
+    if symbols.intern('main') not in function_registry:
         raise SystemExit("Function 'main' not defined")
     return function_registry
 
@@ -0,0 +1,673 @@
+from ..ast import ast
+from ..ast import symbols
+from . import functionregistry
+
+
+# masking with -1 leaves a value untouched, it is used for values without a width, which have to stay within
+# 0 .. largest and panic with an integer overflow where they do not
+untyped = -1
+largest = 2 ** 64 - 1
+
+
+class Constant:
+    def __init__(self, value):
+        self.value = value
+
+    def __repr__(self):
+        return repr(self.value)
+
+
+# every instruction is also the ssa value it defines
+class Instruction:
+    pure = True
+    hint = None
+
+    def operands(self):
+        return []
+
+    def replaceOperands(self, replace):
+        pass
+
+    def describe(self, names):
+        return type(self).__name__.lower()
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}("
+            f"{', '.join(str(operand) for operand in self.operands())})"
+        )
+
+
+# bounds are the range of a range typed argument, every caller checks it holds
+class Param(Instruction):
+    def __init__(self, index, mask, hint, bounds=None):
+        self.index = index
+        self.mask = mask
+        self.hint = hint
+        self.bounds = bounds
+
+    def describe(self, names):
+        return f"param {self.index}"
+
+
+# exact is set once the result is proven to fit its width, so it needs no mask, and nonzero once a divisor is
+# proven never to be zero
+class Binary(Instruction):
+    def __init__(self, op, left, right, mask):
+        self.op = op
+        self.left = left
+        self.right = right
+        self.mask = mask
+        self.exact = False
+        self.nonzero = False
+
+    # a division whose divisor may be zero panics, and so can arithmetic without a width, either is kept even
+    # when nothing uses its result
+    @property
+    def pure(self):
+        return self.nonzero if self.op == '/' else not mayOverflow(self)
+
+    def operands(self):
+        return [self.left, self.right]
+
+    def replaceOperands(self, replace):
+        self.left = replace(self.left)
+        self.right = replace(self.right)
+
+    def describe(self, names):
+        described = f"{names(self.left)} {self.op} {names(self.right)}"
+        if self.op == '/' and not self.nonzero:
+            described += " checked"
+        return described if self.exact else f"{described} & {self.mask}"
+
+
+class Negate(Instruction):
+    def __init__(self, operand, mask):
+        self.operand = operand
+        self.mask = mask
+        self.exact = False
+
+    # without a width only zero can be negated, anything else panics
+    @property
+    def pure(self):
+        return not mayOverflow(self)
+
+    def operands(self):
+        return [self.operand]
+
+    def replaceOperands(self, replace):
+        self.operand = replace(self.operand)
+
+    def describe(self, names):
+        return f"-{names(self.operand)}" if self.exact else f"-{names(self.operand)} & {self.mask}"
+
+
+# arithmetic without a width not proven to stay within 0 .. largest, every backend checks its result
+def mayOverflow(instruction):
+    if not isinstance(instruction, (Binary, Negate)) or isinstance(instruction, Binary) and instruction.op == '/':
+        return False
+    return instruction.mask == untyped and not instruction.exact
+
+
+class Wrap(Instruction):
+    def __init__(self, operand, mask, hint):
+        self.operand = operand
+        self.mask = mask
+        self.hint = hint
+        self.exact = False
+
+    def operands(self):
+        return [self.operand]
+
+    def replaceOperands(self, replace):
+        self.operand = replace(self.operand)
+
+    def describe(self, names):
+        return f"wrap {names(self.operand)}" if self.exact else f"wrap {names(self.operand)} & {self.mask}"
+
+
+class Copy(Instruction):
+    def __init__(self, operand, mask, hint):
+        self.operand = operand
+        self.mask = mask
+        self.hint = hint
+
+    def operands(self):
+        return [self.operand]
+
+    def replaceOperands(self, replace):
+        self.operand = replace(self.operand)
+
+    def describe(self, names):
+        return f"copy {names(self.operand)}"
+
+
+# panics unless its operand is within low .. high, and is otherwise the operand itself
+class Check(Instruction):
+    pure = False
+
+    def __init__(self, operand, low, high, mask, hint):
+        self.operand = operand
+        self.low = low
+        self.high = high
+        self.mask = mask
+        self.hint = hint
+
+    def operands(self):
+        return [self.operand]
+
+    def replaceOperands(self, replace):
+        self.operand = replace(self.operand)
+
+    def describe(self, names):
+        return f"check {names(self.operand)} in {self.low} .. {self.high}"
+
+
+class Call(Instruction):
+    pure = False
+
+    def __init__(self, function, args, mask):
+        self.function = function
+        self.args = args
+        self.mask = mask
+
+    def operands(self):
+        return list(self.args)
+
+    def replaceOperands(self, replace):
+        self.args = [replace(arg) for arg in self.args]
+
+    def describe(self, names):
+        return f"call @{self.function}({', '.join(names(arg) for arg in self.args)})"
+
+
+class Builtin(Instruction):
+    pure = False
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+        self.mask = untyped
+
+    def operands(self):
+        return list(self.args)
+
+    def replaceOperands(self, replace):
+        self.args = [replace(arg) for arg in self.args]
+
+    def describe(self, names):
+        return f"builtin {self.name}({', '.join(names(arg) for arg in self.args)})"
+
+
+# a heap cell holding operand, allocated in the frame's arena and released with it when the function returns,
+# the value is the cell's address
+class New(Instruction):
+    pure = False
+
+    def __init__(self, operand, mask, hint):
+        self.operand = operand
+        self.mask = mask
+        self.hint = hint
+
+    def operands(self):
+        return [self.operand]
+
+    def replaceOperands(self, replace):
+        self.operand = replace(self.operand)
+
+    def describe(self, names):
+        return f"new {names(self.operand)}"
+
+
+# a counted reference to a cell holding operand, outside every arena, freed once the last function holding
+# it, on whichever thread, dropped it
+class Share(New):
+    def describe(self, names):
+        return f"shared {names(self.operand)}"
+
+
+# what the cell at pointer holds, a cell is written once, a name given a new value gets a new cell
+class Load(Instruction):
+    def __init__(self, pointer, mask, hint):
+        self.pointer = pointer
+        self.mask = mask
+        self.hint = hint
+
+    def operands(self):
+        return [self.pointer]
+
+    def replaceOperands(self, replace):
+        self.pointer = replace(self.pointer)
+
+    def describe(self, names):
+        return f"load {names(self.pointer)}"
+
+
+# the last use of a cell the function owned, past it the frame no longer keeps what the cell holds alive, the
+# cell itself goes back with the frame's arena and a shared one loses a reference, given is set when a callee
+# took a copy of it
+class Drop(Instruction):
+    pure = False
+    mask = untyped
+
+    def __init__(self, operand, given):
+        self.operand = operand
+        self.given = given
+
+    def operands(self):
+        return [self.operand]
+
+    def replaceOperands(self, replace):
+        self.operand = replace(self.operand)
+
+    def describe(self, names):
+        return f"drop {names(self.operand)} given" if self.given else f"drop {names(self.operand)}"
+
+
+class Return(Instruction):
+    pure = False
+
+    def __init__(self, value):
+        self.value = value
+
+    def operands(self):
+        return [self.value]
+
+    def replaceOperands(self, replace):
+        self.value = replace(self.value)
+
+    def describe(self, names):
+        return f"return {names(self.value)}"
+
+
+class BasicBlock:
+    def __init__(self, label):
+        self.label = label
+        self.instructions = []
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}("
+            f"{self.label}, "
+            f"{self.instructions})"
+        )
+
+
+class Function:
+    def __init__(self, name, params, rmask, rbounds=None):
+        self.name = name
+        self.params = params
+        self.rmask = rmask
+        self.rbounds = rbounds
+        self.blocks = [BasicBlock('entry')]
+
+    def instructions(self):
+        return [instruction for block in self.blocks for instruction in block.instructions]
+
+    # number of uses of every value defined in this function
+    def uses(self):
+        counts = {}
+        for instruction in self.instructions():
+            for operand in instruction.operands():
+                if isinstance(operand, Instruction):
+                    counts[operand] = counts.get(operand, 0) + 1
+        return counts
+
+    def dump(self):
+        ids = {}
+        for instruction in self.instructions():
+            ids[instruction] = f"%{len(ids)}" if instruction.hint is None else f"%{len(ids)}.{instruction.hint}"
+
+        def names(value):
+            return ids[value] if isinstance(value, Instruction) else repr(value.value)
+
+        lines = [f"fn {self.name}({', '.join(ids[param] for param in self.params)}):"]
+        for block in self.blocks:
+            lines.append(f"  {block.label}:")
+            for instruction in block.instructions:
+                if isinstance(instruction, (Return, Drop)):
+                    lines.append(f"    {instruction.describe(names)}")
+                else:
+                    lines.append(f"    {ids[instruction]} = {instruction.describe(names)}")
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}("
+            f"{self.name}, "
+            f"{self.blocks})"
+        )
+
+
+class Module:
+    def __init__(self, name, functions, entry):
+        self.name = name
+        self.functions = functions
+        self.entry = entry
+
+    def dump(self):
+        return '\n\n'.join(function.dump() for function in self.functions)
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}("
+            f"{self.name}, "
+            f"{self.functions})"
+        )
+
+
+# names visible to a function body, looked up innermost first
+class Scope:
+    def __init__(self, parent):
+        self.parent = parent
+        self.types = {}
+        self.functions = {}
+
+    def lookupType(self, name):
+        scope = self
+        while scope is not None:
+            if name in scope.types:
+                return scope.types[name]
+            scope = scope.parent
+        raise SystemExit(f"Type '{name}' unknown")
+
+    def lookupFunction(self, name):
+        scope = self
+        while scope is not None:
+            if name in scope.functions:
+                return scope.functions[name]
+            scope = scope.parent
+        return None
+
+
+def baseTypeOf(typedata, scope):
+    if isinstance(typedata.name, ast.Void):
+        return None
+    base_type = scope.lookupType(typedata.name)
+    while isinstance(base_type, ast.TypeData):
+        base_type = scope.lookupType(base_type.name)
+    return base_type
+
+
+# a range is stored in its width like an unsigned, then checked wherever it is assigned
+def maskOf(typedata, scope):
+    base_type = baseTypeOf(typedata, scope)
+    if isinstance(base_type, ast.Unsigned):
+        return base_type.high
+    if isinstance(base_type, ast.Range):
+        return 2 ** base_type.sizeof - 1
+    return untyped
+
+
+def boundsOf(typedata, scope):
+    base_type = baseTypeOf(typedata, scope)
+    if isinstance(base_type, ast.Range):
+        return base_type.low, base_type.high
+    return None
+
+
+binaryOps = {ast.Add: '+', ast.Sub: '-', ast.Mul: '*', ast.Div: '/'}
+
+
+# builds one ssa function per FnDef of one or more flat, checked programs
+class Builder:
+    def __init__(self, name):
+        self.name = name
+        self.functions = []
+        self.returnMasks = []
+        self.argumentBounds = []
+        self.gives = []
+        self.builtins = functionregistry.builtinFunctions()
+        self.pending = []
+
+    # the definitions of a program live in their own scope, on top of whatever it imports
+    def addProgram(self, program, imports):
+        scope = Scope(imports)
+        self.declare(program.statements, scope)
+        return scope
+
+    def finish(self, scope):
+        while self.pending:
+            fndef, index, outer = self.pending.pop(0)
+            inner = Scope(outer)
+            self.declare(fndef.statements, inner)
+            self.functions[index] = FunctionBuilder(self, fndef, inner).build()
+        entry = scope.lookupFunction(symbols.intern('main'))
+        if entry is None:
+            raise SystemExit("Function 'main' not defined")
+        return Module(self.name, self.functions, entry)
+
+    # functions can be called before they are defined, so register them all up front
+    def declare(self, statements, scope):
+        for statement in statements:
+            if isinstance(statement, ast.TypeDef):
+                scope.types[statement.typedata.name] = statement.base_type
+        for statement in statements:
+            if isinstance(statement, ast.FnDef):
+                if statement.name in scope.functions:
+                    raise SystemExit(f"Function '{statement.name}' already defined, overloading not supported yet")
+                index = len(self.functions)
+                scope.functions[statement.name] = index
+                self.functions.append(None)
+                self.returnMasks.append(maskOf(statement.rtype, scope))
+                self.gives.append(statement.give)
+                self.argumentBounds.append([boundsOf(arg.typedata, scope) for arg in statement.args])
+                self.pending.append((statement, index, scope))
+
+
+class FunctionBuilder:
+    def __init__(self, builder, fndef, scope):
+        self.builder = builder
+        self.fndef = fndef
+        self.scope = scope
+        self.values = {}
+        # the range of every range typed variable
+        self.bounds = {}
+        # the owned values the statement being built reads last
+        self.ending = []
+        self.taken = []
+        self.position = -1
+        # shared cells not dropped yet, whatever is left is dropped before the function returns
+        self.shares = []
+
+    def build(self):
+        params = []
+        for index, arg in enumerate(self.fndef.args):
+            param = Param(index, self.maskOf(arg.typedata), arg.name, boundsOf(arg.typedata, self.scope))
+            params.append(param)
+            self.values[arg.name] = param
+            self.bounds[arg.name] = param.bounds
+            self.taken.append(arg.take)
+        self.function = Function(self.fndef.name, params, self.maskOf(self.fndef.rtype), boundsOf(self.fndef.rtype, self.scope))
+        self.block = self.function.blocks[0]
+        self.block.instructions.extend(params)
+        # what the function takes is owned memory of its own, copied into its arena like a given result
+        for param, take in zip(params, self.taken):
+            if take and self.escapes(param.hint):
+                self.values[param.hint] = self.emit(New(param, param.mask, param.hint))
+        self.ending = [(name, given, self.values[name]) for name, _, given in self.fndef.drops.get(-1, ())]
+        self.release()
+        for position, statement in enumerate(self.fndef.statements):
+            self.position = position
+            # a value read last by the statement that redefines its name is looked up before it is gone
+            self.ending = [(name, given, None if fresh else self.values[name]) for name, fresh, given in self.fndef.drops.get(position, ())]
+            self.statement(statement)
+            self.release()
+        if not self.block.instructions or not isinstance(self.block.instructions[-1], Return):
+            self.releaseShared()
+            self.emit(Return(Constant(None)))
+        return self.function
+
+    def statement(self, statement):
+        match statement:
+            case ast.Declare():
+                self.bounds[statement.name] = boundsOf(statement.typedata, self.scope)
+                self.values[statement.name] = self.assign(statement.expr, self.maskOf(statement.typedata), statement.name)
+            case ast.TempDef():
+                self.values[statement.name] = self.allocated(statement.expr, self.expression(statement.expr), statement.name)
+            case ast.Assign():
+                mask = self.lookup(statement.name).mask
+                self.values[statement.name] = self.assign(statement.expr, mask, statement.name)
+            case ast.Return():
+                value = self.expression(statement.expr)
+                if self.function.rmask != untyped and not isinstance(statement.expr, ast.Literal) and maskOfValue(value) != self.function.rmask:
+                    value = self.emit(Wrap(value, self.function.rmask, None))
+                if self.function.rbounds is not None and not isinstance(statement.expr, ast.Literal):
+                    value = self.emit(Check(value, *self.function.rbounds, self.function.rmask, None))
+                self.release()
+                self.releaseShared()
+                self.emit(Return(value))
+            case ast.Call():
+                self.call(statement)
+            case ast.FnDef() | ast.TypeDef():
+                pass
+            case _:
+                raise SystemExit(f"Statement '{statement}' not supported by the ir builder")
+
+    # literals were range checked by the checker, everything else is wrapped to the target width and
+    # checked against the target range, the range analysis removes the checks it proves never fail
+    def assign(self, expr, mask, name):
+        # a name holding memory handed on keeps the same cell
+        if isinstance(expr, ast.Ref) and isinstance(self.lookup(expr.name), New):
+            return self.lookup(expr.name)
+        if isinstance(expr, (ast.New, ast.Shared)):
+            return self.allocated(expr, self.stored(expr.expr, mask, name), name)
+        return self.allocated(expr, self.stored(expr, mask, name), name)
+
+    def stored(self, expr, mask, name):
+        value = self.expression(expr)
+        bounds = self.bounds.get(name)
+        if isinstance(expr, ast.Literal):
+            return self.emit(Copy(value, mask, name))
+        if mask != untyped and maskOfValue(value) != mask:
+            value = self.emit(Wrap(value, mask, name))
+        elif bounds is None:
+            return self.emit(Copy(value, mask, name))
+        if bounds is None:
+            return value
+        return self.emit(Check(value, *bounds, mask, name))
+
+    def expression(self, expr):
+        match expr:
+            case ast.Integer() | ast.String():
+                return Constant(expr.value)
+            case ast.Ref():
+                value = self.lookup(expr.name)
+                if isinstance(value, New):
+                    return self.emit(Load(value, value.mask, expr.name))
+                return value
+            case ast.BinOp():
+                left = self.expression(expr.left)
+                right = self.expression(expr.right)
+                mask = maskOfValue(left)
+                if mask == untyped:
+                    mask = maskOfValue(right)
+                return self.emit(Binary(binaryOps[type(expr)], left, right, mask))
+            case ast.USub():
+                operand = self.expression(expr.expr)
+                return self.emit(Negate(operand, maskOfValue(operand)))
+            case ast.New() | ast.Shared():
+                return self.expression(expr.expr)
+            case ast.Call():
+                return self.call(expr)
+            case _:
+                raise SystemExit(f"Expression '{expr}' not supported by the ir builder")
+
+    def call(self, call):
+        if isinstance(call.name, list):
+            raise SystemExit(f"Call to '{'.'.join(map(str, call.name))}' not supported by the ir builder")
+        args = [self.expression(param.expr) for param in call.params]
+        index = self.scope.lookupFunction(call.name)
+        if index is None:
+            return self.emit(Builtin(call.name, args))
+        for position, bounds in enumerate(self.builder.argumentBounds[index][:len(args)]):
+            if bounds is not None and not isinstance(args[position], Constant):
+                args[position] = self.emit(Check(args[position], *bounds, maskOfValue(args[position]), None))
+        return self.emit(Call(index, args, self.builder.returnMasks[index]))
+
+    # what new makes and what a call gives lives in a heap cell unless it never leaves the function, everything
+    # else stays a plain value
+    def allocated(self, expr, value, name):
+        if isinstance(value, New):
+            return value
+        # a shared value is meant to outlive the function, it is never kept in the frame
+        if isinstance(expr, ast.Shared):
+            share = self.emit(Share(value, maskOfValue(value), None))
+            self.shares.append(share)
+            return share
+        if not self.escapes(name):
+            return value
+        if isinstance(expr, ast.New) or (isinstance(expr, ast.Call) and self.gives(expr.name)):
+            return self.emit(New(value, maskOfValue(value), None))
+        return value
+
+    # an allocation the escape analysis has not seen is kept on the heap
+    def escapes(self, name):
+        return self.fndef.allocations.get((self.position, name), True)
+
+    def gives(self, name):
+        if isinstance(name, list):
+            return False
+        index = self.scope.lookupFunction(name)
+        if index is not None:
+            return self.builder.gives[index]
+        builtin = self.builder.builtins.get(name)
+        return builtin is not None and builtin.contract.returnContract.give
+
+    # drops the cells the statement just built read last, an allocation kept in the frame is a plain value the
+    # passes may have merged with another one, so it is left to the frame
+    def release(self):
+        for name, given, value in self.ending:
+            if value is None:
+                value = self.values[name]
+            if isinstance(value, New):
+                self.emit(Drop(value, given))
+                if value in self.shares:
+                    self.shares.remove(value)
+        self.ending = []
+
+    def releaseShared(self):
+        for share in self.shares:
+            self.emit(Drop(share, False))
+        self.shares = []
+
+    def emit(self, instruction):
+        self.block.instructions.append(instruction)
+        return instruction
+
+    def lookup(self, name):
+        if name not in self.values:
+            raise SystemExit(f"Symbol '{name}' not visible in '{self.fndef.name}'")
+        return self.values[name]
+
+    def maskOf(self, typedata):
+        return maskOf(typedata, self.scope)
+
+
+def maskOfValue(value):
+    return value.mask if isinstance(value, Instruction) else untyped
+
+
+def build(program):
+    builder = Builder(program.name)
+    return builder.finish(builder.addProgram(program, None))
+
+
+# units are in dependency order, each one sees the top level definitions of the modules it uses and the types
+# of those they use in turn
+def link(units, entry):
+    builder = Builder(entry.name)
+    moduleScopes = {}
+    # every type a module can name, its own and those of the modules it uses however indirectly, which the
+    # signatures of what it calls may name
+    visibleTypes = {}
+    for unit in units:
+        inherited = Scope(None)
+        imports = Scope(inherited)
+        for dependency in unit.dependencies:
+            inherited.types.update(visibleTypes[dependency])
+            imports.types.update(moduleScopes[dependency].types)
+            imports.functions.update(moduleScopes[dependency].functions)
+        moduleScopes[unit.name] = builder.addProgram(unit.program, imports)
+        visibleTypes[unit.name] = {**inherited.types, **imports.types, **moduleScopes[unit.name].types}
+    return builder.finish(moduleScopes[entry.name])
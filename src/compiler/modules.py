@@ -0,0 +1,254 @@
+import concurrent.futures
+import hashlib
+import os
+from ..ast import ast
+from ..cache import cache
+from ..logging import logger
+from ..logging import trace
+from ..parser import parser
+from . import compiler
+from . import scopes
+
+
+log = logger.Log()
+
+extension = '.ty'
+
+
+# one module: its source, what it uses, and once compiled its flat program, registry and interface
+class Unit:
+    def __init__(self, name, path, source):
+        self.name = name
+        self.path = path
+        self.source = source
+        self.dependencies = []
+        self.program = None
+        self.registry = None
+        self.interfaceHash = None
+        self.rebuilt = False
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}("
+            f"{self.name}, "
+            f"{self.dependencies})"
+        )
+
+
+class ModuleGraph:
+    def __init__(self, entryPath, searchPath=None):
+        self.entryPath = os.path.abspath(entryPath)
+        self.root = os.path.dirname(self.entryPath)
+        if searchPath is None:
+            searchPath = [path for path in os.environ.get('TYPE_PATH', '').split(os.pathsep) if path]
+        self.searchPath = [self.root] + [os.path.abspath(path) for path in searchPath]
+        self.units = {}
+        self.dependents = {}
+        self.entry = None
+
+    # reads the entry module and everything it transitively uses
+    def load(self):
+        with trace.span('scan uses'):
+            return self.loadAll()
+
+    def loadAll(self):
+        self.entry = self.loadUnit(self.entryPath)
+        pending = [self.entry]
+        while pending:
+            unit = pending.pop()
+            for use in self.usesOf(unit):
+                path = self.resolve(use, unit)
+                dependency = self.units.get(self.nameOf(path)) or self.loadUnit(path)
+                if dependency.name not in unit.dependencies:
+                    unit.dependencies.append(dependency.name)
+                    self.dependents.setdefault(dependency.name, []).append(unit.name)
+                    pending.append(dependency)
+        return self
+
+    def loadUnit(self, path):
+        unit = Unit(self.nameOf(path), path, self.read(path))
+        self.units[unit.name] = unit
+        return unit
+
+    # kept as bytes, it is hashed and scanned as is and only token text is ever decoded
+    def read(self, path):
+        with open(path, 'rb') as file:
+            return file.read()
+
+    def usesOf(self, unit):
+        return parser.scanUses(unit.source)
+
+    def resolve(self, use, unit):
+        parts = use.path.lstrip('.').split('.')
+        if isinstance(use, ast.RelLocator):
+            base = os.path.dirname(unit.path)
+            for _ in range(len(use.path) - len(use.path.lstrip('.')) - 1):
+                base = os.path.dirname(base)
+            candidates = [os.path.join(base, *parts) + extension]
+        else:
+            candidates = [os.path.join(root, *parts) + extension for root in self.searchPath]
+        for candidate in candidates:
+            if os.path.isfile(candidate):
+                return os.path.abspath(candidate)
+        raise SystemExit(f"Module '{use.path}' used in '{unit.name}' not found, looked for {candidates}")
+
+    def nameOf(self, path):
+        relative = os.path.relpath(os.path.abspath(path), self.root)
+        return os.path.splitext(relative)[0].replace(os.sep, '.')
+
+    # what unit uses directly and, after those, what they use in turn, the signatures of the first can name
+    # types of the others
+    def closure(self, unit):
+        found = list(unit.dependencies)
+        for name in found:
+            found += [dependency for dependency in self.units[name].dependencies if dependency not in found and dependency != unit.name]
+        return [self.units[name] for name in found]
+
+    # dependencies before dependents, ties broken by name so builds are reproducible
+    def order(self):
+        ordered = []
+        state = {}
+        for name in sorted(self.units):
+            if state.get(name):
+                continue
+            state[name] = 'visiting'
+            stack = [(name, iter(sorted(self.units[name].dependencies)))]
+            while stack:
+                current, dependencies = stack[-1]
+                for dependency in dependencies:
+                    if state.get(dependency) == 'visiting':
+                        cycle = [entry[0] for entry in stack] + [dependency]
+                        raise SystemExit(f"Circular use: {' -> '.join(cycle[cycle.index(dependency):])}")
+                    if not state.get(dependency):
+                        state[dependency] = 'visiting'
+                        stack.append((dependency, iter(sorted(self.units[dependency].dependencies))))
+                        break
+                else:
+                    state[current] = 'done'
+                    ordered.append(self.units[current])
+                    stack.pop()
+        return ordered
+
+    # only units whose source or the interface of something they use changed are recompiled
+    def compile(self, buildCache=None, jobs=1):
+        buildCache = buildCache or cache.BuildCache()
+        units = self.order()
+        if jobs > 1:
+            self.compileParallel(units, buildCache, jobs)
+        else:
+            for unit in units:
+                compileUnit(unit, self.closure(unit), buildCache)
+        rebuilt = [unit.name for unit in units if unit.rebuilt]
+        log.debug(f"compiled {len(rebuilt)} of {len(units)} modules: {rebuilt}")
+        return units
+
+    # a unit is submitted as soon as everything it uses is compiled, results land in the units so order stays fixed
+    def compileParallel(self, units, buildCache, jobs):
+        waiting = {unit.name: set(unit.dependencies) for unit in units}
+        ready = sorted(name for name, dependencies in waiting.items() if not dependencies)
+        running = {}
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+            while ready or running:
+                finished = []
+                for name in ready:
+                    unit = self.units[name]
+                    dependencies = self.closure(unit)
+                    key = unitKey(unit, dependencies, buildCache)
+                    if loadUnit(unit, key, buildCache):
+                        finished.append(name)
+                        continue
+                    running[pool.submit(compileWork, unit.name, unit.source, exportsOf(unit, dependencies), trace.enabled())] = (unit, key)
+                ready = []
+                if not finished:
+                    done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in sorted(done, key=lambda future: running[future][0].name):
+                        unit, key = running.pop(future)
+                        storeUnit(unit, key, future.result(), buildCache)
+                        finished.append(unit.name)
+                for name in finished:
+                    for dependent in self.dependents.get(name, []):
+                        waiting[dependent].discard(name)
+                        if not waiting[dependent]:
+                            ready.append(dependent)
+                ready.sort()
+
+
+# dependencies is the whole closure, a type changed in a module used only indirectly changes what the
+# signatures of the direct ones mean without changing their interface
+def unitKey(unit, dependencies, buildCache):
+    return buildCache.key(unit.name, unit.source, *[f"{dependency.name}={dependency.interfaceHash}" for dependency in dependencies])
+
+
+def loadUnit(unit, key, buildCache):
+    cached = buildCache.load(key)
+    if cached is None:
+        return False
+    unit.program, unit.registry, unit.interfaceHash = cached
+    return True
+
+
+def storeUnit(unit, key, result, buildCache):
+    unit.program, unit.registry, unit.interfaceHash, events = result
+    unit.rebuilt = True
+    if events:
+        trace.tracer.merge(events)
+    buildCache.store(key, result[:3])
+
+
+def compileUnit(unit, dependencies, buildCache):
+    key = unitKey(unit, dependencies, buildCache)
+    if not loadUnit(unit, key, buildCache):
+        storeUnit(unit, key, compileWork(unit.name, unit.source, exportsOf(unit, dependencies)), buildCache)
+    return unit
+
+
+# the symbols of every module in the closure and whether unit uses it directly
+def exportsOf(unit, dependencies):
+    return [(dependency.name, dependency.registry.symbols, dependency.name in unit.dependencies) for dependency in dependencies]
+
+
+# runs in a worker process when building in parallel, so it only takes and returns picklable values
+def compileWork(name, source, exports, traced=False):
+    if traced:
+        trace.start()
+    with trace.span('compile unit', module=name):
+        program, registry = compiler.compile(parser.parse(name, source), importScope(name, exports))
+    # imports are rebuilt from the dependencies on every use, keeping them would copy every module into each cache entry
+    registry.parent = None
+    events = trace.stop().events if traced else None
+    return program, registry, interfaceHash(registry), events
+
+
+# the top level definitions of every used module, visible underneath the unit's own, and beneath those the
+# definitions of the modules they use in turn, which a used signature may name
+def importScope(name, exports):
+    if not exports:
+        return None
+    inherited = scopes.Scope('uses', None, f"{name}.uses")
+    imports = scopes.Scope('use', inherited, f"{name}.use")
+    for dependency, symbols, direct in exports:
+        scope = imports if direct else inherited
+        for symbol, value in symbols.items():
+            if direct or imports.lookup(symbol) is None:
+                scope.define(symbol, value, f"Definition from '{dependency}'")
+    return imports
+
+
+# what other modules can see: type definitions and function signatures, not bodies
+def interface(registry):
+    signatures = []
+    for name, value in sorted(registry.symbols.items(), key=lambda item: str(item[0])):
+        if isinstance(value, ast.FnDef):
+            signatures.append(f"fn {name}({value.args}) give={value.give} {value.rtype}")
+        else:
+            signatures.append(f"type {name} {value}")
+    return '\n'.join(signatures)
+
+
+def interfaceHash(registry):
+    return hashlib.sha256(interface(registry).encode()).hexdigest()
+
+
+def build(entryPath, jobs=1, buildCache=None):
+    graph = ModuleGraph(entryPath).load()
+    return graph, graph.compile(buildCache, jobs)
@@ -0,0 +1,343 @@
+import hashlib
+import os
+import shutil
+import subprocess
+from . import functionregistry
+from . import ir
+from ..cache import cache
+
+
+# the c compiler is whatever CC names, the flags are part of every binary's cache key
+flags = ['-O2', '-std=c99', '-w']
+
+prelude = r'''#define _POSIX_C_SOURCE 200809L
+#include <inttypes.h>
+#include <stdint.h>
+#include <stdio.h>
+#include <stdlib.h>
+
+static void panic(const char *message, const char *function) {
+    fflush(stdout);
+    fprintf(stderr, "panic: %s in '%s'\n", message, function);
+    exit(1);
+}
+
+static void writeInteger(uint64_t value) {
+    printf("%" PRIu64, value);
+}
+
+static void writeString(const char *value) {
+    fputs(value, stdout);
+}
+
+static const char *readLine(const char *prompt, const char *function) {
+    char *line = NULL;
+    size_t size = 0;
+    fputs(prompt, stdout);
+    fflush(stdout);
+    ssize_t length = getline(&line, &size, stdin);
+    if (length < 0) {
+        panic("end of input", function);
+    }
+    if (length > 0 && line[length - 1] == '\n') {
+        line[length - 1] = '\0';
+    }
+    return line;
+}
+
+/* a shared cell is counted atomically, so it can be handed to another thread */
+typedef struct {
+    uint64_t count;
+    uint64_t value;
+} Shared;
+
+static Shared *share(uint64_t value, const char *function) {
+    Shared *cell = malloc(sizeof *cell);
+    if (cell == NULL) {
+        panic("out of memory", function);
+    }
+    cell->count = 1;
+    cell->value = value;
+    return cell;
+}
+
+static void release(Shared *cell) {
+    if (__atomic_sub_fetch(&cell->count, 1, __ATOMIC_ACQ_REL) == 0) {
+        free(cell);
+    }
+}
+'''
+
+# what a value is in c: an unsigned integer of a width, a string, a shared cell, or nothing
+INTEGER = 'integer'
+STRING = 'string'
+SHARED = 'shared'
+VOID = 'void'
+
+
+# the smallest uintN_t holding a mask, values of other widths are masked after every operation
+def integerType(mask):
+    width = 64 if mask == ir.untyped else mask.bit_length()
+    for size in (8, 16, 32, 64):
+        if width <= size:
+            return f"uint{size}_t"
+    raise SystemExit(f"unsigned<{width}> is wider than the c backend supports")
+
+
+def isNative(mask):
+    return mask == ir.untyped or mask.bit_length() in (8, 16, 32, 64)
+
+
+# every byte outside printable ascii is escaped, so the literal is the utf-8 of the string whatever it holds
+def stringLiteral(text):
+    escaped = []
+    for byte in text.encode():
+        if byte in b'"\\?':
+            escaped.append('\\' + chr(byte))
+        elif 32 <= byte < 127:
+            escaped.append(chr(byte))
+        else:
+            escaped.append(f"\\{byte:03o}")
+    return f"\"{''.join(escaped)}\""
+
+
+# lowers an ssa module into one c translation unit, a static function per function and a main calling the entry
+class Lowering:
+    def __init__(self, module):
+        self.module = module
+        self.builtins = functionregistry.builtinFunctions()
+
+    def lower(self):
+        entry = self.module.functions[self.module.entry]
+        if entry.params:
+            raise SystemExit(f"Function '{entry.name}' can not take arguments as the entry point")
+        lines = [prelude]
+        lines += [f"{self.signature(index, function)};" for index, function in enumerate(self.module.functions)]
+        for index, function in enumerate(self.module.functions):
+            lines.append('')
+            lines += FunctionLowering(self, index, function).lower()
+        lines += ['', 'int main(void) {', f"    {self.functionName(self.module.entry)}();", '    return 0;', '}', '']
+        return '\n'.join(lines)
+
+    def signature(self, index, function):
+        params = ', '.join(f"{integerType(param.mask)} {valueName(param, param.index)}" for param in function.params) or 'void'
+        rtype = 'void' if function.rmask == ir.untyped else integerType(function.rmask)
+        return f"static {rtype} {self.functionName(index)}({params})"
+
+    def functionName(self, index):
+        return f"F{index}_{cName(self.module.functions[index].name)}"
+
+
+class FunctionLowering:
+    def __init__(self, lowering, index, function):
+        self.lowering = lowering
+        self.index = index
+        self.function = function
+        self.names = {}
+        self.kinds = {}
+        self.lines = []
+
+    def lower(self):
+        for param in self.function.params:
+            if param.mask == ir.untyped:
+                raise SystemExit(f"Argument '{param.hint}' of '{self.function.name}' has no width the c backend can represent")
+            self.names[param] = valueName(param, param.index)
+            self.kinds[param] = INTEGER
+        for instruction in self.function.instructions():
+            if not isinstance(instruction, ir.Param):
+                self.instruction(instruction)
+        return [self.lowering.signature(self.index, self.function) + ' {'] + self.lines + ['}']
+
+    def instruction(self, instruction):
+        match instruction:
+            case ir.Binary():
+                left, right = self.integer(instruction.left), self.integer(instruction.right)
+                if instruction.op == '/' and not instruction.nonzero:
+                    self.emit(f"if ({right} == 0) panic(\"division by zero\", {self.functionName()});")
+                if instruction.mask == ir.untyped and not instruction.exact:
+                    self.untyped(instruction, left, right)
+                else:
+                    self.define(instruction, self.masked(f"(uint64_t){left} {instruction.op} {right}", instruction))
+            case ir.Negate():
+                operand = self.integer(instruction.operand)
+                if instruction.mask == ir.untyped:
+                    if not instruction.exact:
+                        self.emit(f"if ({operand} != 0) panic(\"integer overflow\", {self.functionName()});")
+                    self.define(instruction, '0')
+                else:
+                    self.define(instruction, self.masked(f"0 - (uint64_t){operand}", instruction))
+            case ir.Wrap():
+                self.define(instruction, self.masked(self.integer(instruction.operand), instruction))
+            case ir.Check():
+                operand = self.integer(instruction.operand)
+                outside = f"{operand} > UINT64_C({instruction.high})"
+                if instruction.low:
+                    outside = f"{operand} < UINT64_C({instruction.low}) || {outside}"
+                message = stringLiteral(f"value out of range {instruction.low} .. {instruction.high}")
+                self.emit(f"if ({outside}) panic({message}, {self.functionName()});")
+                self.define(instruction, operand)
+            case ir.Share():
+                self.define(instruction, f"share({self.integer(instruction.operand)}, {self.functionName()})", SHARED)
+            case ir.Load() if isinstance(instruction.pointer, ir.Share):
+                self.define(instruction, f"({integerType(instruction.mask)}){self.names[instruction.pointer]}->value")
+            # a cell is a local of the function's own, the c stack frame is the arena it is released with
+            case ir.New() | ir.Load():
+                operand = instruction.operands()[0]
+                self.define(instruction, self.value(operand), self.kindOf(operand))
+            case ir.Copy():
+                if self.kindOf(instruction.operand) == VOID:
+                    self.kinds[instruction] = VOID
+                else:
+                    self.define(instruction, self.value(instruction.operand), self.kindOf(instruction.operand))
+            case ir.Call():
+                call = f"{self.lowering.functionName(instruction.function)}({', '.join(self.integer(arg) for arg in instruction.args)})"
+                self.define(instruction, call, VOID if instruction.mask == ir.untyped else INTEGER)
+            case ir.Builtin():
+                self.builtin(instruction)
+            case ir.Drop():
+                # integers live in the frame, the only memory is the line input read and shared cells
+                cell = instruction.operand
+                if isinstance(cell, ir.Share):
+                    self.emit(f"release({self.names[cell]});")
+                elif not instruction.given and isinstance(cell, ir.New) and isinstance(cell.operand, ir.Builtin) and self.kindOf(cell) == STRING:
+                    self.emit(f"free((void *){self.names[cell]});")
+            case ir.Return():
+                self.ret(instruction)
+            case _:
+                raise SystemExit(f"Instruction '{instruction}' not supported by the c backend")
+
+    # values without a width are exact in python, in c they are 64 bits and panic rather than wrap
+    def untyped(self, instruction, left, right):
+        if instruction.op == '/':
+            self.define(instruction, f"{left} / {right}")
+        else:
+            self.emit(f"{self.declare(instruction, INTEGER)};")
+            builtin = {'+': 'add', '-': 'sub', '*': 'mul'}[instruction.op]
+            self.emit(f"if (__builtin_{builtin}_overflow((uint64_t){left}, (uint64_t){right}, &{self.names[instruction]})) panic(\"integer overflow\", {self.functionName()});")
+
+    def builtin(self, instruction):
+        name = str(instruction.name)
+        if instruction.name not in self.lowering.builtins:
+            raise SystemExit(f"Function '{name}' is undefined")
+        if name == 'print':
+            for position, arg in enumerate(instruction.args):
+                if position:
+                    self.emit("putchar(' ');")
+                kind = self.kindOf(arg)
+                if kind == INTEGER:
+                    self.emit(f"writeInteger({self.value(arg)});")
+                elif kind == STRING:
+                    self.emit(f"writeString({self.value(arg)});")
+                else:
+                    self.emit('writeString("None");')
+            self.emit("putchar('\\n');")
+            self.kinds[instruction] = VOID
+        elif name == 'input':
+            if len(instruction.args) > 1 or any(self.kindOf(arg) != STRING for arg in instruction.args):
+                raise SystemExit("Function 'input' takes at most one string in the c backend")
+            prompt = self.value(instruction.args[0]) if instruction.args else '""'
+            self.define(instruction, f"readLine({prompt}, {self.functionName()})", STRING)
+        else:
+            raise SystemExit(f"Function '{name}' not supported by the c backend")
+
+    def ret(self, instruction):
+        if self.function.rmask == ir.untyped:
+            self.emit('return;')
+        elif isinstance(instruction.value, ir.Constant) and instruction.value.value is None:
+            self.emit(f"panic(\"missing return value\", {self.functionName()});")
+        else:
+            self.emit(f"return {self.integer(instruction.value)};")
+
+    # integers are computed 64 bits wide, so nothing is promoted to a signed int, and cut back to their width,
+    # which takes a mask only for widths c has no type of and results not proven to fit
+    def masked(self, expression, instruction):
+        mask = instruction.mask
+        if isNative(mask) or instruction.exact:
+            return f"({integerType(mask)})({expression})"
+        return f"({integerType(mask)})(({expression}) & UINT64_C({mask}))"
+
+    def define(self, instruction, expression, kind=INTEGER):
+        if kind == VOID:
+            self.kinds[instruction] = VOID
+            self.emit(f"{expression};")
+            return
+        self.emit(f"{self.declare(instruction, kind)} = {expression};")
+
+    def declare(self, instruction, kind):
+        self.kinds[instruction] = kind
+        name = self.names[instruction] = valueName(instruction, len(self.names))
+        if kind == STRING:
+            return f"const char *{name}"
+        if kind == SHARED:
+            return f"Shared *{name}"
+        return f"{integerType(instruction.mask)} {name}"
+
+    def kindOf(self, value):
+        if isinstance(value, ir.Constant):
+            if isinstance(value.value, str):
+                return STRING
+            return VOID if value.value is None else INTEGER
+        return self.kinds[value]
+
+    def value(self, value):
+        if isinstance(value, ir.Constant):
+            if isinstance(value.value, str):
+                return stringLiteral(value.value)
+            if value.value is None:
+                return '0'
+            if not 0 <= value.value < 2 ** 64:
+                raise SystemExit(f"Integer '{value.value}' does not fit the c backend's 64 bits")
+            return f"UINT64_C({value.value})"
+        return self.names[value]
+
+    def integer(self, value):
+        if self.kindOf(value) != INTEGER:
+            raise SystemExit(f"'{value}' is not an integer in '{self.function.name}'")
+        return self.value(value)
+
+    def functionName(self):
+        return stringLiteral(str(self.function.name))
+
+    def emit(self, line):
+        self.lines.append('    ' + line)
+
+
+# c names are prefixed so they never collide with each other, a keyword or the c library
+def valueName(value, number):
+    hint = cName(value.hint) if value.hint is not None else ''
+    return f"v{number}_{hint}" if hint else f"v{number}"
+
+
+def cName(name):
+    name = str(name)
+    return name if name.isascii() and name.isidentifier() else ''.join(c if c.isascii() and c.isalnum() else '_' for c in name)
+
+
+def lower(module):
+    return Lowering(module).lower()
+
+
+def compilerPath():
+    path = shutil.which(os.environ.get('CC', 'cc'))
+    if path is None:
+        raise SystemExit(f"C compiler '{os.environ.get('CC', 'cc')}' not found, set CC to one")
+    return path
+
+
+# binaries are cached by the hash of their source and of how they were compiled, so an unchanged program
+# runs without invoking the c compiler again
+def build(source):
+    compiler = compilerPath()
+    digest = hashlib.sha256(source.encode())
+    digest.update('\0'.join([compiler] + flags).encode())
+    path = os.path.join(cache.directory('native'), digest.hexdigest())
+    if os.path.exists(path):
+        os.utime(path)
+        return path
+    scratch = cache.scratchPath(path)
+    result = subprocess.run([compiler, *flags, '-x', 'c', '-', '-o', scratch], input=source.encode(), capture_output=True)
+    if result.returncode != 0:
+        cache.removeQuietly(scratch)
+        raise SystemExit(f"C compiler failed:\n{result.stderr.decode(errors='replace')}")
+    os.replace(scratch, path)
+    return path
@@ -0,0 +1,166 @@
+from ..ast import ast
+from ..logging import logger
+from . import functionregistry
+
+
+log = logger.Log()
+
+
+# one definition of a name in a function, from the statement defining it to the last statement reading it,
+# heap when the function owns memory through it: made by new or shared, taken as an argument or given by a call
+class Owned:
+    def __init__(self, name, position, heap, borrowed=False):
+        self.name = name
+        self.position = position
+        self.last = position
+        self.heap = heap
+        self.borrowed = borrowed
+        # where it went once given away or moved, nothing may read it after that
+        self.given = None
+        self.callee = False
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}("
+            f"{self.name}, "
+            f"{self.position}, "
+            f"last={self.last}, "
+            f"heap={self.heap}, "
+            f"given={self.given})"
+        )
+
+
+# checks who owns what in the flat statements of every function, and records on each FnDef where what it
+# owns is dropped, right after the statement that reads it last instead of when the function ends
+def check(program, registry):
+    builtins = functionregistry.builtinFunctions()
+    for statement in program.statements:
+        if isinstance(statement, ast.FnDef):
+            checkFunction(statement, registry, builtins)
+
+
+def checkFunction(fndef, namespace, builtins=None):
+    inner = namespace.child(fndef.name)
+    FunctionOwnership(fndef, inner, builtins or functionregistry.builtinFunctions()).check()
+    for statement in fndef.statements:
+        if isinstance(statement, ast.FnDef):
+            checkFunction(statement, inner, builtins)
+
+
+# a single forward walk: every read moves the last use of the definition it reads, a give or a move ends
+# the definition, so a later read is an error, and whatever still holds memory at its last use is dropped
+class FunctionOwnership:
+    def __init__(self, fndef, namespace, builtins):
+        self.fndef = fndef
+        self.namespace = namespace
+        self.builtins = builtins
+        self.current = {}
+        self.definitions = []
+        self.position = -1
+
+    def check(self):
+        for arg in self.fndef.args:
+            self.define(arg.name, arg.take, not arg.take)
+        for position, statement in enumerate(self.fndef.statements):
+            self.position = position
+            match statement:
+                case ast.Declare() | ast.Assign() | ast.TempDef():
+                    self.assign(statement.name, statement.expr)
+                case ast.Return():
+                    self.ret(statement.expr)
+                case ast.Call():
+                    self.call(statement)
+        drops = {}
+        for owned in self.definitions:
+            if owned.heap and (owned.given is None or owned.callee):
+                drops.setdefault(owned.last, []).append((owned.name, owned.last == owned.position, owned.given is not None))
+        self.fndef.drops = drops
+
+    def define(self, name, heap, borrowed=False):
+        owned = Owned(name, self.position, heap, borrowed)
+        self.current[name] = owned
+        self.definitions.append(owned)
+
+    # a plain copy of a name holding memory moves it, two names never own the same memory
+    def assign(self, name, expr):
+        heap = self.expression(expr)
+        if isinstance(expr, ast.Ref):
+            source = self.current.get(expr.name)
+            if source is not None and source.heap and not source.borrowed:
+                source.given = f"moved to '{name}'"
+                heap = True
+        self.define(name, heap)
+
+    def ret(self, expr):
+        self.expression(expr)
+        if isinstance(expr, ast.Ref):
+            owned = self.current.get(expr.name)
+            if owned is not None and owned.heap:
+                if owned.borrowed and self.fndef.give:
+                    log.error(f"'{expr.name}' is borrowed by '{self.fndef.name}', it can not be given to its caller")
+                owned.given = f"given to the caller of '{self.fndef.name}'"
+
+    # whether the value holds memory the function now owns
+    def expression(self, expr):
+        match expr:
+            case ast.Ref():
+                self.read(expr.name)
+            case ast.BinOp():
+                self.expression(expr.left)
+                self.expression(expr.right)
+            case ast.UnaryOp():
+                self.expression(expr.expr)
+            case ast.New() | ast.Shared():
+                self.expression(expr.expr)
+                return True
+            case ast.Call():
+                return self.call(expr)
+        return False
+
+    # arguments are borrowed unless the callee takes them, then they have to be given, a temporary is given
+    # implicitly since nothing else can name it
+    def call(self, call):
+        taken, gives = self.contractOf(call.name)
+        for position, param in enumerate(call.params):
+            if not isinstance(param.expr, ast.Ref):
+                self.expression(param.expr)
+                continue
+            name = param.expr.name
+            takes = position < len(taken) and taken[position]
+            self.read(name)
+            if param.give and not takes:
+                log.error(f"'{call.name}' does not take '{name}', it can not be given in '{self.fndef.name}'")
+            if takes:
+                if not param.give and not str(name).startswith('%'):
+                    log.error(f"'{call.name}' takes '{name}', it has to be given in '{self.fndef.name}'")
+                self.give(name, call.name)
+        return gives
+
+    def give(self, name, callee):
+        owned = self.current.get(name)
+        if owned is None:
+            log.error(f"'{name}' is not owned by '{self.fndef.name}', it can not be given")
+        if owned.borrowed:
+            log.error(f"'{name}' is borrowed by '{self.fndef.name}', it can not be given")
+        owned.given = f"given to '{callee}'"
+        owned.callee = True
+
+    def read(self, name):
+        owned = self.current.get(name)
+        if owned is None:
+            return
+        if owned.given is not None:
+            log.error(f"'{name}' used in '{self.fndef.name}' after it was {owned.given}")
+        owned.last = self.position
+
+    # which arguments the callee takes and whether it gives its result, nothing for what is not a function
+    def contractOf(self, name):
+        if isinstance(name, list):
+            return [], False
+        fndef = self.namespace.lookup(name)
+        if isinstance(fndef, ast.FnDef):
+            return [arg.take for arg in fndef.args], fndef.give
+        if name in self.builtins:
+            contract = self.builtins[name].contract
+            return [arg.take for arg in contract.argumentContracts], contract.returnContract.give
+        return [], False
@@ -0,0 +1,348 @@
+import functools
+import time
+from . import ir
+from ..ast import consteval
+
+
+# a pass rewrites one function in place and reports whether it changed anything
+class Pass:
+    name = 'pass'
+
+    # called with the whole module before any of its functions is run
+    def begin(self, module):
+        pass
+
+    def run(self, function):
+        return False
+
+    # a line for the report after the timings, none when the pass has nothing to add
+    def summary(self):
+        return None
+
+
+def isInteger(value):
+    return isinstance(value, ir.Constant) and isinstance(value.value, int)
+
+
+def rewrite(function, replacements):
+    def replace(value):
+        while value in replacements:
+            value = replacements[value]
+        return value
+    for block in function.blocks:
+        block.instructions = [instruction for instruction in block.instructions if instruction not in replacements]
+        for instruction in block.instructions:
+            instruction.replaceOperands(replace)
+
+
+class ConstantPropagation(Pass):
+    name = 'constant-propagation'
+
+    def run(self, function):
+        replacements = {}
+
+        def replace(value):
+            return replacements.get(value, value)
+
+        for instruction in function.instructions():
+            instruction.replaceOperands(replace)
+            match instruction:
+                case ir.Binary() if isInteger(instruction.left) and isInteger(instruction.right):
+                    # division by zero is left for the runtime to panic on, as is an overflow without a width
+                    if instruction.op != '/' or instruction.right.value != 0:
+                        value = consteval.wrapBinary(instruction.op, instruction.left.value, instruction.right.value, instruction.mask)
+                        if 0 <= value <= ir.largest:
+                            replacements[instruction] = ir.Constant(value)
+                case ir.Negate() if isInteger(instruction.operand):
+                    value = consteval.wrapUnary('-', instruction.operand.value, instruction.mask)
+                    if 0 <= value <= ir.largest:
+                        replacements[instruction] = ir.Constant(value)
+                case ir.Wrap() if isInteger(instruction.operand):
+                    replacements[instruction] = ir.Constant(instruction.operand.value & instruction.mask)
+                case ir.Copy() if isinstance(instruction.operand, ir.Constant):
+                    replacements[instruction] = instruction.operand
+        rewrite(function, replacements)
+        return bool(replacements)
+
+
+# a copy of a value with the same width is the value itself
+class CopyPropagation(Pass):
+    name = 'copy-propagation'
+
+    def run(self, function):
+        replacements = {}
+        for instruction in function.instructions():
+            if isinstance(instruction, ir.Copy) and isinstance(instruction.operand, ir.Instruction):
+                if instruction.operand.mask == instruction.mask:
+                    if instruction.operand.hint is None:
+                        instruction.operand.hint = instruction.hint
+                    replacements[instruction] = instruction.operand
+        rewrite(function, replacements)
+        return bool(replacements)
+
+
+class CommonSubexpressionElimination(Pass):
+    name = 'cse'
+
+    def run(self, function):
+        replacements = {}
+        available = {}
+
+        def key(value):
+            value = replacements.get(value, value)
+            return ('const', type(value.value), value.value) if isinstance(value, ir.Constant) else id(value)
+
+        for instruction in function.instructions():
+            match instruction:
+                case ir.Binary():
+                    expression = ('binary', instruction.op, key(instruction.left), key(instruction.right), instruction.mask)
+                case ir.Negate() | ir.Wrap():
+                    expression = (type(instruction).__name__, key(instruction.operand), instruction.mask)
+                case _:
+                    continue
+            if expression in available:
+                replacements[instruction] = available[expression]
+            else:
+                available[expression] = instruction
+        rewrite(function, replacements)
+        return bool(replacements)
+
+
+class DeadCodeElimination(Pass):
+    name = 'dce'
+
+    def run(self, function):
+        changed = False
+        uses = function.uses()
+        for block in function.blocks:
+            live = []
+            # walk backwards so chains of dead values die in one sweep
+            for instruction in reversed(block.instructions):
+                if instruction.pure and not isinstance(instruction, ir.Param) and uses.get(instruction, 0) == 0:
+                    for operand in instruction.operands():
+                        if isinstance(operand, ir.Instruction):
+                            uses[operand] -= 1
+                    changed = True
+                else:
+                    live.append(instruction)
+            block.instructions = live[::-1]
+        return changed
+
+
+# the smallest interval holding both, none stands for any value
+def union(first, second):
+    if first is None or second is None:
+        return None
+    return min(first[0], second[0]), max(first[1], second[1])
+
+
+def intersect(first, second):
+    if first is None:
+        return second
+    if second is None:
+        return first
+    return max(first[0], second[0]), min(first[1], second[1])
+
+
+def within(interval, low, high):
+    return interval is not None and low <= interval[0] and interval[1] <= high
+
+
+# the interval of every value, found in one forward walk since every function is a single block: a value
+# whose exact result provably fits its width needs no mask, a divisor that can not be zero no check and a
+# range check its operand provably meets is removed, a call takes the interval its callee can return and a
+# heap cell that of the value it was made with
+class RangeAnalysis(Pass):
+    name = 'range-analysis'
+
+    def __init__(self):
+        self.module = None
+        self.returns = {}
+        self.removed = {'range': 0, 'mask': 0, 'divisor': 0}
+
+    def begin(self, module):
+        self.module = module
+        self.returns = {}
+
+    def run(self, function):
+        changed = False
+        known = {}
+        replacements = {}
+        for instruction in function.instructions():
+            interval, proven, nonzero = self.evaluate(instruction, known)
+            known[instruction] = interval
+            if isinstance(instruction, ir.Check):
+                if proven:
+                    replacements[instruction] = instruction.operand
+                    self.removed['range'] += 1
+            elif proven and not instruction.exact:
+                instruction.exact = True
+                self.removed['mask'] += 1
+                changed = True
+            if nonzero and not instruction.nonzero:
+                instruction.nonzero = True
+                self.removed['divisor'] += 1
+                changed = True
+        rewrite(function, replacements)
+        return changed or bool(replacements)
+
+    # the interval of what instruction defines, whether its mask or check is proven unnecessary and whether
+    # its divisor is proven non zero
+    def evaluate(self, instruction, known):
+        match instruction:
+            case ir.Param():
+                return instruction.bounds or self.widthOf(instruction.mask), False, False
+            case ir.Binary():
+                left, right = self.intervalOf(instruction.left, known), self.intervalOf(instruction.right, known)
+                exact = arithmetic(instruction.op, left, right)
+                nonzero = instruction.op == '/' and right is not None and right[0] > 0
+                return self.fit(exact, instruction.mask), self.fits(exact, instruction.mask), nonzero
+            case ir.Negate():
+                operand = self.intervalOf(instruction.operand, known)
+                exact = None if operand is None else (-operand[1], -operand[0])
+                return self.fit(exact, instruction.mask), self.fits(exact, instruction.mask), False
+            case ir.Wrap():
+                operand = self.intervalOf(instruction.operand, known)
+                return self.fit(operand, instruction.mask), self.fits(operand, instruction.mask), False
+            case ir.Copy() | ir.New():
+                return self.intervalOf(instruction.operand, known), False, False
+            case ir.Load():
+                return self.intervalOf(instruction.pointer, known), False, False
+            case ir.Check():
+                operand = self.intervalOf(instruction.operand, known)
+                return intersect(operand, (instruction.low, instruction.high)), within(operand, instruction.low, instruction.high), False
+            case ir.Call():
+                return self.returnOf(instruction.function), False, False
+        return None, False, False
+
+    def intervalOf(self, value, known):
+        if isinstance(value, ir.Constant):
+            return (value.value, value.value) if isinstance(value.value, int) else None
+        return known.get(value)
+
+    # a value without a width is exact, the backends only need it to fit 64 bits
+    def widthOf(self, mask):
+        return (0, ir.largest) if mask == ir.untyped else (0, mask)
+
+    def fits(self, exact, mask):
+        return within(exact, *self.widthOf(mask))
+
+    def fit(self, exact, mask):
+        if mask == ir.untyped or self.fits(exact, mask):
+            return exact
+        return self.widthOf(mask)
+
+    # what a function can return: the union of its returns, bounded by its declared type, which is all that
+    # is known of a function while it is being analysed, as it is when it calls itself
+    def returnOf(self, index):
+        function = self.module.functions[index]
+        declared = function.rbounds or self.widthOf(function.rmask)
+        if function not in self.returns:
+            self.returns[function] = declared
+            known = {}
+            returned = []
+            for instruction in function.instructions():
+                known[instruction] = self.evaluate(instruction, known)[0]
+                if isinstance(instruction, ir.Return):
+                    returned.append(self.intervalOf(instruction.value, known))
+            self.returns[function] = intersect(functools.reduce(union, returned) if returned else None, declared)
+        return self.returns[function]
+
+    def summary(self):
+        kept = {'range': 0, 'mask': 0, 'divisor': 0}
+        for function in self.module.functions:
+            for instruction in function.instructions():
+                if isinstance(instruction, ir.Check):
+                    kept['range'] += 1
+                elif isinstance(instruction, (ir.Binary, ir.Negate, ir.Wrap)) and not instruction.exact and instruction.mask != ir.untyped:
+                    kept['mask'] += 1
+                if isinstance(instruction, ir.Binary) and instruction.op == '/' and not instruction.nonzero:
+                    kept['divisor'] += 1
+        labels = {'range': 'range checks', 'mask': 'width masks', 'divisor': 'division by zero checks'}
+        return 'removed ' + ', '.join(f"{self.removed[kind]} of {self.removed[kind] + kept[kind]} {labels[kind]}" for kind in kept)
+
+
+# the interval of the exact result of op, none when an operand can be anything
+def arithmetic(op, left, right):
+    if left is None or right is None:
+        return None
+    match op:
+        case '+':
+            return left[0] + right[0], left[1] + right[1]
+        case '-':
+            return left[0] - right[1], left[1] - right[0]
+        case '*':
+            products = [a * b for a in left for b in right]
+            return min(products), max(products)
+        case '/':
+            # a zero divisor panics, so the quotient is that of the smallest divisor that does not
+            if right[1] <= 0 or left[0] < 0 or right[0] < 0:
+                return None
+            return left[0] // right[1], left[1] // max(right[0], 1)
+    return None
+
+
+class PassTiming:
+    def __init__(self, name):
+        self.name = name
+        self.seconds = 0.0
+        self.runs = 0
+        self.changes = 0
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}("
+            f"{self.name}, "
+            f"{self.seconds}, "
+            f"runs={self.runs}, "
+            f"changes={self.changes})"
+        )
+
+
+# runs the pipeline over every function until no pass changes anything
+class PassManager:
+    def __init__(self, passes, maxIterations=8):
+        self.passes = passes
+        self.maxIterations = maxIterations
+        self.timings = {p.name: PassTiming(p.name) for p in passes}
+
+    def add(self, p):
+        self.passes.append(p)
+        self.timings[p.name] = PassTiming(p.name)
+
+    def run(self, module):
+        for p in self.passes:
+            p.begin(module)
+        for function in module.functions:
+            for _ in range(self.maxIterations):
+                changed = False
+                for p in self.passes:
+                    start = time.perf_counter()
+                    passChanged = p.run(function)
+                    timing = self.timings[p.name]
+                    timing.seconds += time.perf_counter() - start
+                    timing.runs += 1
+                    timing.changes += passChanged
+                    changed = changed or passChanged
+                if not changed:
+                    break
+        return module
+
+    def report(self):
+        lines = [f"{'pass':<24}{'runs':>6}{'changes':>9}{'time':>12}"]
+        for timing in self.timings.values():
+            lines.append(f"{timing.name:<24}{timing.runs:>6}{timing.changes:>9}{timing.seconds * 1000:>9.3f} ms")
+        for p in self.passes:
+            summary = p.summary()
+            if summary:
+                lines.append(f"{p.name}: {summary}")
+        return '\n'.join(lines)
+
+
+def defaultPasses():
+    return [ConstantPropagation(), CopyPropagation(), CommonSubexpressionElimination(), DeadCodeElimination(), RangeAnalysis()]
+
+
+def optimize(module):
+    manager = PassManager(defaultPasses())
+    return manager.run(module), manager
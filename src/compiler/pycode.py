@@ -0,0 +1,293 @@
+import ast
+import hashlib
+import importlib.util
+import inspect
+import marshal
+from . import compiler
+from . import functionregistry
+from . import ir
+from ..cache import cache
+from ..logging import trace
+
+
+# a value used once is written into the expression using it, up to this depth, so compile() never recurses too far
+maxDepth = 32
+
+binaryOps = {'+': ast.Add, '-': ast.Sub, '*': ast.Mult, '/': ast.FloorDiv}
+
+
+def name(identifier):
+    return ast.Name(identifier, ast.Load())
+
+
+def store(identifier):
+    return ast.Name(identifier, ast.Store())
+
+
+def call(function, args):
+    return ast.Call(name(function), args, [])
+
+
+def functionDef(identifier, params, body, coroutine=False):
+    kind = ast.AsyncFunctionDef if coroutine else ast.FunctionDef
+    node = kind(identifier, ast.arguments([], [ast.arg(param) for param in params], None, [], [], None, []), body, [], None)
+    # newer pythons also take the type parameters of generic functions
+    if 'type_params' in kind._fields:
+        node.type_params = []
+    return node
+
+
+# masking with untyped is a no-op, so values without a width are left exact as the vm leaves them, as are
+# results proven to fit their width
+def masked(expression, instruction):
+    if instruction.mask == ir.untyped or instruction.exact:
+        return expression
+    return ast.BinOp(expression, ast.BitAnd(), ast.Constant(instruction.mask))
+
+
+# a sum or difference feeding more arithmetic of the same width is masked once at the end instead, the low
+# bits come out the same and it only ever grows by a bit
+def unmasked(expression, mask):
+    if (isinstance(expression, ast.BinOp) and isinstance(expression.op, ast.BitAnd) and expression.right.value == mask
+            and isinstance(expression.left, ast.BinOp) and isinstance(expression.left.op, (ast.Add, ast.Sub))):
+        return expression.left
+    return expression
+
+
+# lowers an ssa module into the code of one python module defining program(panic, heap, shared, builtins...), which
+# defines every function as a closure and returns the entry and every function by name, the first of a name,
+# so calls and builtins are cell loads instead of globals
+class Lowering:
+    def __init__(self, module):
+        self.module = module
+        self.builtins = {}
+        self.registry = functionregistry.builtinFunctions()
+        self.coroutines = self.awaiting()
+
+    def lower(self):
+        body = [
+            ast.Assign([store('memory')], ast.Attribute(name('heap'), 'memory', ast.Load())),
+            ast.Assign([store('allocate')], ast.Attribute(name('heap'), 'store', ast.Load())),
+            ast.Assign([store('share')], ast.Attribute(name('shared'), 'share', ast.Load())),
+        ]
+        body += [FunctionLowering(self, index, function).lower() for index, function in enumerate(self.module.functions)]
+        functions = {}
+        for index, function in enumerate(self.module.functions):
+            functions.setdefault(str(function.name), self.functionName(index))
+        table = ast.Dict([ast.Constant(key) for key in functions], [name(value) for value in functions.values()])
+        body.append(ast.Return(ast.Tuple([name(self.functionName(self.module.entry)), table], ast.Load())))
+        factory = functionDef('program', ['panic', 'heap', 'shared'] + [builtinName(builtin) for builtin in self.builtins], body)
+        tree = ast.fix_missing_locations(ast.Module([factory], []))
+        return compile(tree, f"<{self.module.name}>", 'exec')
+
+    def builtin(self, symbol):
+        if symbol not in self.builtins:
+            if symbol not in self.registry:
+                raise SystemExit(f"Function '{symbol}' is undefined")
+            self.builtins[symbol] = self.registry[symbol].body.remoteReference
+        return builtinName(symbol)
+
+    def functionName(self, index):
+        return f"F{index}_{self.module.functions[index].name}"
+
+    # a function calling an i/o builtin, or a function that does, is a coroutine awaiting it
+    def awaiting(self):
+        coroutines = set()
+        changed = True
+        while changed:
+            changed = False
+            for index, function in enumerate(self.module.functions):
+                if index not in coroutines and any(
+                        (isinstance(instruction, ir.Call) and instruction.function in coroutines)
+                        or (isinstance(instruction, ir.Builtin) and isCoroutine(self.registry, instruction.name))
+                        for instruction in function.instructions()):
+                    coroutines.add(index)
+                    changed = True
+        return coroutines
+
+
+class FunctionLowering:
+    def __init__(self, lowering, index, function):
+        self.lowering = lowering
+        self.index = index
+        self.function = function
+        self.names = {}
+        # values written into the expression of their one use, with how deep that expression is
+        self.inlined = {}
+        self.statements = []
+
+    def lower(self):
+        for param in self.function.params:
+            self.names[param] = valueName(param, len(self.names))
+        uses = self.function.uses()
+        # a function allocating on the heap releases what it allocated on every return
+        allocates = any(isinstance(instruction, ir.New) and not isinstance(instruction, ir.Share) for instruction in self.function.instructions())
+        if allocates:
+            self.statements.append(ast.Assign([store('mark')], ast.Attribute(name('heap'), 'top', ast.Load())))
+        for instruction in self.function.instructions():
+            if isinstance(instruction, ir.Param):
+                continue
+            if isinstance(instruction, ir.Drop):
+                self.drop(instruction.operand)
+                continue
+            expression, depth = self.expression(instruction)
+            if isinstance(instruction, ir.Return) and allocates:
+                result = store('result')
+                self.statements.append(ast.Assign([result], expression))
+                self.statements.append(ast.Expr(ast.Call(ast.Attribute(name('heap'), 'release', ast.Load()), [name('mark')], [])))
+                self.statements.append(ast.Return(name('result')))
+            elif isinstance(instruction, ir.Return):
+                self.statements.append(ast.Return(expression))
+            elif isinstance(instruction, ir.Check):
+                # a check is the name of the value it checked
+                self.names[instruction] = expression.id
+            elif ir.mayOverflow(instruction):
+                # named by overflow() to be checked
+                pass
+            elif instruction.pure and uses.get(instruction, 0) == 1 and depth < maxDepth:
+                self.inlined[instruction] = (expression, depth)
+            elif uses.get(instruction, 0) == 0:
+                self.statements.append(ast.Expr(expression))
+            else:
+                self.names[instruction] = valueName(instruction, len(self.names))
+                self.statements.append(ast.Assign([store(self.names[instruction])], expression))
+        params = [self.names[param] for param in self.function.params]
+        coroutine = self.index in self.lowering.coroutines
+        return functionDef(self.lowering.functionName(self.index), params, self.statements or [ast.Pass()], coroutine)
+
+    # the expression computing what instruction defines and its depth, a division checks its divisor first
+    def expression(self, instruction):
+        match instruction:
+            case ir.Binary():
+                (left, leftDepth), (right, rightDepth) = self.operand(instruction.left), self.operand(instruction.right)
+                if instruction.op == '/' and not instruction.nonzero:
+                    if rightDepth:
+                        # the divisor is tested and then divided by, so it needs a name of its own
+                        right, rightDepth = self.materialize(instruction.right, right), 0
+                    check = ast.Compare(right, [ast.Eq()], [ast.Constant(0)])
+                    panic = ast.Expr(call('panic', [ast.Constant(f"panic: division by zero in '{self.function.name}'")]))
+                    self.statements.append(ast.If(check, [panic], []))
+                if instruction.op != '/' and instruction.mask != ir.untyped and not instruction.exact:
+                    left, right = unmasked(left, instruction.mask), unmasked(right, instruction.mask)
+                expression = ast.BinOp(left, binaryOps[instruction.op](), right)
+                return self.overflow(instruction, masked(expression, instruction), max(leftDepth, rightDepth) + 1)
+            case ir.Negate():
+                operand, depth = self.operand(instruction.operand)
+                return self.overflow(instruction, masked(ast.UnaryOp(ast.USub(), operand), instruction), depth + 1)
+            case ir.Wrap():
+                operand, depth = self.operand(instruction.operand)
+                return masked(operand, instruction), depth + 1
+            case ir.Check():
+                operand, depth = self.operand(instruction.operand)
+                if depth or not isinstance(operand, ast.Name):
+                    operand = self.materialize(instruction.operand, operand)
+                check = ast.Compare(ast.Constant(instruction.low), [ast.LtE(), ast.LtE()], [operand, ast.Constant(instruction.high)])
+                message = f"panic: value out of range {instruction.low} .. {instruction.high} in '{self.function.name}'"
+                self.statements.append(ast.If(ast.UnaryOp(ast.Not(), check), [ast.Expr(call('panic', [ast.Constant(message)]))], []))
+                return operand, 0
+            case ir.Copy():
+                return self.operand(instruction.operand)
+            case ir.Share():
+                return call('share', [self.operand(instruction.operand)[0]]), 0
+            case ir.New():
+                return call('allocate', [self.operand(instruction.operand)[0]]), 0
+            case ir.Load():
+                pointer, depth = self.operand(instruction.pointer)
+                if isinstance(instruction.pointer, ir.Share):
+                    return ast.Attribute(pointer, 'value', ast.Load()), depth + 1
+                return ast.Subscript(name('memory'), pointer, ast.Load()), depth + 1
+            case ir.Call():
+                args = [self.operand(arg)[0] for arg in instruction.args]
+                expression = call(self.lowering.functionName(instruction.function), args)
+                if instruction.function in self.lowering.coroutines:
+                    expression = ast.Await(expression)
+                return expression, 0
+            case ir.Builtin():
+                args = [self.operand(arg)[0] for arg in instruction.args]
+                expression = call(self.lowering.builtin(instruction.name), args)
+                if isCoroutine(self.lowering.registry, instruction.name):
+                    expression = ast.Await(expression)
+                return expression, 0
+            case ir.Return():
+                return self.operand(instruction.value)[0], 0
+        raise SystemExit(f"Instruction '{instruction}' not supported by the python backend")
+
+    # arithmetic without a width is computed into a name and panics if that leaves 0 .. ir.largest
+    def overflow(self, instruction, expression, depth):
+        if not ir.mayOverflow(instruction):
+            return expression, depth
+        result = self.materialize(instruction, expression)
+        check = ast.Compare(ast.Constant(0), [ast.LtE(), ast.LtE()], [result, ast.Constant(ir.largest)])
+        message = f"panic: integer overflow in '{self.function.name}'"
+        self.statements.append(ast.If(ast.UnaryOp(ast.Not(), check), [ast.Expr(call('panic', [ast.Constant(message)]))], []))
+        return result, 0
+
+    def operand(self, value):
+        if isinstance(value, ir.Constant):
+            return ast.Constant(value.value), 0
+        if value in self.inlined:
+            return self.inlined.pop(value)
+        return name(self.names[value]), 0
+
+    # a dropped name is deleted, what is still waiting to be written into a later expression and reads it
+    # is computed first
+    def drop(self, value):
+        if value not in self.names:
+            return
+        identifier = self.names[value]
+        for pending, (expression, _) in list(self.inlined.items()):
+            if any(isinstance(node, ast.Name) and node.id == identifier for node in ast.walk(expression)):
+                del self.inlined[pending]
+                self.materialize(pending, expression)
+        if isinstance(value, ir.Share):
+            self.statements.append(ast.Expr(ast.Call(ast.Attribute(name(identifier), 'release', ast.Load()), [], [])))
+        self.statements.append(ast.Delete([ast.Name(identifier, ast.Del())]))
+
+    def materialize(self, value, expression):
+        self.names[value] = valueName(value, len(self.names))
+        self.statements.append(ast.Assign([store(self.names[value])], expression))
+        return name(self.names[value])
+
+
+def valueName(value, number):
+    hint = str(value.hint) if value.hint is not None else ''
+    return f"v{number}_{hint}" if hint.isidentifier() else f"v{number}"
+
+
+def builtinName(symbol):
+    return f"B_{symbol}"
+
+
+def isCoroutine(builtins, symbol):
+    return symbol in builtins and inspect.iscoroutinefunction(builtins[symbol].body.remoteReference)
+
+
+def lower(module):
+    lowering = Lowering(module)
+    return lowering.lower(), [str(builtin) for builtin in lowering.builtins]
+
+
+# the code is cached by the sources of every module it was built from, and by the interpreter that can load it
+def key(graph, units, buildCache):
+    sources = [f"{unit.name}={hashlib.sha256(unit.source).hexdigest()}" for unit in units]
+    return buildCache.key(f"{graph.entry.name}.pycode", importlib.util.MAGIC_NUMBER.hex(), *sources)
+
+
+# the code of a built program, linked, optimized and compiled only when no earlier build left it in the cache
+def build(graph, units, buildCache=None):
+    buildCache = buildCache or cache.BuildCache()
+    entryKey = key(graph, units, buildCache)
+    data = buildCache.read(entryKey)
+    if data is not None:
+        try:
+            return marshal.loads(data)
+        except (EOFError, ValueError, TypeError):
+            buildCache.discard(entryKey)
+    with trace.span('ir'):
+        module = ir.link(units, graph.entry)
+    with trace.span('optimize'):
+        module = compiler.optimize(module)[0]
+    with trace.span('lower'):
+        built = lower(module)
+    buildCache.write(entryKey, marshal.dumps(built))
+    return built
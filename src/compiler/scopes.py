@@ -0,0 +1,67 @@
+from ..ast import symbols
+from ..logging import logger
+
+
+log = logger.Log()
+
+# bumped whenever a definition hides another one, which is the only way a cached resolution goes stale
+shadowEpoch = 0
+
+
+# a symbol table linked to the table of the enclosing definition
+class Scope:
+    def __init__(self, name, parent, path=None):
+        self.name = name
+        self.parent = parent
+        self.path = symbols.intern(path or (name if parent is None else f"{parent.path}.{name}"))
+        self.symbols = {}
+        self.children = {}
+        self.owners = {}
+        self.epoch = shadowEpoch
+
+    def child(self, name):
+        if name not in self.children:
+            self.children[name] = Scope(name, self)
+        return self.children[name]
+
+    def define(self, name, value, typeString):
+        global shadowEpoch
+        if name in self.symbols:
+            log.error(f"{typeString} '{name}' already defined in '{self.path}'")
+        if self.parent is not None:
+            hidden = self.parent.owner(name)
+            if hidden is not None:
+                log.warning(f"Definition '{self.path}.{name}' hides another definition with the same name in '{hidden.path}'")
+                shadowEpoch += 1
+        self.symbols[name] = value
+
+    # the scope that defines name as seen from here, memoized so repeated lookups cost one dict hit
+    def owner(self, name):
+        if name in self.symbols:
+            return self
+        if self.epoch != shadowEpoch:
+            self.owners.clear()
+            self.epoch = shadowEpoch
+        if name in self.owners:
+            return self.owners[name]
+        found = self.parent.owner(name) if self.parent is not None else None
+        if found is not None:
+            self.owners[name] = found
+        return found
+
+    def lookup(self, name):
+        found = self.owner(name)
+        return found.symbols[name] if found is not None else None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['owners'] = {}
+        return state
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}("
+            f"{self.path}, "
+            f"{self.symbols}, "
+            f"{list(self.children.values())})"
+        )
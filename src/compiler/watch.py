@@ -0,0 +1,354 @@
+import bisect
+import operator
+import os
+import pickle
+import time
+from ..ast import ast
+from ..ast import flattener
+from ..ast import symbols
+from ..parser import fastlexer
+from ..parser import parser
+from . import definitions
+from . import modules
+from . import ownership
+from . import scopes
+
+
+# seconds between two looks at the watched files
+interval = 0.2
+
+
+# one top level definition as written, parsed and flattened once for as long as its text stays the same
+class Chunk:
+    def __init__(self, text, line):
+        self.text = text
+        self.line = line
+        self.pristine = None
+        self.statements = []
+        self.names = []
+        self.signatures = {}
+        self.references = set()
+        self.interfaceReferences = set()
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}("
+            f"{self.line}, "
+            f"{self.names})"
+        )
+
+
+# the source cut at top level boundaries by the lexer alone: a type ends with its ';', a function with the
+# '}' closing its body and a use is a single token, whatever is left unterminated is one last piece
+def split(source, start=0, lineno=1):
+    first = None
+    depth = 0
+    for token in fastlexer.tokens(source, start, lineno):
+        if first is None:
+            first, line = token.lexpos, token.lineno
+        if token.type == 'LCURLY':
+            depth += 1
+        elif token.type == 'RCURLY':
+            depth -= 1
+        if token.type == 'USE' or (depth == 0 and token.type in ('SEMICOLON', 'RCURLY')):
+            end = token.lexpos + (len(token.value.encode()) if token.type == 'USE' else 1)
+            yield (first, end, source[first:end], line)
+            first = None
+    if first is not None:
+        yield (first, len(source), source[first:], line)
+
+
+# lengths of the start and of the end two buffers have in common, found by halving, the old buffer is
+# only ever viewed so no comparison copies it
+def commonPrefix(old, new):
+    view = memoryview(old)
+    low, high = 0, min(len(old), len(new))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if new.startswith(view[:middle]):
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def commonSuffix(old, new, limit):
+    view = memoryview(old)
+    low, high = 0, limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if new.endswith(view[len(old) - middle:]):
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+# every name a definition mentions, its own included, found by walking the slots of its nodes
+def references(nodes):
+    found = set()
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        if isinstance(node, symbols.Symbol):
+            found.add(node)
+        elif isinstance(node, list):
+            stack.extend(node)
+        elif hasattr(type(node), '__slots__'):
+            stack.extend(getattr(node, slot, None) for slot in slotsOf(type(node)))
+    return found
+
+
+slotted = {}
+
+
+def slotsOf(cls):
+    if cls not in slotted:
+        slotted[cls] = [slot for base in cls.__mro__ for slot in getattr(base, '__slots__', ())]
+    return slotted[cls]
+
+
+# pieces are (first, end, text, line), kept in the order of first
+firstOf = operator.itemgetter(0)
+
+
+# a module checked one definition at a time: an edit re-parses only the definitions whose text changed and
+# re-checks them along with the definitions that use a name whose signature changed
+class Checked:
+    def __init__(self, name):
+        self.name = name
+        self.source = b''
+        self.pieces = []
+        self.imports = None
+        self.importKey = None
+        self.interfaceHash = None
+        self.chunks = []
+        self.known = {}
+        # each name to the chunks that mention it
+        self.dependents = {}
+        self.checker = None
+        self.failed = None
+
+    # brings the module up to date with source and returns how many definitions were checked again
+    def update(self, source):
+        return self.check(source, self.split(source))
+
+    # on an error failed is the text of the definition it was found in
+    def check(self, source, pieces):
+        known = self.known
+        chunks = [known.get(piece[2]) for piece in pieces]
+        for position, chunk in enumerate(chunks):
+            if chunk is None:
+                piece = pieces[position]
+                self.failed = piece[2]
+                chunks[position] = self.parse(piece[2], piece[3])
+        try:
+            # a repeated definition is reported by the full check, the chunks can not tell the two apart
+            if self.checker is None or len(set(chunks)) != len(chunks):
+                checked = self.checkAll(chunks)
+            else:
+                checked = self.checkChanged(chunks)
+        except SystemExit:
+            self.checker = None
+            raise
+        self.failed = None
+        self.source = source
+        self.pieces = pieces
+        self.chunks = chunks
+        self.known = {chunk.text: chunk for chunk in chunks}
+        return checked
+
+    # the pieces of the new source, the lexer starts again after the last definition ahead of the edit and
+    # stops as soon as it reaches the start of a definition in the unchanged end, from there on it would
+    # see the same text and cut it the same way, moved by as many bytes and lines as the edit added
+    def split(self, source):
+        old = self.source
+        prefix = commonPrefix(old, source)
+        suffix = commonSuffix(old, source, min(len(old), len(source)) - prefix)
+        pieces = []
+        for piece in self.pieces:
+            if piece[1] > prefix:
+                break
+            pieces.append(piece)
+        # a use is the one token that grows past its ';' when the text after it changes
+        if pieces and pieces[-1][2].startswith(b'use'):
+            pieces.pop()
+        start = pieces[-1][1] if pieces else 0
+        line = pieces[-1][3] + source.count(b'\n', pieces[-1][0], start) if pieces else 1
+        boundary = len(old) - suffix
+        shift = len(source) - len(old)
+        lineShift = source.count(b'\n', prefix, len(source) - suffix) - old.count(b'\n', prefix, boundary)
+        for piece in split(source, start, line):
+            if piece[0] - shift >= boundary:
+                index = bisect.bisect_left(self.pieces, piece[0] - shift, key=firstOf)
+                if index < len(self.pieces) and self.pieces[index][0] == piece[0] - shift:
+                    pieces += [(first + shift, end + shift, text, line + lineShift) for first, end, text, line in self.pieces[index:]]
+                    break
+            pieces.append(piece)
+        return pieces
+
+    def parse(self, text, line):
+        chunk = Chunk(text, line)
+        # blank lines in front keep the line numbers of syntax errors those of the file
+        program = parser.parse(self.name, b'\n' * (line - 1) + text)
+        flat = list(flattener.Flattener().statements(program.statements))
+        chunk.pristine = pickle.dumps(flat, protocol=pickle.HIGHEST_PROTOCOL)
+        for statement in flat:
+            match statement:
+                case ast.FnDef():
+                    chunk.names.append(statement.name)
+                    chunk.signatures[statement.name] = f"fn {statement.args} give={statement.give} {statement.rtype}"
+                    chunk.interfaceReferences |= references([statement.args, statement.rtype])
+                case ast.TypeDef():
+                    chunk.names.append(statement.typedata.name)
+                    chunk.signatures[statement.typedata.name] = f"type {statement.base_type}"
+                    chunk.interfaceReferences |= references([statement.base_type])
+        chunk.references = references(flat)
+        return chunk
+
+    def checkAll(self, chunks):
+        program = ast.Program(self.name, [])
+        for chunk in chunks:
+            chunk.statements = pickle.loads(chunk.pristine)
+            program.statements += chunk.statements
+        self.checker = definitions.DefinitionRegistry(program, self.imports)
+        self.dependents = {}
+        for chunk in chunks:
+            self.depend(chunk)
+        self.checkChunks(chunks)
+        return len(chunks)
+
+    # the checker mutates what it checks, so every re-check starts from a fresh copy of the flat statements
+    def checkChanged(self, chunks):
+        previous = set(self.chunks)
+        current = set(chunks)
+        added = [chunk for chunk in chunks if chunk not in previous]
+        removed = [chunk for chunk in self.chunks if chunk not in current]
+        before = {name: signature for chunk in removed for name, signature in chunk.signatures.items()}
+        after = {name: signature for chunk in added for name, signature in chunk.signatures.items()}
+        dirty = {name for name in before.keys() | after.keys() if before.get(name) != after.get(name)}
+        affected = set(added)
+        pending = list(dirty)
+        while pending:
+            name = pending.pop()
+            for chunk in self.dependents.get(name, ()):
+                if chunk not in current:
+                    continue
+                affected.add(chunk)
+                # a definition whose own signature mentions a changed name changed along with it
+                if name in chunk.interfaceReferences:
+                    for own in chunk.names:
+                        if own not in dirty:
+                            dirty.add(own)
+                            pending.append(own)
+        registry = self.checker.registry
+        for chunk in removed:
+            self.forget(chunk, registry)
+            for name in chunk.references:
+                self.dependents[name].discard(chunk)
+        for chunk in affected:
+            if chunk in previous:
+                self.forget(chunk, registry)
+            chunk.statements = pickle.loads(chunk.pristine)
+        for chunk in added:
+            self.depend(chunk)
+        ordered = [chunk for chunk in chunks if chunk in affected]
+        self.checkChunks(ordered)
+        self.checker.program.statements = [statement for chunk in chunks for statement in chunk.statements]
+        return len(ordered)
+
+    # what DefinitionRegistry.check does for a whole program, a chunk at a time
+    def checkChunks(self, chunks):
+        registry = self.checker.registry
+        for chunk in chunks:
+            self.failed = chunk.text
+            for statement in chunk.statements:
+                self.checker.maybeAddDefinition(statement, registry)
+        for chunk in chunks:
+            self.failed = chunk.text
+            for name in chunk.names:
+                self.checker.definitionHandler(name, registry)
+            for statement in chunk.statements:
+                if isinstance(statement, ast.FnDef):
+                    ownership.checkFunction(statement, registry)
+
+    def forget(self, chunk, registry):
+        for name in chunk.names:
+            registry.symbols.pop(name, None)
+            registry.children.pop(name, None)
+        # scopes remember where they found a name, none of that may outlive the definition
+        scopes.shadowEpoch += 1
+
+    def depend(self, chunk):
+        for name in chunk.references:
+            self.dependents.setdefault(name, set()).add(chunk)
+
+
+def stamp(path):
+    try:
+        status = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (status.st_mtime_ns, status.st_size)
+
+
+# every module of the graph kept checked, a module whose dependencies changed their interface is checked
+# again in full against the new imports, the others only where their own source changed
+class Watcher:
+    def __init__(self, entryPath):
+        self.entryPath = os.path.abspath(entryPath)
+        self.modules = {}
+        self.stamps = {self.entryPath: None}
+        self.pending = True
+
+    def changed(self):
+        return self.pending or any(stamp(path) != seen for path, seen in self.stamps.items())
+
+    def update(self):
+        self.pending = False
+        self.stamps = {path: stamp(path) for path in self.stamps}
+        graph = modules.ModuleGraph(self.entryPath).load()
+        self.stamps.update({unit.path: stamp(unit.path) for unit in graph.units.values()})
+        checked = 0
+        total = 0
+        for unit in graph.order():
+            module = self.prepare(graph, unit)
+            checked += module.update(unit.source)
+            self.publish(graph, module)
+            total += len(module.chunks)
+        self.modules = {name: module for name, module in self.modules.items() if name in graph.units}
+        return checked, total
+
+    # the module of a unit, importing what the modules it uses, directly or not, export now
+    def prepare(self, graph, unit):
+        module = self.modules.setdefault(unit.name, Checked(unit.name))
+        dependencies = [self.modules[dependency.name] for dependency in graph.closure(unit)]
+        importKey = [(dependency.name, dependency.interfaceHash) for dependency in dependencies]
+        if importKey != module.importKey:
+            exports = [(dependency.name, dependency.checker.registry.symbols, dependency.name in unit.dependencies) for dependency in dependencies]
+            module.imports = modules.importScope(unit.name, exports)
+            module.importKey = importKey
+            module.checker = None
+        return module
+
+    # only what other modules see is hashed, and only when another module uses it
+    def publish(self, graph, module):
+        if graph.dependents.get(module.name):
+            module.interfaceHash = modules.interfaceHash(module.checker.registry)
+
+
+def watch(entryPath):
+    watcher = Watcher(entryPath)
+    print(f"watching {watcher.entryPath}", flush=True)
+    try:
+        while True:
+            if watcher.changed():
+                start = time.perf_counter()
+                try:
+                    checked, total = watcher.update()
+                    print(f"checked {checked} of {total} definitions in {(time.perf_counter() - start) * 1000:.1f} ms", flush=True)
+                except SystemExit as error:
+                    print(error, flush=True)
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
@@ -4,11 +4,17 @@ from enum import Enum
 class LogLevel(Enum):
     DEBUG = 1
     WARNING = 2
+    ERROR = 3
 
 
 level = LogLevel.WARNING
 
 
+# lets callers skip building large debug dumps nobody will see
+def debugging():
+    return level.value <= LogLevel.DEBUG.value
+
+
 class Log():
     def error(self, message):
         raise SystemExit(f"ERROR: {message}")
@@ -0,0 +1,214 @@
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+
+tracer = None
+
+# phases that run interleaved inside another one, reported as their own row and taken out of the outer one
+splits = {'parse': 'lex', 'register': 'flatten'}
+
+
+class NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def annotate(self, **args):
+        pass
+
+
+nullSpan = NullSpan()
+
+
+# wall time and, from tracemalloc, the most memory allocated at once above what was in use on enter and what
+# is still in use on exit, a phase allocating a lot and freeing most of it has a large peak and a small net
+class Span:
+    def __init__(self, tracer, name, category, args):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        if self.tracer.memory:
+            self.base = self.peak = self.tracer.watermark()[0]
+            self.tracer.open.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        if self.tracer.memory:
+            current, _ = self.tracer.watermark()
+            self.tracer.open.remove(self)
+            self.args['peak'] = self.peak - self.base
+            self.args['net'] = current - self.base
+        self.tracer.record(self.name, self.category, self.start, seconds, self.args)
+        return False
+
+    def annotate(self, **args):
+        self.args.update(args)
+
+
+# events are kept in chrome trace-event format so they can be written out as is
+class Tracer:
+    def __init__(self, memory):
+        self.events = []
+        self.memory = memory
+        self.open = []
+
+    def span(self, name, category, args):
+        return Span(self, name, category, args)
+
+    def record(self, name, category, start, seconds, args):
+        self.events.append({
+            'name': str(name),
+            'cat': category,
+            'ph': 'X',
+            'ts': start * 1e6,
+            'dur': seconds * 1e6,
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+            'args': args,
+        })
+
+    # tracemalloc keeps one peak for the process, it is handed to every open span before being reset so each
+    # of them, and the lexer and flattener running inside parse and register, sees the peak of its own time
+    def watermark(self):
+        current, peak = tracemalloc.get_traced_memory()
+        for span in self.open:
+            span.peak = max(span.peak, peak)
+        tracemalloc.reset_peak()
+        return current, peak
+
+    # events recorded by worker processes
+    def merge(self, events):
+        self.events.extend(events)
+
+    def write(self, path):
+        with open(path, 'w') as file:
+            json.dump({'traceEvents': sorted(self.events, key=lambda event: event['ts']), 'displayTimeUnit': 'ms'}, file)
+
+    # the slowest functions only, a large program checks thousands
+    def report(self, functionLimit=20):
+        phases = {}
+        functions = {}
+        for event in self.events:
+            seconds = event['dur'] / 1e6
+            peak = event['args'].get('peak', 0)
+            net = event['args'].get('net', 0)
+            if event['cat'] == 'function':
+                total = functions.setdefault(event['name'], [0, 0.0, 0, 0])
+            else:
+                total = phases.setdefault(event['name'], [0, 0.0, 0, 0])
+            inner = splits.get(event['name'])
+            if inner in event['args']:
+                measured = event['args'][inner]
+                split = phases.setdefault(inner, [0, 0.0, 0, 0])
+                split[0] += 1
+                split[1] += measured['seconds']
+                split[2] = max(split[2], measured['peak'])
+                split[3] += measured['net']
+                seconds -= measured['seconds']
+                net -= measured['net']
+            total[0] += 1
+            total[1] += seconds
+            total[2] = max(total[2], peak)
+            total[3] += net
+        lines = ["memory from tracemalloc: peak is the most a phase held at once above what it started with, net what it",
+                 "left allocated, there is no count of allocations, the peak of parse and register includes lex and flatten",
+                 '',
+                 f"{'phase':<32}{'count':>7}{'wall':>13}{'peak KiB':>12}{'net KiB':>12}"]
+        lines += [row(name, *total) for name, total in phases.items()]
+        if functions:
+            lines.append('')
+            lines.append(f"{'check by function':<32}{'count':>7}{'wall':>13}{'peak KiB':>12}{'net KiB':>12}")
+            ranked = sorted(functions.items(), key=lambda item: item[1][1], reverse=True)
+            lines += [row(name, *total) for name, total in ranked[:functionLimit]]
+        return '\n'.join(lines)
+
+
+def row(name, count, seconds, peak, net):
+    return f"{name:<32}{count:>7}{seconds * 1000:>10.3f} ms{peak / 1024:>12.1f}{net / 1024:>12.1f}"
+
+
+# tracing memory slows every allocation down, a caller after wall times alone passes memory=False
+def start(memory=True):
+    global tracer
+    if tracer is not None:
+        stop()
+    tracer = Tracer(memory)
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    return tracer
+
+
+def stop():
+    global tracer
+    finished, tracer = tracer, None
+    if finished is not None and finished.memory:
+        tracemalloc.stop()
+    return finished
+
+
+def enabled():
+    return tracer is not None
+
+
+def span(name, category='phase', **args):
+    if tracer is None:
+        return nullSpan
+    return tracer.span(name, category, args)
+
+
+# time and memory of work interleaved with a phase, summed over every call to it
+class Interleaved:
+    def __init__(self):
+        self.seconds = 0.0
+        self.peak = 0
+        self.net = 0
+
+    def measure(self, action):
+        memory = tracer is not None and tracer.memory
+        if memory:
+            before, _ = tracer.watermark()
+        start = time.perf_counter()
+        try:
+            return action()
+        finally:
+            self.seconds += time.perf_counter() - start
+            if memory:
+                after, peak = tracer.watermark()
+                self.peak = max(self.peak, peak - before)
+                self.net += after - before
+
+    def measured(self):
+        return {'seconds': self.seconds, 'peak': self.peak, 'net': self.net}
+
+
+# the lexer runs interleaved with the parser, asked for a token at a time
+class TimedTokens(Interleaved):
+    def __init__(self, lexer):
+        super().__init__()
+        self.lexer = lexer
+
+    def token(self):
+        return self.measure(self.lexer.token)
+
+
+# the items of a stream someone else consumes, such as the flattener's
+class TimedStream(Interleaved):
+    def __init__(self, stream):
+        super().__init__()
+        self.stream = iter(stream)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.measure(lambda: next(self.stream))
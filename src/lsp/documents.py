@@ -0,0 +1,186 @@
+import bisect
+import os
+import re
+from ..compiler import modules
+from ..compiler import watch
+from ..parser import parser
+from . import index
+
+
+# the module graph of an open document: the document itself comes from the editor, what it uses from disk
+class DocumentGraph(modules.ModuleGraph):
+    def __init__(self, document, uses):
+        super().__init__(document.path, document.searchPath)
+        self.document = document
+        self.uses = uses
+
+    def read(self, path):
+        if path == self.entryPath:
+            return self.document.source
+        return super().read(path)
+
+    # the document's uses are its use pieces, already cut, so it is never scanned as a whole
+    def usesOf(self, unit):
+        if unit.path == self.entryPath:
+            return [parser.locator(text.decode()) for text in self.uses]
+        return super().usesOf(unit)
+
+
+# an open document kept checked one definition at a time, queries are answered from the pieces of the
+# latest text and the scopes of the latest text that checked
+class Document:
+    def __init__(self, path, roots):
+        self.path = path
+        # absolute uses resolve against the workspace as well, not only the document's own folder
+        self.searchPath = roots + [path for path in os.environ.get('TYPE_PATH', '').split(os.pathsep) if path]
+        self.watcher = watch.Watcher(path)
+        self.module = watch.Checked(modules.ModuleGraph(path).nameOf(path))
+        self.paths = {}
+        self.source = b''
+        self.pieces = []
+        self.uses = None
+        self.indexes = {}
+        self.registry = None
+        self.diagnostics = []
+
+    def change(self, text):
+        self.source = text.encode()
+        self.diagnostics = []
+        self.module.failed = None
+        # positions are found through the pieces, so a text the lexer rejects has none rather than stale ones
+        self.pieces = []
+        try:
+            self.pieces = self.module.split(self.source)
+            uses = [piece[2] for piece in self.pieces if piece[2].startswith(b'use')]
+            if uses != self.uses or self.watcher.changed():
+                # errors in a used module are put on the first use
+                self.module.failed = uses[0] if uses else None
+                self.loadDependencies(uses)
+            self.module.check(self.source, self.pieces)
+            self.registry = self.module.checker.registry
+        except SystemExit as error:
+            self.diagnostics = [self.diagnostic(str(error))]
+        # indexes of pieces that are gone are dropped once they outnumber the live ones
+        if self.pieces and len(self.indexes) > 2 * len(self.pieces):
+            self.indexes = {piece[2]: self.indexes[piece[2]] for piece in self.pieces if piece[2] in self.indexes}
+
+    # the modules the document uses, checked the way watch checks them, and imports built from what they export
+    def loadDependencies(self, uses):
+        watcher = self.watcher
+        watcher.pending = False
+        watcher.modules[self.module.name] = self.module
+        graph = DocumentGraph(self, uses).load()
+        watcher.stamps = {unit.path: watch.stamp(unit.path) for unit in graph.units.values() if unit.path != self.path}
+        for unit in graph.order():
+            module = watcher.prepare(graph, unit)
+            if unit is not graph.entry:
+                module.update(unit.source)
+                watcher.publish(graph, module)
+        watcher.modules = {name: module for name, module in watcher.modules.items() if name in graph.units}
+        self.paths = {unit.name: unit.path for unit in graph.units.values()}
+        self.uses = uses
+
+    def indexOf(self, text):
+        found = self.indexes.get(text)
+        if found is None:
+            found = self.indexes[text] = index.PieceIndex(text)
+        return found
+
+    # the name at offset with the piece it is in
+    def occurrenceAt(self, offset):
+        position = bisect.bisect_right(self.pieces, offset, key=watch.firstOf) - 1
+        if position < 0:
+            return None, None
+        piece = self.pieces[position]
+        return piece, self.indexOf(piece[2]).at(offset - piece[0])
+
+    # the scope defining the name at offset and what it defines it as
+    def resolve(self, offset):
+        piece, occurrence = self.occurrenceAt(offset)
+        if occurrence is None or self.registry is None:
+            return None, None, None
+        scope = index.scopeOf(self.registry, occurrence.scope) or self.registry
+        owner = scope.owner(occurrence.name)
+        if owner is None:
+            return piece, occurrence, None
+        return piece, occurrence, owner
+
+    def hover(self, offset):
+        piece, occurrence, owner = self.resolve(offset)
+        if owner is None:
+            return None
+        described = index.describe(occurrence.name, owner.symbols[occurrence.name])
+        return described, piece[0] + occurrence.offset, occurrence.length
+
+    # the file and offset a name is defined at, names from used modules are looked up in those modules
+    def definition(self, offset):
+        piece, occurrence, owner = self.resolve(offset)
+        if owner is None:
+            return None
+        name = occurrence.name
+        path = index.pathOf(self.registry, owner)
+        if path:
+            found = self.indexOf(piece[2]).definition(name, path)
+            return (self.path, self.source, self.pieces, piece[0] + found.offset) if found else None
+        if path == ():
+            return self.definitionIn(self.module, self.pieces, self.source, self.path, name)
+        for module in self.watcher.modules.values():
+            if module is not self.module and module.checker is not None and name in module.checker.registry.symbols:
+                return self.definitionIn(module, module.pieces, module.source, self.paths[module.name], name)
+        return None
+
+    def definitionIn(self, module, pieces, source, path, name):
+        for piece in pieces:
+            chunk = module.known.get(piece[2])
+            names = chunk.names if chunk is not None else self.indexOf(piece[2]).defines()
+            if name in names:
+                found = self.indexOf(piece[2]).definition(name, ())
+                return (path, source, pieces, piece[0] + found.offset) if found else None
+        return None
+
+    # checker errors carry no position, they are put on the definition being checked, syntax errors are
+    # put on their token and lexer errors on their character
+    def diagnostic(self, message):
+        offset = 0
+        piece = next((piece for piece in self.pieces if piece[2] == self.module.failed), None)
+        if piece is not None:
+            offset = piece[0]
+            syntax = re.search(r"on line: (\d+), (\d+)", message)
+            if syntax:
+                offset += int(syntax.group(2)) - (piece[3] - 1)
+        illegal = re.search(r"Illegal character: .* at: \d+, (\d+)", message)
+        if illegal:
+            offset = int(illegal.group(1))
+        return message, offset
+
+
+# language server positions are lines and utf-16 code units within them, they are found from the line of the
+# nearest piece so no table of the file's lines is ever built
+def offsetOf(source, pieces, line, character):
+    position = bisect.bisect_right(pieces, line + 1, key=lineOf) - 1
+    start, current = (pieces[position][0], pieces[position][3] - 1) if position >= 0 else (0, 0)
+    start = source.rfind(b'\n', 0, start) + 1
+    for _ in range(line - current):
+        start = source.find(b'\n', start) + 1
+        if start == 0:
+            return len(source)
+    end = source.find(b'\n', start)
+    text = source[start:len(source) if end < 0 else end]
+    if text.isascii():
+        return start + min(character, len(text))
+    prefix = text.decode(errors='replace').encode('utf-16-le')[:character * 2]
+    return start + len(prefix.decode('utf-16-le', errors='ignore').encode())
+
+
+def positionOf(source, pieces, offset):
+    position = bisect.bisect_right(pieces, offset, key=watch.firstOf) - 1
+    start, line = (pieces[position][0], pieces[position][3] - 1) if position >= 0 else (0, 0)
+    line += source.count(b'\n', start, offset)
+    text = source[source.rfind(b'\n', 0, offset) + 1:offset]
+    if text.isascii():
+        return line, len(text)
+    return line, len(text.decode(errors='replace').encode('utf-16-le')) // 2
+
+
+def lineOf(piece):
+    return piece[3]
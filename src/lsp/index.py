@@ -0,0 +1,117 @@
+import bisect
+from ..ast import ast
+from ..parser import fastlexer
+
+
+# where a name is written in a top level piece and which function it is written in, offsets count from the
+# start of the piece so an index stays valid wherever the piece moves in its file
+class Occurrence:
+    __slots__ = ('name', 'offset', 'length', 'scope', 'defining')
+
+    def __init__(self, name, offset, length, scope, defining):
+        self.name = name
+        self.offset = offset
+        self.length = length
+        self.scope = scope
+        self.defining = defining
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}("
+            f"{self.name}, "
+            f"{self.offset}, "
+            f"{self.scope})"
+        )
+
+
+# the names of one piece in order, a function's own name belongs to the scope around it, its arguments,
+# return type and body to the function
+class PieceIndex:
+    def __init__(self, text):
+        self.occurrences = []
+        scope = ()
+        closes = []
+        depth = 0
+        previous = None
+        for token in fastlexer.tokens(text):
+            if token.type == 'LCURLY':
+                depth += 1
+            elif token.type == 'RCURLY':
+                depth -= 1
+                if closes and closes[-1] == depth:
+                    closes.pop()
+                    scope = scope[:-1]
+            elif token.type == 'NAME':
+                length = len(str(token.value).encode())
+                self.occurrences.append(Occurrence(token.value, token.lexpos, length, scope, previous in ('FN', 'TYPE')))
+                if previous == 'FN':
+                    scope += (token.value,)
+                    closes.append(depth)
+            previous = token.type
+        self.offsets = [occurrence.offset for occurrence in self.occurrences]
+
+    def at(self, offset):
+        index = bisect.bisect_right(self.offsets, offset) - 1
+        if index >= 0 and offset < self.offsets[index] + self.occurrences[index].length:
+            return self.occurrences[index]
+        return None
+
+    # a name is declared before it is used, so its first occurrence in the scope defining it is the definition
+    def definition(self, name, scope):
+        for occurrence in self.occurrences:
+            if occurrence.name == name and occurrence.scope == scope and (scope or occurrence.defining):
+                return occurrence
+        return None
+
+    def defines(self):
+        return [occurrence.name for occurrence in self.occurrences if occurrence.defining and not occurrence.scope]
+
+
+# the checked scope a piece's names were resolved in, none when that function was not checked
+def scopeOf(registry, path):
+    scope = registry
+    for name in path:
+        scope = scope.children.get(name)
+        if scope is None:
+            return None
+    return scope
+
+
+# the scope names leading from the registry to scope, none when scope is not part of the registry
+def pathOf(registry, scope):
+    path = []
+    while scope is not registry:
+        if scope is None:
+            return None
+        path.append(scope.name)
+        scope = scope.parent
+    return tuple(reversed(path))
+
+
+def typeText(node):
+    match node:
+        case ast.Unsigned():
+            return f"unsigned<{node.sizeof}>"
+        case ast.Range():
+            return f"{node.low} .. {node.high}"
+        case ast.TypeData():
+            return f"{node.prefix + ' ' if node.prefix else ''}{typeText(node.name)}{node.postfix or ''}"
+        case ast.Void():
+            return 'void'
+        case ast.Unknown():
+            return 'unknown'
+    return str(node)
+
+
+# what hovering a name shows, in the language's own syntax
+def describe(name, value):
+    match value:
+        case ast.FnDef():
+            args = ', '.join(f"{'take ' if arg.take else ''}{typeText(arg.typedata)} {arg.name}" for arg in value.args)
+            return f"fn {name}({args}) {'give ' if value.give else ''}{typeText(value.rtype)}"
+        case (expr, baseType):
+            described = f"{typeText(baseType)} {name}"
+            if isinstance(expr, ast.Integer):
+                described += f" = {expr.value}"
+            return described
+    return f"type {name} is {typeText(value)}"
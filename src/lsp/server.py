@@ -0,0 +1,158 @@
+import json
+import pathlib
+import sys
+import traceback
+import urllib.parse
+from ..ast import symbols
+from ..logging import logger
+from ..parser import parser
+from . import documents
+
+
+# json-rpc error codes the protocol defines
+methodNotFound = -32601
+internalError = -32603
+
+
+def pathOf(uri):
+    return urllib.parse.unquote(urllib.parse.urlparse(uri).path)
+
+
+def uriOf(path):
+    return pathlib.Path(path).as_uri()
+
+
+# messages are framed by a Content-Length header, as the language server protocol defines
+def read(stream):
+    length = None
+    while True:
+        line = stream.readline()
+        if not line:
+            return None
+        line = line.strip()
+        if not line:
+            break
+        name, _, value = line.decode().partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    return json.loads(stream.read(length))
+
+
+def write(stream, message):
+    body = json.dumps(message).encode()
+    stream.write(f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+    stream.flush()
+
+
+class LanguageServer:
+    def __init__(self, output):
+        self.output = output
+        self.documents = {}
+        self.roots = []
+        self.running = True
+
+    def handle(self, message):
+        method = message.get('method')
+        handler = getattr(self, 'on' + ''.join(part[:1].upper() + part[1:] for part in method.replace('$/', '').split('/')), None) if method else None
+        if 'id' not in message:
+            if handler is not None:
+                handler(message.get('params') or {})
+            return
+        if handler is None:
+            write(self.output, {'jsonrpc': '2.0', 'id': message['id'], 'error': {'code': methodNotFound, 'message': f"Unknown method '{method}'"}})
+            return
+        try:
+            result = handler(message.get('params') or {})
+        except Exception:
+            write(self.output, {'jsonrpc': '2.0', 'id': message['id'], 'error': {'code': internalError, 'message': traceback.format_exc()}})
+            return
+        write(self.output, {'jsonrpc': '2.0', 'id': message['id'], 'result': result})
+
+    def onInitialize(self, params):
+        parser.getParser()
+        folders = params.get('workspaceFolders') or []
+        if params.get('rootUri'):
+            folders = [{'uri': params['rootUri']}] + folders
+        self.roots = [pathOf(folder['uri']) for folder in folders]
+        return {
+            'capabilities': {'textDocumentSync': 1, 'hoverProvider': True, 'definitionProvider': True},
+            'serverInfo': {'name': 'type-lang'},
+        }
+
+    def onShutdown(self, params):
+        return None
+
+    def onExit(self, params):
+        self.running = False
+
+    def onTextDocumentDidOpen(self, params):
+        item = params['textDocument']
+        document = self.documents[item['uri']] = documents.Document(pathOf(item['uri']), self.roots)
+        document.change(item['text'])
+        self.publish(item['uri'], document)
+
+    # the whole text is sent on every change, the pieces it has in common with the last one are kept
+    def onTextDocumentDidChange(self, params):
+        uri = params['textDocument']['uri']
+        document = self.documents[uri]
+        document.change(params['contentChanges'][-1]['text'])
+        self.publish(uri, document)
+
+    def onTextDocumentDidClose(self, params):
+        uri = params['textDocument']['uri']
+        self.documents.pop(uri, None)
+        if not self.documents:
+            # nothing holds a symbol any more
+            symbols.reset()
+        write(self.output, {'jsonrpc': '2.0', 'method': 'textDocument/publishDiagnostics', 'params': {'uri': uri, 'diagnostics': []}})
+
+    def onTextDocumentHover(self, params):
+        document, offset = self.locate(params)
+        found = document.hover(offset)
+        if found is None:
+            return None
+        described, start, length = found
+        return {
+            'contents': {'kind': 'markdown', 'value': f"```type\n{described}\n```"},
+            'range': self.range(document.source, document.pieces, start, start + length),
+        }
+
+    def onTextDocumentDefinition(self, params):
+        document, offset = self.locate(params)
+        found = document.definition(offset)
+        if found is None:
+            return None
+        path, source, pieces, start = found
+        return {'uri': uriOf(path), 'range': self.range(source, pieces, start, start)}
+
+    def locate(self, params):
+        document = self.documents[params['textDocument']['uri']]
+        position = params['position']
+        return document, documents.offsetOf(document.source, document.pieces, position['line'], position['character'])
+
+    def range(self, source, pieces, start, end):
+        startLine, startCharacter = documents.positionOf(source, pieces, start)
+        endLine, endCharacter = documents.positionOf(source, pieces, end)
+        return {'start': {'line': startLine, 'character': startCharacter}, 'end': {'line': endLine, 'character': endCharacter}}
+
+    # checking stops at the first error, so a document has at most one diagnostic, it runs to the end of its line
+    def publish(self, uri, document):
+        diagnostics = []
+        for message, offset in document.diagnostics:
+            end = document.source.find(b'\n', offset)
+            end = len(document.source) if end < 0 else end
+            diagnostics.append({'range': self.range(document.source, document.pieces, offset, end), 'severity': 1, 'source': 'type', 'message': message})
+        write(self.output, {'jsonrpc': '2.0', 'method': 'textDocument/publishDiagnostics', 'params': {'uri': uri, 'diagnostics': diagnostics}})
+
+
+# speaks the protocol on stdin and stdout, anything else printed goes to stderr so it can not corrupt a message
+def main():
+    output = sys.stdout.buffer
+    sys.stdout = sys.stderr
+    logger.level = logger.LogLevel.ERROR
+    server = LanguageServer(output)
+    while server.running:
+        message = read(sys.stdin.buffer)
+        if message is None:
+            break
+        server.handle(message)
@@ -0,0 +1,138 @@
+import mmap
+import re
+from ..ast import symbols
+from . import lexer
+
+
+# the same rules as the ply lexer, in the order ply tries them: function rules as defined, then
+# string rules longest pattern first, all in one pattern so every token is a single match
+def rules():
+    functions = []
+    strings = []
+    for name, rule in vars(lexer).items():
+        if not name.startswith('t_') or name in ('t_ignore', 't_error'):
+            continue
+        if callable(rule):
+            functions.append((name[2:], rule.__doc__))
+        else:
+            strings.append((name[2:], rule))
+    functions.sort(key=lambda rule: getattr(lexer, f"t_{rule[0]}").__code__.co_firstlineno)
+    strings.sort(key=lambda rule: len(rule[1]), reverse=True)
+    return functions + strings
+
+
+# the character a rule stands for when it matches exactly one
+def character(pattern):
+    text = re.sub(r'\\(.)', r'\1', pattern)
+    return text if len(text) == 1 else None
+
+
+# single character rules share one class, a match is mapped back to its rule by the character, every
+# token swallows the blanks after it so blanks cost no match of their own, only leading ones do
+def masterPattern():
+    ignore = ''.join(re.escape(char) for char in lexer.t_ignore)
+    groups = []
+    for name, pattern in rules():
+        if character(pattern) is None:
+            groups.append(f"(?P<{name}>{pattern})")
+    single = ''.join(re.escape(char) for char in characters)
+    groups.append(f"(?P<CHARACTER>[{single}])")
+    # anything no rule matches ends the scan with an error instead of being skipped
+    groups.append(r"(?P<ERROR>[\s\S])")
+    return f"(?P<IGNORE>[{ignore}]+)|(?:{'|'.join(groups)})[{ignore}]*"
+
+
+characters = {character(pattern): name for name, pattern in rules() if character(pattern) is not None}
+textPattern = re.compile(masterPattern(), re.VERBOSE)
+bytesPattern = re.compile(masterPattern().encode(), re.VERBOSE)
+groupKinds = {index: name for name, index in textPattern.groupindex.items()}
+
+
+# what the parser reads, printed like ply's tokens so both lexers can be compared line by line
+class Token:
+    __slots__ = ('type', 'value', 'lineno', 'lexpos', 'lexer')
+
+    def __init__(self, type, value, lineno, lexpos):
+        self.type = type
+        self.value = value
+        self.lineno = lineno
+        self.lexpos = lexpos
+
+    def __repr__(self):
+        return f"LexToken({self.type},{self.value!r},{self.lineno},{self.lexpos})"
+
+
+# yields tokens lazily from a str or from any bytes-like buffer such as an mmap, which is scanned in
+# place: only the text of each token is decoded, never the source as a whole, scanning may start at any
+# token boundary given the line it is on
+def tokens(buffer, start=0, lineno=1):
+    binary = not isinstance(buffer, str)
+    pattern = bytesPattern if binary else textPattern
+    # names, keywords, punctuation and small literals repeat, so each distinct spelling is decoded,
+    # classified and interned once and every later match is a single lookup
+    seen = {}
+    for match in pattern.finditer(buffer, start):
+        index = match.lastindex
+        text = match.group(index)
+        token = seen.get(text)
+        if token is not None:
+            yield Token(token[0], token[1], lineno, match.start())
+            continue
+        kind = groupKinds[index]
+        if kind == 'NEWLINE':
+            lineno += len(text)
+            continue
+        if kind == 'IGNORE' or kind == 'COMMENT':
+            continue
+        value = text.decode() if binary else text
+        if kind == 'NAME':
+            kind = lexer.reserved_words.get(value, 'NAME')
+            if kind == 'NAME':
+                value = symbols.intern(value)
+        elif kind == 'CHARACTER':
+            kind = characters[value]
+        elif kind == 'STRING':
+            value = value[1:-1]
+        elif kind == 'ERROR':
+            raise SystemExit(f"Illegal character: {value} at: {lineno}, {match.start()}")
+        seen[text] = (kind, value)
+        yield Token(kind, value, lineno, match.start())
+
+
+# the use statements of a source, only the use rule's matches are looked at
+def uses(buffer):
+    binary = not isinstance(buffer, str)
+    pattern = bytesPattern if binary else textPattern
+    found = []
+    for match in pattern.finditer(buffer):
+        if match.lastgroup == 'USE':
+            found.append(match.group('USE').decode() if binary else match.group('USE'))
+        elif match.lastgroup == 'ERROR':
+            break
+    return found
+
+
+# the interface ply's parser expects from a lexer
+class Lexer:
+    def __init__(self):
+        self.stream = iter(())
+
+    def input(self, buffer):
+        self.stream = tokens(buffer)
+
+    def token(self):
+        return next(self.stream, None)
+
+
+# maps a source file instead of reading it, an empty file can not be mapped, the map stays valid
+# after the file is closed and is released with the last token stream scanning it
+def mapFile(file):
+    if file.seek(0, 2) == 0:
+        return b''
+    return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def test(path):
+    with open(path, 'rb') as file:
+        for token in tokens(mapFile(file)):
+            print(token)
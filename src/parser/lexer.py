@@ -1,8 +1,20 @@
+from ..ast import symbols
 from ply.lex import lex
 
+typeLexer = None
+
+
+# the lexer is built once per process and rewound for every input
+def getLexer():
+    global typeLexer
+    if typeLexer is None:
+        typeLexer = lex()
+    typeLexer.lineno = 1
+    return typeLexer
+
 
 def test(data):
-    lexer = lex()
+    lexer = getLexer()
     lexer.input(data)
     while True:
         tok = lexer.token()
@@ -40,8 +52,10 @@ def t_COMMENT(t):
     pass
 
 
+# everything up to the last ';' on the line, without backtracking over it character by character,
+# the rules are compiled verbose so the separator after 'use' has to be a class
 def t_USE(t):
-    r'use (.*);'
+    r'use[ \t](?:[^;\n]*;)+'
     t.type = 'USE'
     return t
 
@@ -56,6 +70,8 @@ def t_STRING(t):
 def t_NAME(t):
     r'[a-zA-Z_][a-zA-Z_0-9]*'
     t.type = reserved_words.get(t.value, 'NAME')
+    if t.type == 'NAME':
+        t.value = symbols.intern(t.value)
     return t
 
 
@@ -1,17 +1,80 @@
+import hashlib
+import os
+import pickle
+import sys
+import ply
 from ply.yacc import yacc
 from .lexer import *
+from . import fastlexer
 from ..ast import ast
+from ..cache import cache
+from ..logging import trace
+
+# bump whenever the way tables are built changes without the grammar changing
+tableVersion = 1
 
 name = ''
 typeParser = None
 
 
+# input is a str or any bytes-like buffer, tokens are produced as the parser asks for them
 def parse(programName, input):
-    global name, tyepParser
+    global name
     name = programName
-    lexer = lex()
-    typeParser = yacc()
-    return typeParser.parse(input)
+    if not trace.enabled():
+        return getParser().parse(input, lexer=fastlexer.Lexer())
+    tokens = trace.TimedTokens(fastlexer.Lexer())
+    with trace.span('parse', module=programName) as span:
+        program = getParser().parse(input, lexer=tokens.lexer, tokenfunc=tokens.token)
+        span.annotate(lex=tokens.measured())
+    return program
+
+
+def parseFile(programName, path):
+    with open(path, 'rb') as file:
+        buffer = fastlexer.mapFile(file)
+    return parse(programName, buffer)
+
+
+# the LALR tables are generated once per grammar and shared by every parse in the process
+def getParser():
+    global typeParser
+    if typeParser is None:
+        typeParser = buildParser()
+    return typeParser
+
+
+def buildParser():
+    module = sys.modules[__name__]
+    path = tablePath()
+    if os.path.exists(path):
+        try:
+            return yacc(module=module, debug=False, picklefile=path)
+        except (EOFError, pickle.UnpicklingError):
+            os.remove(path)
+    scratch = cache.scratchPath(path)
+    parser = yacc(module=module, debug=False, picklefile=scratch)
+    os.replace(scratch, path)
+    return parser
+
+
+def tablePath():
+    return os.path.join(cache.directory('parser'), f"parsetab-{grammarHash()}.pickle")
+
+
+# everything yacc builds the tables from, precedence included once the grammar declares one
+def grammarHash():
+    precedence = getattr(sys.modules[__name__], 'precedence', ())
+    digest = hashlib.sha256(f"{tableVersion}:{ply.__version__}:{tokens}:{precedence!r}".encode())
+    for rule in grammarRules():
+        digest.update(rule.__doc__.encode())
+    return digest.hexdigest()[:16]
+
+
+def grammarRules():
+    module = sys.modules[__name__]
+    rules = [getattr(module, rule) for rule in dir(module) if rule.startswith('p_') and rule != 'p_error']
+    return sorted(rules, key=lambda rule: rule.__code__.co_firstlineno)
 
 
 def p_program(p):
@@ -46,9 +109,17 @@ def p_compound_statement(p):
 
 def p_use_statement(p):
     'use_statement : USE'
-    path = p[1].split()[1][:-1]
-    astPath = ast.RelLocator(path) if path[0] == '.' else ast.AbsLocator(path)
-    p[0] = ast.Use(astPath)
+    p[0] = ast.Use(locator(p[1]))
+
+
+def locator(use):
+    path = use.split()[1][:-1]
+    return ast.RelLocator(path) if path[0] == '.' else ast.AbsLocator(path)
+
+
+# the use statements of a source, found with the lexer alone so unchanged modules are never parsed
+def scanUses(input):
+    return [locator(use) for use in fastlexer.uses(input)]
 
 
 def p_function_definition(p):
@@ -315,6 +386,7 @@ def p_type_definition(p):
 def p_base_type(p):
     '''
     base_type : unsigned
+              | range
               | typename
     '''
     p[0] = p[1]
@@ -325,6 +397,11 @@ def p_unsigned(p):
     p[0] = ast.Unsigned(p[3])
 
 
+def p_range(p):
+    'range : integer DOT DOT integer'
+    p[0] = ast.Range(p[1], p[4])
+
+
 def p_typename(p):
     '''
     typename : NAME
@@ -335,7 +412,7 @@ def p_typename(p):
     if len(p) == 2:
         p[0] = ast.TypeData(p[1], None, None)
     elif len(p) == 3:
-        if '!' in p[2] or '?' in p[2]:  # is postfixed
+        if p.slice[1].type == 'NAME':  # is postfixed
             p[0] = ast.TypeData(p[1], None, p[2])
         else:
             p[0] = ast.TypeData(p[2], p[1], None)
@@ -0,0 +1,70 @@
+# the heap `new` values live in: one growable run of cells, handed out bottom up, where every call frame owns
+# the cells allocated since it was entered and gives all of them back at once when it returns, so releasing
+# a frame is setting the top back and never walks what it allocated
+class Arena:
+    def __init__(self, chunkSize=4096):
+        self.chunkSize = chunkSize
+        # cells at and above top are free, whatever they still hold is overwritten by the next allocation
+        self.memory = []
+        self.top = 0
+        self.allocations = 0
+        self.peak = 0
+        self.chunks = 0
+        self.releases = 0
+
+    # the address of a cell holding value, the memory only grows when a chunk is full
+    def store(self, value):
+        address = self.top
+        if address == len(self.memory):
+            self.grow(address + 1)
+        self.memory[address] = value
+        self.top = address + 1
+        self.allocations += 1
+        if address >= self.peak:
+            self.peak = address + 1
+        return address
+
+    # the memory list is extended in place, so whoever holds it keeps seeing every cell
+    def grow(self, size):
+        while len(self.memory) < size:
+            self.memory.extend([None] * self.chunkSize)
+            self.chunks += 1
+
+    def mark(self):
+        return self.top
+
+    def release(self, mark):
+        self.top = mark
+        self.releases += 1
+
+    def statistics(self):
+        return ArenaStatistics(self.allocations, self.peak, self.chunks, self.chunkSize, self.releases)
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}("
+            f"top={self.top}, "
+            f"{self.chunks} chunks)"
+        )
+
+
+class ArenaStatistics:
+    def __init__(self, allocations, peak, chunks, chunkSize, releases):
+        self.allocations = allocations
+        self.peak = peak
+        self.chunks = chunks
+        self.chunkSize = chunkSize
+        self.releases = releases
+
+    def describe(self):
+        return (f"heap: {self.allocations} allocations, at most {self.peak} cells in use, "
+                f"{self.chunks} chunks of {self.chunkSize} cells, {self.releases} frames released")
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}("
+            f"allocations={self.allocations}, "
+            f"peak={self.peak}, "
+            f"chunks={self.chunks}, "
+            f"releases={self.releases})"
+        )
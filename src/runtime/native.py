@@ -0,0 +1,17 @@
+import subprocess
+import sys
+
+
+# a binary built by the c backend, a panic is raised as it would be by the vm
+def run(path):
+    # the compile server captures sys.stdout, a child writing to the real stdout would bypass it
+    captured = sys.stdout is not sys.__stdout__
+    sys.stdout.flush()
+    result = subprocess.run([path], stdout=subprocess.PIPE if captured else None, stderr=subprocess.PIPE)
+    if captured:
+        sys.stdout.write(result.stdout.decode(errors='replace'))
+    if result.returncode < 0:
+        raise SystemExit(f"panic: killed by signal {-result.returncode}")
+    if result.returncode != 0:
+        raise SystemExit(result.stderr.decode(errors='replace').rstrip() or f"panic: exit status {result.returncode}")
+    sys.stderr.write(result.stderr.decode(errors='replace'))
@@ -0,0 +1,47 @@
+import inspect
+from ..ast import symbols
+from ..compiler import functionregistry
+from . import arena
+from . import reactor
+from . import shared as sharedHeap
+
+
+def panic(message):
+    raise SystemExit(message)
+
+
+# runs a program built by the python backend, handing it the heaps and the builtins it calls, a program doing
+# i/o is a coroutine run on an event loop of its own
+def run(built, heap=None, shared=None):
+    entry, _ = load(built)(heap or arena.Arena(), shared or sharedHeap.SharedHeap())
+    if inspect.iscoroutinefunction(entry):
+        return reactor.Reactor().run(entry())
+    return entry()
+
+
+# every connection to port handled by a call of the function named handler, all of them coroutines on this one
+# thread, each with an arena of its own since they interleave, until count were served or forever
+def serve(built, port, handler='handle', count=None, ready=None, shared=None):
+    program = load(built)
+    shared = shared or sharedHeap.SharedHeap()
+    _, functions = program(arena.Arena(), shared)
+    if handler not in functions:
+        raise SystemExit(f"Function '{handler}' not defined")
+    if not inspect.iscoroutinefunction(functions[handler]):
+        raise SystemExit(f"Function '{handler}' does no i/o, there is nothing to serve")
+
+    async def handle(connection):
+        _, functions = program(arena.Arena(), shared)
+        await functions[handler](connection)
+
+    return reactor.Reactor().serve(port, handle, count, ready)
+
+
+# a program(heap, shared) making the functions of a built program
+def load(built):
+    code, builtins = built
+    namespace = {}
+    exec(code, namespace)
+    registry = functionregistry.builtinFunctions()
+    references = [registry[symbols.intern(builtin)].body.remoteReference for builtin in builtins]
+    return lambda heap, shared: namespace['program'](panic, heap, shared, *references)
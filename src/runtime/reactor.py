@@ -0,0 +1,236 @@
+import asyncio
+import itertools
+import threading
+import weakref
+
+
+# one event loop multiplexing every socket, file and timer of the program, what it opened is known to the
+# program by a number it passes back to the builtins, a handle
+class Reactor:
+    def __init__(self):
+        self.loop = None
+        self.handles = {}
+        self.numbers = itertools.count(1)
+        self.opened = 0
+        self.served = 0
+
+    # runs a coroutine, and whatever it starts, on this thread until it returns
+    def run(self, coroutine):
+        return asyncio.run(self.within(coroutine))
+
+    async def within(self, coroutine):
+        self.attach(asyncio.get_running_loop())
+        try:
+            return await coroutine
+        finally:
+            self.closeAll()
+
+    def attach(self, loop):
+        self.loop = loop
+        reactors[loop] = self
+
+    # a handler coroutine per connection accepted on port, all of them on this one thread, until count were
+    # served or forever, ready is set once the port accepts connections
+    def serve(self, port, handler, count=None, ready=None):
+        return self.run(self.serving(port, handler, count, ready))
+
+    async def serving(self, port, handler, count, ready):
+        finished = asyncio.Event()
+
+        async def connected(reader, writer):
+            number = self.register(Stream(reader, writer))
+            try:
+                await handler(number)
+            finally:
+                await self.close(number)
+                self.served += 1
+                if count is not None and self.served >= count:
+                    finished.set()
+
+        server = await asyncio.start_server(connected, '127.0.0.1', port, backlog=4096)
+        if ready is not None:
+            ready.set()
+        async with server:
+            await finished.wait()
+
+    def register(self, handle):
+        number = next(self.numbers)
+        self.handles[number] = handle
+        self.opened += 1
+        return number
+
+    def lookup(self, number):
+        handle = self.handles.get(number)
+        if handle is None:
+            raise SystemExit(f"panic: handle '{number}' is not open")
+        return handle
+
+    async def listen(self, port):
+        listener = Listener()
+        listener.server = await asyncio.start_server(listener.connected, '127.0.0.1', port, backlog=4096)
+        return self.register(listener)
+
+    async def accept(self, number):
+        reader, writer = await self.lookup(number).queue.get()
+        return self.register(Stream(reader, writer))
+
+    async def connect(self, port):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        return self.register(Stream(reader, writer))
+
+    # files have no readiness to wait for, their reads and writes run on the loop's worker threads instead
+    async def open(self, path, mode):
+        try:
+            file = await self.loop.run_in_executor(None, open, path, mode)
+        except OSError as error:
+            raise SystemExit(f"panic: can not open '{path}': {error.strerror}")
+        return self.register(File(file, self.loop))
+
+    async def close(self, number):
+        handle = self.handles.pop(number, None)
+        if handle is not None:
+            await handle.close()
+
+    def closeAll(self):
+        for handle in self.handles.values():
+            handle.abort()
+        self.handles.clear()
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}("
+            f"{len(self.handles)} open, "
+            f"{self.opened} opened)"
+        )
+
+
+# connections accepted but not yet taken by accept
+class Listener:
+    def __init__(self):
+        self.server = None
+        self.queue = asyncio.Queue()
+
+    async def connected(self, reader, writer):
+        await self.queue.put((reader, writer))
+
+    async def readByte(self):
+        raise SystemExit("panic: a listener can not be read")
+
+    async def readLine(self):
+        raise SystemExit("panic: a listener can not be read")
+
+    async def send(self, data):
+        raise SystemExit("panic: a listener can not be written")
+
+    async def flush(self):
+        pass
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    def abort(self):
+        self.server.close()
+
+
+class Stream:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    # a byte, endOfInput once the other end has closed
+    async def readByte(self):
+        data = await self.reader.read(1)
+        return data[0] if data else endOfInput
+
+    async def readLine(self):
+        return (await self.reader.readline()).rstrip(b'\r\n')
+
+    # waits only while the other end is slower than what is written to it
+    async def send(self, data):
+        self.writer.write(data)
+        await self.writer.drain()
+
+    async def flush(self):
+        await self.writer.drain()
+
+    async def close(self):
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+
+    def abort(self):
+        self.writer.close()
+
+
+class File:
+    def __init__(self, file, loop):
+        self.file = file
+        self.loop = loop
+        self.pending = []
+
+    async def readByte(self):
+        data = await self.loop.run_in_executor(None, self.file.read, 1)
+        return data[0] if data else endOfInput
+
+    async def readLine(self):
+        return (await self.loop.run_in_executor(None, self.file.readline)).rstrip(b'\r\n')
+
+    # written out on flush or close, a worker thread per write would cost more than the write
+    async def send(self, data):
+        self.pending.append(data)
+
+    async def flush(self):
+        if self.pending:
+            data, self.pending = b''.join(self.pending), []
+            await self.loop.run_in_executor(None, self.file.write, data)
+        await self.loop.run_in_executor(None, self.file.flush)
+
+    async def close(self):
+        await self.flush()
+        await self.loop.run_in_executor(None, self.file.close)
+
+    def abort(self):
+        self.file.close()
+
+
+# what reading a byte gives once there is nothing left to read, one more than any byte, so only a target
+# wider than a byte can tell the two apart
+endOfInput = 256
+
+
+# the reactor of every running loop, so a builtin finds the one it runs on
+reactors = weakref.WeakKeyDictionary()
+
+
+def current():
+    return reactors[asyncio.get_running_loop()]
+
+
+# code that can not await, the vm, runs a builtin coroutine on a loop of its own thread and waits for it,
+# so a call blocks only the thread making it
+background = None
+backgroundLock = threading.Lock()
+
+
+def backgroundReactor():
+    global background
+    with backgroundLock:
+        if background is None:
+            reactor = Reactor()
+            loop = asyncio.new_event_loop()
+            reactor.attach(loop)
+            threading.Thread(target=loop.run_forever, name='reactor', daemon=True).start()
+            background = reactor
+    return background
+
+
+def blocking(function, *args):
+    loop = backgroundReactor().loop
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run_coroutine_threadsafe(function(*args), loop).result()
+    raise SystemExit(f"panic: '{function.__name__}' would block the event loop it runs on")
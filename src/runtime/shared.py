@@ -0,0 +1,79 @@
+import threading
+
+
+# a value more than one function, on more than one thread, can hold, freed when the last one holding it lets
+# go of it, the count is the only thing ever written after it is made so it is the only thing locked
+class SharedCell:
+    __slots__ = ('value', 'count', 'lock', 'heap')
+
+    def __init__(self, value, heap):
+        self.value = value
+        self.count = 1
+        self.lock = threading.Lock()
+        self.heap = heap
+
+    def retain(self):
+        with self.lock:
+            if self.count == 0:
+                raise SystemExit("panic: shared value used after it was freed")
+            self.count += 1
+        return self
+
+    def release(self):
+        with self.lock:
+            self.count -= 1
+            last = self.count == 0
+        if last:
+            self.value = None
+            self.heap.freed(self)
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}("
+            f"{self.value}, "
+            f"count={self.count})"
+        )
+
+
+# where shared cells are made, one per program however many threads run it, the arenas of those threads
+# stay their own and never take a lock, only the heap's two counters are locked
+class SharedHeap:
+    def __init__(self):
+        self.made = 0
+        self.released = 0
+        self.lock = threading.Lock()
+
+    def share(self, value):
+        with self.lock:
+            self.made += 1
+        return SharedCell(value, self)
+
+    def freed(self, cell):
+        with self.lock:
+            self.released += 1
+
+    def statistics(self):
+        with self.lock:
+            return SharedStatistics(self.made, self.released)
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}("
+            f"{self.statistics().describe()})"
+        )
+
+
+class SharedStatistics:
+    def __init__(self, made, released):
+        self.made = made
+        self.released = released
+
+    def describe(self):
+        return f"shared: {self.made} cells made, {self.released} freed, {self.made - self.released} live"
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}("
+            f"made={self.made}, "
+            f"released={self.released})"
+        )
@@ -0,0 +1,101 @@
+import concurrent.futures
+import threading
+from . import arena
+from . import shared as sharedHeap
+from . import vm
+
+
+# runs the functions of one executable on a pool of os threads or of worker processes, every worker allocates
+# from an arena of its own, so the only values ever locked are the shared cells
+class Runtime:
+    def __init__(self, executable, workers=4, processes=False):
+        self.executable = executable
+        self.processes = processes
+        self.shared = sharedHeap.SharedHeap()
+        self.entries = {str(code.name): index for index, code in enumerate(executable.functions)}
+        self.heaps = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        if processes:
+            self.pool = concurrent.futures.ProcessPoolExecutor(workers, initializer=startWorker, initargs=(executable,))
+        else:
+            self.pool = concurrent.futures.ThreadPoolExecutor(workers)
+
+    # a cell the functions called on any worker can be given, the caller's reference is dropped with release
+    def share(self, value):
+        return self.shared.share(value)
+
+    # a future of what the function returns, a shared argument is held until the function ends, the function
+    # itself gets the value it holds
+    def call(self, name, *args):
+        if name not in self.entries:
+            raise SystemExit(f"Function '{name}' not defined")
+        index = self.entries[name]
+        arity = self.executable.functions[index].arity
+        if len(args) != arity:
+            raise SystemExit(f"Function '{name}' takes {arity} arguments, {len(args)} given")
+        cells = [arg.retain() for arg in args if isinstance(arg, sharedHeap.SharedCell)]
+        values = [arg.value if isinstance(arg, sharedHeap.SharedCell) else arg for arg in args]
+        if self.processes:
+            future = self.pool.submit(runWorker, index, values)
+        else:
+            future = self.pool.submit(self.runThread, index, values)
+        if cells:
+            future.add_done_callback(lambda _: releaseAll(cells))
+        return future
+
+    def runThread(self, index, args):
+        heap = getattr(self.local, 'heap', None)
+        if heap is None:
+            heap = self.local.heap = arena.Arena()
+            with self.lock:
+                self.heaps.append(heap)
+        return vm.execute(self.executable, index, args, heap, self.shared)
+
+    # what the thread workers allocated, worker processes keep theirs
+    def statistics(self):
+        with self.lock:
+            heaps = [heap.statistics() for heap in self.heaps]
+        return arena.ArenaStatistics(
+            sum(heap.allocations for heap in heaps),
+            sum(heap.peak for heap in heaps),
+            sum(heap.chunks for heap in heaps),
+            self.heaps[0].chunkSize if self.heaps else 0,
+            sum(heap.releases for heap in heaps),
+        )
+
+    def shutdown(self):
+        self.pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        return False
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}("
+            f"{'processes' if self.processes else 'threads'}, "
+            f"{self.shared})"
+        )
+
+
+def releaseAll(cells):
+    for cell in cells:
+        cell.release()
+
+
+# what a worker process runs with, set once when it starts instead of sent with every call
+worker = None
+
+
+def startWorker(executable):
+    global worker
+    worker = (executable, arena.Arena(), sharedHeap.SharedHeap())
+
+
+def runWorker(index, args):
+    executable, heap, shared = worker
+    return vm.execute(executable, index, args, heap, shared)
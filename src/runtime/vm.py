@@ -0,0 +1,135 @@
+from ..compiler import bytecode
+from ..compiler.ir import largest
+from . import arena
+from . import shared as sharedHeap
+
+
+def run(executable, heap=None, shared=None):
+    return execute(executable, executable.entry, [], heap or arena.Arena(), shared or sharedHeap.SharedHeap())
+
+
+# a single dispatch loop, calls push a frame instead of recursing in python, each frame remembers the top of
+# the heap when it was entered and returning puts it back, releasing everything the frame allocated, nothing
+# but shared cells is seen by another thread, so a thread running it with an arena of its own takes no lock
+# outside of them
+def execute(executable, entry, args, heap, shared):
+    (LOAD_CONST, LOAD_LOCAL, STORE_LOCAL, ADD, SUB, MUL, DIV, NEG, WRAP, CALL, CALL_BUILTIN,
+     RETURN, POP, CHECK, LOAD_LAST, DROP, NEW, LOAD_HEAP, SHARE, LOAD_SHARED, RELEASE,
+     OVERFLOW) = bytecode.opcodes
+    functions = executable.functions
+    builtins = executable.builtins
+    code = functions[entry]
+    instructions = code.instructions
+    constants = code.constants
+    slots = [None] * code.slotCount
+    slots[:len(args)] = args
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    frames = []
+    pc = 0
+    memory = heap.memory
+    capacity = len(memory)
+    base = top = heap.top
+    peak = heap.peak
+    allocations = heap.allocations
+    releases = heap.releases
+    # the heap's counters are kept in locals while running and written back however the program ends
+    try:
+        while True:
+            op = instructions[pc]
+            arg = instructions[pc + 1]
+            pc += 2
+            if op == LOAD_LOCAL:
+                push(slots[arg])
+            elif op == STORE_LOCAL:
+                slots[arg] = pop()
+            elif op == LOAD_CONST:
+                push(constants[arg])
+            elif op == ADD:
+                right = pop()
+                stack[-1] = (stack[-1] + right) & arg
+            elif op == SUB:
+                right = pop()
+                stack[-1] = (stack[-1] - right) & arg
+            elif op == MUL:
+                right = pop()
+                stack[-1] = (stack[-1] * right) & arg
+            elif op == CALL:
+                callee = functions[arg]
+                frames.append((code, slots, pc, top))
+                code = callee
+                instructions = callee.instructions
+                constants = callee.constants
+                slots = [None] * callee.slotCount
+                if callee.arity:
+                    slots[:callee.arity] = stack[-callee.arity:]
+                    del stack[-callee.arity:]
+                pc = 0
+            elif op == RETURN:
+                if not frames:
+                    if top != base:
+                        top = base
+                        releases += 1
+                    return pop()
+                code, slots, pc, mark = frames.pop()
+                if top != mark:
+                    top = mark
+                    releases += 1
+                instructions = code.instructions
+                constants = code.constants
+            elif op == DIV:
+                right = pop()
+                if right == 0:
+                    raise SystemExit(f"panic: division by zero in '{code.name}'")
+                stack[-1] = (stack[-1] // right) & arg
+            elif op == LOAD_LAST:
+                # a value read for the last time leaves its slot, so the frame no longer keeps it alive
+                push(slots[arg])
+                slots[arg] = None
+            elif op == NEG:
+                stack[-1] = (-stack[-1]) & arg
+            elif op == WRAP:
+                stack[-1] &= arg
+            elif op == CALL_BUILTIN:
+                function, count = builtins[arg]
+                params = stack[len(stack) - count:]
+                del stack[len(stack) - count:]
+                push(function(*params))
+            elif op == POP:
+                pop()
+            elif op == CHECK:
+                low, high = constants[arg]
+                if not low <= stack[-1] <= high:
+                    raise SystemExit(f"panic: value out of range {low} .. {high} in '{code.name}'")
+            elif op == DROP:
+                slots[arg] = None
+            elif op == NEW:
+                if top == capacity:
+                    heap.grow(top + 1)
+                    capacity = len(memory)
+                memory[top] = stack[-1]
+                stack[-1] = top
+                top += 1
+                allocations += 1
+                if top > peak:
+                    peak = top
+            elif op == LOAD_HEAP:
+                stack[-1] = memory[stack[-1]]
+            elif op == SHARE:
+                stack[-1] = shared.share(stack[-1])
+            elif op == LOAD_SHARED:
+                stack[-1] = stack[-1].value
+            elif op == RELEASE:
+                slots[arg].release()
+                slots[arg] = None
+            elif op == OVERFLOW:
+                if not 0 <= stack[-1] <= largest:
+                    raise SystemExit(f"panic: integer overflow in '{code.name}'")
+            else:
+                raise SystemExit(f"panic: invalid opcode '{op}' in '{code.name}'")
+    finally:
+        heap.top = top
+        heap.peak = peak
+        heap.allocations = allocations
+        heap.releases = releases
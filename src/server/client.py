@@ -0,0 +1,62 @@
+import json
+import os
+import socket
+import sys
+from ..cache import cache
+
+
+usage = "usage: python -m src client [--socket path] [--stdin] lex|ast|build|run|ir file.ty [options] | stop"
+
+
+def socketPath():
+    return os.environ.get('TYPE_SOCKET') or os.path.join(cache.directory('server'), 'compile.sock')
+
+
+# one request per connection: a json line out, a json line back once the command has finished
+def send(request, path):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        try:
+            connection.connect(path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            raise SystemExit(f"No compile server at '{path}', start one with 'python -m src serve'")
+        connection.sendall(json.dumps(request).encode() + b'\n')
+        connection.shutdown(socket.SHUT_WR)
+        reply = b''.join(iter(lambda: connection.recv(65536), b''))
+    return json.loads(reply)
+
+
+def listening(path):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        try:
+            connection.connect(path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            return False
+    return True
+
+
+# the command runs in the server as if it had been run here: same working directory, module path and output,
+# standard input is only forwarded when asked for since it may never be closed
+def main(argv):
+    path = socketPath()
+    stdin = None
+    argv = list(argv)
+    while argv and argv[0].startswith('--'):
+        match argv.pop(0):
+            case '--socket':
+                path = argv.pop(0)
+            case '--stdin':
+                stdin = sys.stdin.read()
+            case option:
+                raise SystemExit(f"Unknown option '{option}'")
+    if not argv:
+        raise SystemExit(usage)
+    reply = send({
+        'argv': argv,
+        'cwd': os.getcwd(),
+        'path': os.environ.get('TYPE_PATH', ''),
+        'stdin': stdin,
+    }, path)
+    sys.stdout.write(reply['output'])
+    if reply['error']:
+        sys.stderr.write(reply['error'].rstrip('\n') + '\n')
+    return reply['status']
@@ -0,0 +1,105 @@
+import contextlib
+import io
+import json
+import os
+import socketserver
+import sys
+import time
+import traceback
+from .. import commands
+from ..ast import symbols
+from ..cache import cache
+from ..logging import logger
+from ..logging import trace
+from ..parser import parser
+from . import client
+
+
+# requests are served one at a time, the compiler keeps its state in module globals
+class CompileServer(socketserver.UnixStreamServer):
+    def __init__(self, path):
+        super().__init__(path, Handler)
+        self.buildCache = cache.ResidentCache()
+        self.stopping = False
+
+
+class Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        request = json.loads(self.rfile.readline())
+        start = time.perf_counter()
+        if request['argv'] == ['stop']:
+            self.server.stopping = True
+            reply = {'status': 0, 'output': '', 'error': None}
+        elif request['argv'][:1] in (['watch'], ['listen']):
+            # would hold the server for as long as it watches or serves, with every other client waiting
+            command = request['argv'][0]
+            reply = {'status': 1, 'output': '', 'error': f"{command.capitalize()} runs on its own, use 'python -m src {command}'"}
+        else:
+            reply = run(request, self.server.buildCache)
+        self.wfile.write(json.dumps(reply).encode() + b'\n')
+        print(f"{' '.join(request['argv'])}: status {reply['status']} in {(time.perf_counter() - start) * 1000:.1f} ms", flush=True)
+
+
+# every request starts from the state a fresh process would have, only the parser and the build cache carry
+# over from one request to the next, the cache holds its entries pickled so the interned symbols can go
+def run(request, buildCache):
+    output = io.StringIO()
+    status = 0
+    error = None
+    stdin = sys.stdin
+    logger.level = logger.LogLevel.WARNING
+    trace.stop()
+    symbols.reset()
+    if request['path']:
+        os.environ['TYPE_PATH'] = request['path']
+    else:
+        os.environ.pop('TYPE_PATH', None)
+    sys.stdin = io.StringIO(request['stdin'] or '')
+    try:
+        os.chdir(request['cwd'])
+        with contextlib.redirect_stdout(output):
+            commands.execute(request['argv'], buildCache)
+    except SystemExit as exit:
+        if isinstance(exit.code, int):
+            status = exit.code
+        elif exit.code is not None:
+            status = 1
+            error = str(exit.code)
+    except Exception:
+        status = 1
+        error = traceback.format_exc()
+    finally:
+        sys.stdin = stdin
+        trace.stop()
+    return {'status': status, 'output': output.getvalue(), 'error': error}
+
+
+def serve(path):
+    if os.path.exists(path):
+        if client.listening(path):
+            raise SystemExit(f"A compile server is already listening on '{path}'")
+        os.remove(path)
+    # everything a cold start pays for is paid once, before the first request
+    parser.getParser()
+    cache.compilerVersion()
+    server = CompileServer(path)
+    os.chmod(path, 0o600)
+    print(f"serving on {path}", flush=True)
+    try:
+        while not server.stopping:
+            server.handle_request()
+    finally:
+        server.server_close()
+        os.remove(path)
+
+
+def main(argv):
+    path = client.socketPath()
+    argv = list(argv)
+    while argv:
+        match argv.pop(0):
+            case '--socket':
+                path = argv.pop(0)
+            case option:
+                raise SystemExit(f"Unknown option '{option}'")
+    serve(os.path.abspath(path))